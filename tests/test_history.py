@@ -0,0 +1,139 @@
+"""Bufor cykliczny historii pomiarów: nadpisywanie, zapytania o zakres i trwałość w pliku."""
+import pytest
+
+from timesync import history
+from timesync.history import OVERFLOW_SERVER, SYNC_OK, HistoryError, HistoryStore
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    """Zapytania z kolumnami NumPy (jeśli zainstalowano) i z array.array."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(history, "_numpy", False)
+    else:
+        monkeypatch.setattr(history, "_numpy", None)
+    return request.param
+
+
+def fill(store, count, start=0, servers=("a", "b")):
+    for i in range(start, start + count):
+        store.append(float(i), servers[i % len(servers)], offset_ms=i / 10, delay_ms=1.0, stratum=2)
+
+
+def test_wraparound_keeps_newest(backend):
+    store = HistoryStore(capacity=8)
+    fill(store, 13)
+
+    assert len(store) == 8
+    assert store.total == 13
+    assert list(store.range().timestamp) == [float(i) for i in range(5, 13)]
+    assert list(store.last(3).timestamp) == [10.0, 11.0, 12.0]
+
+
+def test_range_across_wrap(backend):
+    store = HistoryStore(capacity=8)
+    fill(store, 13)
+
+    assert list(store.range(6.5, 11.0).timestamp) == [7.0, 8.0, 9.0, 10.0]
+    assert list(store.range(start=11.0).timestamp) == [11.0, 12.0]
+    assert list(store.range(end=0.0).timestamp) == []
+    assert list(store.range(6.0, 12.0, server="a").timestamp) == [6.0, 8.0, 10.0]
+    assert list(store.range(server="nieznany").timestamp) == []
+
+
+def test_since(backend):
+    store = HistoryStore(capacity=8)
+    fill(store, 5)
+    rows, total = store.since(3)
+    assert list(rows.timestamp) == [3.0, 4.0] and total == 5
+
+    # Wpisy nadpisane od poprzedniego odczytu są pomijane
+    fill(store, 20, start=5)
+    rows, total = store.since(total)
+    assert list(rows.timestamp) == [float(i) for i in range(17, 25)] and total == 25
+
+
+def test_clock_step_back(backend):
+    store = HistoryStore(capacity=8)
+    fill(store, 4, start=100)
+    # Zegar systemowy cofnięty o 50 s
+    fill(store, 3, start=50)
+
+    assert list(store.range(51.0, 102.0).timestamp) == [100.0, 101.0, 51.0, 52.0]
+    assert list(store.range(start=102.0, server="a").timestamp) == [102.0]
+
+    # Po nadpisaniu wpisów sprzed cofnięcia wraca wyszukiwanie binarne
+    fill(store, 8, start=53)
+    assert store.total >= store._ordered_from
+    assert list(store.range(55.0, 58.0).timestamp) == [55.0, 56.0, 57.0]
+
+
+def test_persistence(tmp_path, backend):
+    path = str(tmp_path / "history.bin")
+    with HistoryStore(capacity=8, path=path) as store:
+        fill(store, 11)
+        store.append(11.0, "c", offset_ms=-3.5, kind=SYNC_OK)
+
+    with HistoryStore(path=path) as store:
+        assert store.capacity == 8
+        assert store.total == 12
+        rows = store.range()
+        assert list(rows.timestamp) == [float(i) for i in range(4, 12)]
+        assert rows.offset_ms[-1] == -3.5
+        assert rows.kind[-1] == SYNC_OK
+        assert [store.servers[i] for i in rows.server[-3:]] == ["b", "a", "c"]
+        # Kolejne wpisy dopisywane są za zachowanymi
+        store.append(12.0, "a", offset_ms=0.0)
+        assert list(store.last(2).timestamp) == [11.0, 12.0]
+
+
+def test_persistence_keeps_file_capacity(tmp_path):
+    path = str(tmp_path / "history.bin")
+    HistoryStore(capacity=8, path=path).close()
+    with HistoryStore(capacity=16, path=path) as store:
+        assert store.capacity == 8
+
+
+def test_truncated_file_rejected(tmp_path):
+    path = tmp_path / "history.bin"
+    path.write_bytes(b"ZSHS")
+    with pytest.raises(HistoryError):
+        HistoryStore(path=str(path))
+
+
+def test_server_ids_reused(backend):
+    store = HistoryStore(capacity=4)
+    store.max_servers = 4
+    for i, name in enumerate(["a", "b", "c", "d", "e", "f", "g"]):
+        store.append(float(i), name, offset_ms=0.0)
+
+    # d i e trafiły do OVERFLOW_SERVER, bo wpisy a, b i c były jeszcze w buforze;
+    # f i g dostały identyfikatory nadpisanych już a i b
+    rows = store.range()
+    assert [store.servers[i] for i in rows.server] == [OVERFLOW_SERVER, OVERFLOW_SERVER, "f", "g"]
+    assert "a" not in store.servers and "b" not in store.servers
+    assert len(store.servers) == store.max_servers
+
+
+def test_overflow_server_when_table_full(backend):
+    store = HistoryStore(capacity=64)
+    store.max_servers = 3
+    for i, name in enumerate(["a", "b", "c", "d"]):
+        store.append(float(i), name, offset_ms=0.0)
+
+    rows = store.range()
+    assert [store.servers[i] for i in rows.server] == ["a", "b", OVERFLOW_SERVER, OVERFLOW_SERVER]
+
+
+def test_reused_server_names_persisted(tmp_path):
+    path = str(tmp_path / "history.bin")
+    with HistoryStore(capacity=4, path=path) as store:
+        store.max_servers = 4
+        for i, name in enumerate(["a", "b", "c", "d", "e", "f", "g"]):
+            store.append(float(i), name, offset_ms=0.0)
+        names = list(store.servers)
+
+    with HistoryStore(path=path) as store:
+        assert store.servers == names
+        assert [store.servers[i] for i in store.range().server][-2:] == ["f", "g"]
@@ -0,0 +1,134 @@
+"""Resolver z pamięcią podręczną i rozwijanie pul na osobne źródła (z tabelą nazw zamiast DNS)."""
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from timesync import resolver
+from timesync.resolver import Resolver, StubResolver
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingLookup:
+    """Wyszukiwanie z tabeli, które liczy wywołania i może czekać na zwolnienie."""
+
+    def __init__(self, table):
+        self.table = table
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, host, port):
+        self.calls += 1
+        self.release.wait(5)
+        addresses = self.table.get(host)
+        if addresses is None:
+            raise socket.gaierror(socket.EAI_NONAME, f"Nieznana nazwa {host}")
+        return [(socket.AF_INET, (address, port)) for address in addresses]
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def lookup():
+    return CountingLookup({"pool.test": ["10.0.0.1", "10.0.0.2"], "one.test": ["10.0.1.1"]})
+
+
+@pytest.fixture
+def cached(lookup, clock):
+    instance = Resolver(ttl=300.0, negative_ttl=30.0, lookup=lookup, clock=clock)
+    yield instance
+    instance.close()
+
+
+def test_source_names():
+    name = resolver.source_name("pool.test", "2001:db8::1")
+    assert resolver.split_source(name) == ("pool.test", "2001:db8::1")
+    assert resolver.split_source("one.test") == ("one.test", None)
+    assert resolver.host_of(name) == "pool.test"
+
+
+def test_expand_pool():
+    stub = StubResolver({"pool.test": ["10.0.0.1", "10.0.0.2", "10.0.0.1"], "one.test": ["10.0.1.1"]})
+    try:
+        sources = asyncio.run(stub.expand(["pool.test", "one.test", "192.0.2.1", "missing.test", "pool.test"]))
+    finally:
+        stub.close()
+    assert sources == ["pool.test/10.0.0.1", "pool.test/10.0.0.2", "one.test/10.0.1.1", "192.0.2.1", "missing.test"]
+
+
+def test_cache_hit_until_ttl(cached, lookup, clock):
+    assert asyncio.run(cached.resolve("pool.test", 123)) == [(socket.AF_INET, ("10.0.0.1", 123)),
+                                                            (socket.AF_INET, ("10.0.0.2", 123))]
+    clock.now = 299.0
+    asyncio.run(cached.resolve("pool.test", 123))
+    assert (lookup.calls, cached.hits) == (1, 1)
+
+    clock.now = 301.0
+    asyncio.run(cached.resolve("pool.test", 123))
+    assert lookup.calls == 2
+
+
+def test_literal_address_skips_lookup(cached, lookup):
+    assert asyncio.run(cached.resolve("192.0.2.7", 123)) == [(socket.AF_INET, ("192.0.2.7", 123))]
+    assert lookup.calls == 0
+
+
+def test_negative_cache(cached, lookup, clock):
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            asyncio.run(cached.resolve("missing.test"))
+    assert lookup.calls == 1
+
+    clock.now = 31.0
+    with pytest.raises(socket.gaierror):
+        asyncio.run(cached.resolve("missing.test"))
+    assert lookup.calls == 2
+
+
+def test_stale_entry_kept_on_failure(cached, lookup, clock):
+    asyncio.run(cached.resolve("one.test"))
+    del lookup.table["one.test"]
+    clock.now = 301.0
+    # Chwilowa awaria DNS: poprzednie adresy są używane jeszcze przez negative_ttl
+    assert asyncio.run(cached.resolve("one.test"))[0][1][0] == "10.0.1.1"
+    clock.now = 330.0
+    assert asyncio.run(cached.resolve("one.test"))[0][1][0] == "10.0.1.1"
+    assert lookup.calls == 2
+
+
+def test_concurrent_lookups_share_one_query(cached, lookup):
+    lookup.release.clear()
+
+    async def main():
+        tasks = [asyncio.ensure_future(cached.resolve("pool.test")) for _ in range(10)]
+        await asyncio.sleep(0.05)
+        lookup.release.set()
+        return await asyncio.gather(*tasks)
+
+    replies = asyncio.run(main())
+    assert lookup.calls == 1 and cached.lookups == 1
+    assert all(reply == replies[0] for reply in replies)
+
+
+def test_cache_is_bounded(lookup, clock):
+    lookup.table.update({f"ntp{i}.test": [f"10.1.0.{i}"] for i in range(10)})
+    small = Resolver(max_entries=4, lookup=lookup, clock=clock)
+    try:
+        for i in range(10):
+            asyncio.run(small.resolve(f"ntp{i}.test"))
+    finally:
+        small.close()
+    assert len(small._cache) == 4
+    assert ("ntp9.test", 123) in small._cache and ("ntp0.test", 123) not in small._cache
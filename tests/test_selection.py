@@ -0,0 +1,82 @@
+"""Algorytm przecięć i wybór źródeł czasu."""
+import pytest
+
+from timesync.selection import MIN_DISTANCE_MS, intersect, root_distance, select_sources
+from timesync.sntp import NtpResult
+
+
+def source(server, offset_ms, delay_ms=10.0, root_delay_ms=0.0, root_dispersion_ms=0.0):
+    return NtpResult(server=server, offset_ms=offset_ms, delay_ms=delay_ms, stratum=2, ref_id="", leap=0,
+                     version=4, poll=6, precision=-20, root_delay_ms=root_delay_ms,
+                     root_dispersion_ms=root_dispersion_ms, received_at=0.0, timestamping="user")
+
+
+def names(results):
+    return sorted(result.server for result in results)
+
+
+def test_root_distance():
+    assert root_distance(source("a", 0.0, delay_ms=10.0, root_delay_ms=4.0, root_dispersion_ms=1.0)) == 8.0
+    # Pomiary w sieci lokalnej mają promień nie mniejszy niż MIN_DISTANCE_MS
+    assert root_distance(source("a", 0.0, delay_ms=0.1)) == MIN_DISTANCE_MS
+
+
+def test_no_candidates():
+    assert intersect([]) is None
+    selection = select_sources([])
+    assert selection.offset_ms is None
+    assert selection.survivors == [] and selection.falsetickers == []
+
+
+def test_single_source():
+    selection = select_sources([source("a", 12.0)])
+    assert selection.offset_ms == pytest.approx(12.0)
+    assert selection.jitter_ms == pytest.approx(0.0)
+    assert (selection.low_ms, selection.high_ms) == (7.0, 17.0)
+
+
+def test_overlapping_sources_intersect():
+    # Przedziały [-5, 5], [-3, 7], [-1, 9] - wspólna część to [-1, 5]
+    low, high, allow = intersect([source("a", 0.0), source("b", 2.0), source("c", 4.0)])
+    assert (low, high, allow) == (-1.0, 5.0, 0)
+
+
+def test_falseticker_rejected():
+    candidates = [source("a", 0.0), source("b", 1.0), source("c", -1.0), source("d", 500.0)]
+    selection = select_sources(candidates)
+
+    assert names(selection.survivors) == ["a", "b", "c"]
+    assert names(selection.falsetickers) == ["d"]
+    assert selection.low_ms <= selection.offset_ms <= selection.high_ms
+    assert selection.offset_ms == pytest.approx(0.0)
+
+
+def test_offset_weighted_by_root_distance():
+    # Źródło o czterokrotnie mniejszym promieniu waży cztery razy więcej
+    near = source("near", 0.0, delay_ms=4.0)
+    far = source("far", 1.25, delay_ms=16.0)
+    selection = select_sources([near, far])
+    assert selection.offset_ms == pytest.approx(0.25)
+    assert selection.jitter_ms == pytest.approx(0.5)
+
+
+def test_midpoint_outside_intersection():
+    # Przedziały się pokrywają, ale środek szerszego leży poza przecięciem (RFC 5905)
+    selection = select_sources([source("near", 0.0, delay_ms=4.0), source("far", 5.0, delay_ms=16.0)])
+    assert selection.offset_ms is None
+
+
+def test_no_majority():
+    # Dwa rozłączne przedziały - żadna większość nie istnieje
+    selection = select_sources([source("a", 0.0), source("b", 100.0)])
+    assert selection.offset_ms is None
+    assert names(selection.falsetickers) == ["a", "b"]
+
+
+def test_order_does_not_matter():
+    candidates = [source(name, offset) for name, offset in
+                  (("a", 3.0), ("b", -2.0), ("c", 0.5), ("d", 40.0), ("e", 1.5))]
+    first = select_sources(candidates)
+    second = select_sources(reversed(candidates))
+    assert first.offset_ms == pytest.approx(second.offset_ms)
+    assert names(first.falsetickers) == names(second.falsetickers) == ["d"]
@@ -0,0 +1,121 @@
+"""Kodowanie i dekodowanie pakietów SNTP oraz zapytanie do lokalnego serwera zastępczego."""
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from timesync import sntp
+
+T1 = 1_700_000_000_000_000_000
+
+
+def respond(request, offset_ns, delay_ns, **options):
+    """Odpowiedź serwera o zadanym offsecie przy symetrycznym opóźnieniu delay_ns; zwraca (pakiet, T4)."""
+    receive = T1 + delay_ns // 2 + offset_ns
+    transmit = receive + 1_000
+    return sntp.build_response(request, receive, transmit, **options), T1 + delay_ns + 1_000
+
+
+@pytest.mark.parametrize("unix_ns", [0, T1, T1 + 123_456_789, -sntp.NTP_EPOCH_DELTA * 1_000_000_000 + 1])
+def test_ntp_time_round_trip(unix_ns):
+    # Ułamek sekundy NTP ma rozdzielczość ~0,23 ns
+    assert abs(sntp.from_ntp_time(sntp.to_ntp_time(unix_ns)) - unix_ns) <= 1
+
+
+def test_request_layout():
+    request = sntp.build_request(T1)
+    assert len(request) == sntp.NTP_PACKET_SIZE
+    assert request[0] == (sntp.NTP_VERSION << 3) | sntp.MODE_CLIENT
+    assert struct.unpack_from("!Q", request, 40)[0] == sntp.to_ntp_time(T1)
+
+
+@pytest.mark.parametrize("offset_ns", [0, 25_000_000, -1_500_000_000])
+def test_offset_and_delay(offset_ns):
+    response, t4 = respond(sntp.build_request(T1), offset_ns, 40_000_000, stratum=2, ref_id=b"\xc0\xa8\x00\x01")
+    result = sntp.parse_response(response, T1, t4, server="test")
+
+    assert result.offset_ms == pytest.approx(offset_ns / 1e6, abs=1e-5)
+    assert result.delay_ms == pytest.approx(40.0, abs=1e-5)
+    assert result.stratum == 2
+    assert result.ref_id == "192.168.0.1"
+    assert result.version == sntp.NTP_VERSION
+    assert result.server == "test"
+
+
+def test_ref_id_code_for_stratum_one():
+    response, t4 = respond(sntp.build_request(T1), 0, 1_000_000, stratum=1, ref_id=b"GPS\x00")
+    assert sntp.parse_response(response, T1, t4).ref_id == "GPS"
+
+
+def test_kiss_of_death():
+    response, t4 = respond(sntp.build_request(T1), 0, 1_000_000, stratum=0, ref_id=b"RATE")
+    with pytest.raises(sntp.KissOfDeath) as info:
+        sntp.parse_response(response, T1, t4, server="pool")
+    assert info.value.code == "RATE"
+    assert info.value.server == "pool"
+
+
+def test_rejects_short_packet():
+    with pytest.raises(sntp.NtpError):
+        sntp.parse_response(b"\x24" * 47, T1, T1)
+
+
+def test_rejects_unmatched_originate():
+    response, t4 = respond(sntp.build_request(T1), 0, 1_000_000)
+    with pytest.raises(sntp.NtpError):
+        sntp.parse_response(response, T1 + 1_000_000, t4)
+
+
+def test_rejects_client_mode():
+    response, t4 = respond(sntp.build_request(T1), 0, 1_000_000)
+    response = bytes([(sntp.NTP_VERSION << 3) | sntp.MODE_CLIENT]) + response[1:]
+    with pytest.raises(sntp.NtpError):
+        sntp.parse_response(response, T1, t4)
+
+
+def test_rejects_unsynchronized_server():
+    response, t4 = respond(sntp.build_request(T1), 0, 1_000_000, leap=3)
+    with pytest.raises(sntp.NtpError):
+        sntp.parse_response(response, T1, t4)
+
+
+@pytest.fixture
+def stand_in():
+    """Lokalny serwer zastępczy odpowiadający czasem przesuniętym o 250 ms."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                request, peer = sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            now = time.time_ns() + 250_000_000
+            sock.sendto(sntp.build_response(request, now, now, stratum=2, ref_id=b"\x7f\x00\x00\x01"), peer)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield sock.getsockname()[1]
+    stop.set()
+    thread.join()
+    sock.close()
+
+
+@pytest.mark.parametrize("kernel_timestamps", [True, False])
+def test_query_local_server(stand_in, kernel_timestamps):
+    result = sntp.query("127.0.0.1", stand_in, timeout=2.0, kernel_timestamps=kernel_timestamps)
+    assert result.offset_ms == pytest.approx(250.0, abs=20.0)
+    assert 0.0 <= result.delay_ms < 100.0
+    assert result.ref_id == "127.0.0.1"
+
+
+def test_query_timeout():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(("127.0.0.1", 0))
+        with pytest.raises(sntp.NtpError):
+            sntp.query("127.0.0.1", silent.getsockname()[1], timeout=0.2)
@@ -0,0 +1,97 @@
+"""Przegląd offsetu wielu hostów: cele, okno zapytań w locie i lokalne serwery zastępcze."""
+import asyncio
+import io
+import json
+import time
+
+import pytest
+
+from timesync import ntpserver, sntp, survey
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ntp.example.org", ("ntp.example.org", 123)),
+    (" 10.0.0.1:1123 ", ("10.0.0.1", 1123)),
+    ("[2001:db8::1]:124", ("2001:db8::1", 124)),
+    ("2001:db8::1", ("2001:db8::1", 123)),
+])
+def test_parse_target(text, expected):
+    assert survey.parse_target(text) == expected
+
+
+@pytest.mark.parametrize("text", ["host:port", "host:0", "[2001:db8::1", "[::1]x", ":123"])
+def test_parse_target_invalid(text):
+    with pytest.raises(ValueError):
+        survey.parse_target(text)
+
+
+def test_read_targets_skips_comments_and_errors():
+    lines = ["# centrum danych", "", "a.example:1000  # szafa 1", "b.example:zly", "c.example"]
+    assert list(survey.read_targets(lines)) == [("a.example", 1000), ("c.example", 123)]
+
+
+def test_window_bounds_queries_in_flight():
+    in_flight = 0
+    peak = 0
+
+    async def query(host, port, timeout):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        if port % 10 == 0:
+            raise sntp.NtpError("brak odpowiedzi")
+        if port % 10 == 1:
+            raise OSError("nieobsługiwany adres")
+        return sntp.NtpResult("host", float(port), 1.0, 2, "", 0, 4, 0, -20, 0.0, 0.0, 0.0)
+
+    entries = []
+    targets = (("host", port) for port in range(1, 101))
+    summary = asyncio.run(survey.survey(targets, entries.append, window=8, query=query, threshold_ms=50.0))
+
+    assert peak == 8
+    assert len(entries) == summary.total == 100
+    assert summary.failed == 20
+    assert summary.responded == 80
+    assert summary.over_threshold == len([p for p in range(51, 101) if p % 10 > 1])
+    assert summary.as_dict()["worst"] == "host:99"
+    assert any(entry.error.startswith("OSError") for entry in entries if entry.error)
+
+
+def test_survey_local_servers():
+    offsets_ns = [-300_000_000, 0, 125_000_000]
+    output = io.StringIO()
+    writer = survey.JsonLinesWriter(output)
+
+    async def main():
+        endpoints = {}
+        for offset in offsets_ns:
+            transport, _ = await ntpserver.start_server(
+                "127.0.0.1", 0, clock=lambda offset=offset: time.time_ns() + offset)
+            endpoints[transport.get_extra_info("sockname")[1]] = (transport, offset)
+        try:
+            targets = [("127.0.0.1", port) for port in endpoints] * 4
+            return endpoints, await survey.survey(targets, writer.write, window=5, timeout=2.0)
+        finally:
+            for transport, _ in endpoints.values():
+                transport.close()
+
+    endpoints, summary = asyncio.run(main())
+
+    assert summary.total == summary.responded == 12
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(rows) == 12
+    for row in rows:
+        assert row["error"] is None
+        assert row["offset_ms"] == pytest.approx(endpoints[row["port"]][1] / 1e6, abs=20.0)
+    assert summary.offset_min_ms == pytest.approx(-300.0, abs=20.0)
+
+
+def test_csv_writer_failed_host():
+    output = io.StringIO()
+    writer = survey.CsvWriter(output)
+    writer.write(survey.SurveyEntry("a.example", 123, None, "timeout"))
+    header, row = output.getvalue().splitlines()
+    assert header.split(",") == list(survey.FIELDS)
+    assert row.split(",")[0] == "a.example" and row.split(",")[-1] == "timeout"
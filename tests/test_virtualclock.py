@@ -0,0 +1,159 @@
+"""Arytmetyka zegara wirtualnego na sterowanych zegarach monotonicznym i systemowym."""
+import pytest
+
+from timesync.virtualclock import NS_PER_S, VirtualClock, at_ns, mono_at_ns, pending_ns
+
+WALL = 1_700_000_000 * NS_PER_S
+
+
+class Clocks:
+    """Zegar monotoniczny i systemowy przesuwane ręcznie (systemowy = WALL + monotoniczny)."""
+
+    def __init__(self):
+        self.mono = 0
+
+    def monotonic_ns(self):
+        return self.mono
+
+    def wall_ns(self):
+        return WALL + self.mono
+
+    def advance(self, seconds):
+        self.mono += int(seconds * NS_PER_S)
+
+
+@pytest.fixture
+def clocks():
+    return Clocks()
+
+
+def make_clock(clocks, **options):
+    return VirtualClock(monotonic_ns=clocks.monotonic_ns, wall_ns=clocks.wall_ns, **options)
+
+
+def test_offset(clocks):
+    clock = make_clock(clocks, offset_ns=1_500)
+    assert clock.now_ns() == WALL + 1_500
+    clocks.advance(10)
+    assert clock.offset_ns() == 1_500
+
+
+def test_rate(clocks):
+    clock = make_clock(clocks, rate=60)
+    clocks.advance(2)
+    assert clock.now_ns() == WALL + 120 * NS_PER_S
+
+    clock.set_rate(0)
+    clocks.advance(5)
+    assert clock.now_ns() == WALL + 120 * NS_PER_S
+    assert clock.generation == 1
+
+
+def test_fractional_rate_keeps_precision(clocks):
+    clock = make_clock(clocks, rate=1 / 3)
+    clocks.mono = 3 * 10 ** 6 * NS_PER_S
+    # Po ponad miesiącu pracy tempo 1/3 nadal daje dokładnie jedną trzecią upływu
+    assert clock.now_ns() == WALL + 10 ** 6 * NS_PER_S
+
+
+def test_negative_rate_rejected(clocks):
+    with pytest.raises(ValueError):
+        make_clock(clocks).set_rate(-1)
+
+
+def test_adjust_and_reset(clocks):
+    clock = make_clock(clocks)
+    clock.adjust(-250)
+    assert clock.offset_ns() == -250
+    clock.set_rate(2)
+    clock.reset()
+    clocks.advance(1)
+    assert clock.offset_ns() == 0
+    assert clock.rate == 1
+
+
+def test_slew(clocks):
+    clock = make_clock(clocks)
+    clock.slew(NS_PER_S, seconds=10)
+    assert clock.slewing
+
+    clocks.advance(5)
+    assert clock.offset_ns() == NS_PER_S // 2
+    assert pending_ns(clock.state, clocks.mono) == NS_PER_S // 2
+
+    clocks.advance(5)
+    assert not clock.slewing
+    assert clock.offset_ns() == NS_PER_S
+    assert pending_ns(clock.state, clocks.mono) == 0
+
+
+def test_slew_accumulates_pending_part(clocks):
+    clock = make_clock(clocks)
+    clock.slew(NS_PER_S, seconds=10)
+    clocks.advance(5)
+    # Niewprowadzone 0,5 s z pierwszej korekty jest doliczane do drugiej
+    clock.slew(NS_PER_S, seconds=10)
+    clocks.advance(10)
+    assert clock.offset_ns() == 2 * NS_PER_S
+
+
+def test_slew_to(clocks):
+    clock = make_clock(clocks, offset_ns=NS_PER_S)
+    clock.slew(NS_PER_S, seconds=10)
+    clocks.advance(3)
+    clock.slew_to(-NS_PER_S, seconds=4)
+    clocks.advance(4)
+    assert clock.offset_ns() == -NS_PER_S
+
+
+def test_slew_cannot_run_time_backwards(clocks):
+    clock = make_clock(clocks)
+    with pytest.raises(ValueError):
+        clock.slew(-10 * NS_PER_S, seconds=1)
+
+
+def test_slew_is_monotonic(clocks):
+    clock = make_clock(clocks, rate=3)
+    clock.slew(-NS_PER_S, seconds=2)
+    previous = clock.now_ns()
+    for _ in range(40):
+        clocks.advance(0.1)
+        now = clock.now_ns()
+        assert now >= previous
+        previous = now
+    assert clock.now_ns() - WALL == 3 * 4 * NS_PER_S - NS_PER_S
+
+
+def test_state_functions_match_clock(clocks):
+    clock = make_clock(clocks, rate=2)
+    clock.slew(NS_PER_S, seconds=1)
+    for mono in (0, NS_PER_S // 3, NS_PER_S, 5 * NS_PER_S):
+        clocks.mono = mono
+        assert at_ns(clock.state, mono) == clock.now_ns()
+
+
+@pytest.mark.parametrize("rate", [1, 60, 0.25])
+def test_mono_at_ns_inverts_at_ns(clocks, rate):
+    clock = make_clock(clocks, rate=rate)
+    clock.slew(7 * NS_PER_S // 10, seconds=3)
+    state = clock.state
+    for virtual in (WALL, WALL + 1, WALL + 2 * NS_PER_S + 17, WALL + 50 * NS_PER_S):
+        mono = mono_at_ns(state, virtual)
+        # Najwcześniejszy odczyt, przy którym czas wirtualny osiąga wartość docelową
+        assert at_ns(state, mono) >= virtual
+        assert mono == state.mono_ns or at_ns(state, mono - 1) < virtual
+
+
+def test_mono_at_ns_frozen(clocks):
+    clock = make_clock(clocks, rate=0)
+    assert mono_at_ns(clock.state, WALL) == 0
+    assert mono_at_ns(clock.state, WALL + 1) is None
+
+
+def test_on_change(clocks):
+    changes = []
+    clock = make_clock(clocks, on_change=changes.append)
+    clock.set_rate(60)
+    clock.adjust(5)
+    assert [state.generation for state in changes] == [1, 2]
+    assert changes[-1] is clock.state
@@ -0,0 +1 @@
+"""Moduły pomocnicze aplikacji ZegarSync (bez zależności od tkinter)."""
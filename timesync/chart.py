@@ -0,0 +1,220 @@
+"""Dane wykresu offsetu i opóźnienia: decymacja min/max na kolumnę pikseli, aktualizowana przyrostowo.
+
+Każda seria (metryka, serwer) to kolejka kolumn pikseli [kolumna, min, max,
+ostatnia wartość, element rysunku]. Nowy pomiar zmienia tylko ostatnią
+kolumnę serii albo dokłada nową, więc koszt nie zależy od długości historii;
+liczba kolumn jest ograniczona szerokością wykresu. Pełne przeliczenie
+(zmiana szerokości lub zakresu czasu) korzysta z historii pomiarów
+i - jeśli jest NumPy - z wektorowego min/max (reduceat).
+
+Moduł nie zależy od tkinter; rysowaniem zajmuje się chartview.OffsetChart.
+"""
+from collections import deque
+
+from timesync.history import SAMPLE, load_numpy
+
+# Rysowane metryki (kolumny historii pomiarów)
+METRICS = ("offset_ms", "delay_ms")
+
+# Pola wpisu kolumny
+COLUMN, LOW, HIGH, LAST, ITEM = range(5)
+
+DEFAULT_WIDTH = 800
+DEFAULT_WINDOW_S = 3600.0
+
+# Zapas zakresu osi Y przy jego rozszerzaniu (część rozpiętości)
+RANGE_MARGIN = 0.2
+
+
+class ColumnSeries:
+    """Kolumny pikseli jednej serii w kolejności czasu."""
+
+    def __init__(self):
+        self.columns = deque()
+
+    def add(self, column, value):
+        """Dopisuje wartość do kolumny; zwraca (wpis, czy to nowa kolumna)."""
+        columns = self.columns
+        if columns:
+            entry = columns[-1]
+            if entry[COLUMN] == column:
+                if value < entry[LOW]:
+                    entry[LOW] = value
+                elif value > entry[HIGH]:
+                    entry[HIGH] = value
+                entry[LAST] = value
+                return entry, False
+            if entry[COLUMN] > column:
+                return self._insert(column, value)
+        entry = [column, value, value, value, None]
+        columns.append(entry)
+        return entry, True
+
+    def _insert(self, column, value):
+        """Pomiar spóźniony względem ostatniej kolumny (rzadkie) - wyszukiwanie od końca."""
+        columns = self.columns
+        index = len(columns) - 1
+        while index > 0 and columns[index - 1][COLUMN] >= column:
+            index -= 1
+        entry = columns[index]
+        if entry[COLUMN] == column:
+            entry[LOW] = min(entry[LOW], value)
+            entry[HIGH] = max(entry[HIGH], value)
+            return entry, False
+        entry = [column, value, value, value, None]
+        columns.insert(index, entry)
+        return entry, True
+
+    def previous(self, entry):
+        """Wpis poprzedzający ostatni wpis serii (do połączenia linią) lub None."""
+        columns = self.columns
+        if len(columns) > 1 and columns[-1] is entry:
+            return columns[-2]
+        return None
+
+    def trim(self, first_column):
+        """Usuwa kolumny sprzed first_column; zwraca usunięte wpisy."""
+        columns = self.columns
+        removed = []
+        while columns and columns[0][COLUMN] < first_column:
+            removed.append(columns.popleft())
+        return removed
+
+
+class ChartModel:
+    """Zdecymowane serie offsetu i opóźnienia dla okna window_s sekund na width kolumnach pikseli."""
+
+    def __init__(self, width=DEFAULT_WIDTH, window_s=DEFAULT_WINDOW_S):
+        self.width = max(int(width), 1)
+        self.window_s = window_s
+        self.seconds_per_column = window_s / self.width
+        self.series = {}        # (metryka, serwer) -> ColumnSeries
+
+    def column(self, timestamp):
+        return int(timestamp // self.seconds_per_column)
+
+    def first_column(self, now):
+        """Pierwsza widoczna kolumna, gdy ostatnia odpowiada chwili now."""
+        return self.column(now) - self.width + 1
+
+    def _series(self, metric, server):
+        key = (metric, server)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = ColumnSeries()
+        return series
+
+    def add(self, timestamp, server, offset_ms, delay_ms):
+        """Dopisuje pomiar; zwraca listę zmian (metryka, serwer, wpis, czy nowa kolumna)."""
+        column = self.column(timestamp)
+        changes = []
+        for metric, value in zip(METRICS, (offset_ms, delay_ms)):
+            entry, new = self._series(metric, server).add(column, value)
+            changes.append((metric, server, entry, new))
+        return changes
+
+    def add_records(self, records, servers):
+        """Dopisuje pomiary z history.HistoryRange; zwraca listę zmian."""
+        changes = []
+        for t, offset, delay, server_id, kind in zip(records.timestamp, records.offset_ms, records.delay_ms,
+                                                      records.server, records.kind):
+            if kind == SAMPLE:
+                changes.extend(self.add(float(t), servers[server_id], float(offset), float(delay)))
+        return changes
+
+    def load(self, records, servers, now):
+        """Buduje serie od nowa z pomiarów history.HistoryRange z widocznego okna czasu."""
+        self.series = {}
+        first = self.first_column(now)
+        numpy = load_numpy()
+        if numpy is None:
+            for t, offset, delay, server_id, kind in zip(records.timestamp, records.offset_ms, records.delay_ms,
+                                                          records.server, records.kind):
+                if kind == SAMPLE and self.column(t) >= first:
+                    self.add(t, servers[server_id], offset, delay)
+            return
+
+        mask = (records.kind == SAMPLE) & (records.timestamp >= first * self.seconds_per_column)
+        server_ids = records.server[mask]
+        order = numpy.argsort(server_ids, kind="stable")
+        server_ids = server_ids[order]
+        columns = (records.timestamp[mask][order] // self.seconds_per_column).astype(numpy.int64)
+        if not len(columns):
+            return
+        # Granice grup o tym samym serwerze i tej samej kolumnie pikseli
+        changed = (numpy.diff(server_ids) != 0) | (numpy.diff(columns) != 0)
+        starts = numpy.concatenate(([0], numpy.flatnonzero(changed) + 1))
+        ends = numpy.concatenate((starts[1:], [len(columns)]))
+        group_servers = server_ids[starts].tolist()
+        group_columns = columns[starts].tolist()
+        for metric in METRICS:
+            values = getattr(records, metric)[mask][order]
+            lows = numpy.minimum.reduceat(values, starts).tolist()
+            highs = numpy.maximum.reduceat(values, starts).tolist()
+            lasts = values[ends - 1].tolist()
+            for server_id, column, low, high, last in zip(group_servers, group_columns, lows, highs, lasts):
+                self._series(metric, servers[server_id]).columns.append([column, low, high, last, None])
+
+    def trim(self, now):
+        """Usuwa kolumny, które wyszły poza okno; zwraca usunięte wpisy."""
+        first = self.first_column(now)
+        removed = []
+        for series in self.series.values():
+            removed.extend(series.trim(first))
+        return removed
+
+    def value_range(self, metric):
+        """Zakres wartości metryki we wszystkich seriach (None, gdy brak danych)."""
+        lows = [min(entry[LOW] for entry in series.columns)
+                for (name, _), series in self.series.items() if name == metric and series.columns]
+        if not lows:
+            return None
+        highs = [max(entry[HIGH] for entry in series.columns)
+                 for (name, _), series in self.series.items() if name == metric and series.columns]
+        return min(lows), max(highs)
+
+
+def expand_range(current, low, high, margin=RANGE_MARGIN):
+    """Zakres osi obejmujący current i [low, high] z zapasem (None, gdy nie trzeba go zmieniać)."""
+    if current is not None and current[0] <= low and high <= current[1]:
+        return None
+    if current is not None:
+        low = min(low, current[0])
+        high = max(high, current[1])
+    span = high - low or max(abs(high), 1.0)
+    return low - span * margin, high + span * margin
+
+
+def benchmark(points=300000, servers=8, width=DEFAULT_WIDTH, window_s=DEFAULT_WINDOW_S):
+    """Koszt dopisywania pomiarów do wykresu i pełnego przeliczenia z historii."""
+    import random
+    import time
+
+    from timesync.history import HistoryStore
+
+    rng = random.Random(1)
+    store = HistoryStore(points)
+    names = [f"ntp{i}.example" for i in range(servers)]
+    start_time = 1.7e9
+    step = window_s / points
+    for i in range(points):
+        store.append(start_time + i * step, names[i % servers], rng.gauss(0, 1), 5 + rng.random())
+    now = start_time + window_s
+
+    model = ChartModel(width, window_s)
+    start = time.perf_counter()
+    model.add_records(store.range(), store.servers)
+    add_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model.load(store.range(), store.servers, now)
+    load_s = time.perf_counter() - start
+
+    return {
+        "numpy": load_numpy() is not None,
+        "points": points,
+        "adds_per_s": points / add_s,
+        "load_ms": load_s * 1000,
+        "columns": sum(len(series.columns) for series in model.series.values()),
+        "max_columns": width * servers * len(METRICS),
+    }
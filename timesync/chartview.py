@@ -0,0 +1,206 @@
+"""Wykres offsetu i opóźnienia pomiarów (tkinter Canvas) - widok modelu chart.ChartModel.
+
+Moduł jest importowany dopiero przy pierwszym wyświetleniu zakładki "Wykres".
+"""
+import logging
+import time
+import tkinter as tk
+
+from timesync import chart
+
+
+# Zakresy czasu wykresu pomiarów (s)
+CHART_WINDOWS = {"10 min": 600, "1 h": 3600, "6 h": 6 * 3600, "24 h": 24 * 3600, "7 dni": 7 * 24 * 3600}
+
+
+class OffsetChart:
+    """Wykres offsetu (górny panel) i opóźnienia (dolny panel) pomiarów z historii na Canvas.
+
+    Co interval_ms odczytywane są tylko nowe wpisy historii; każdy zmienia
+    jeden element rysunku (kolumnę pikseli serii). Przesunięcie okna czasu
+    to jedno canvas.move, a rozszerzenie skali osi Y - canvas.scale na
+    panelu. Pełne przeliczenie (zmiana rozmiaru lub zakresu czasu) wykonuje
+    się w tle i nie wstrzymuje taktów zegara.
+    """
+
+    MARGIN_LEFT = 70
+    MARGIN = 12
+    PALETTE = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b", "#e377c2", "#17becf")
+    TITLES = {"offset_ms": "Offset [ms]", "delay_ms": "Opóźnienie [ms]"}
+
+    def __init__(self, parent, store, background, window_s=chart.DEFAULT_WINDOW_S, interval_ms=1000):
+        self.store = store
+        self.background = background
+        self.window_s = window_s
+        self.interval_ms = interval_ms
+        self.canvas = tk.Canvas(parent, background="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.model = chart.ChartModel(1, window_s)
+        self.seen = 0
+        self.first = 0
+        self.ranges = {}
+        self.colors = {}
+        self.loading = False
+        self._size = None
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.after(self.interval_ms, self.refresh)
+
+    def panel(self, metric):
+        """Górna krawędź i wysokość panelu metryki."""
+        height = max(self.canvas.winfo_height() - 3 * self.MARGIN, 2) / 2
+        index = chart.METRICS.index(metric)
+        return self.MARGIN + index * (height + self.MARGIN), height
+
+    def y(self, metric, value):
+        top, height = self.panel(metric)
+        low, high = self.ranges[metric]
+        return top + height - (value - low) / (high - low) * height
+
+    def plot_width(self):
+        return max(self.canvas.winfo_width() - self.MARGIN_LEFT - self.MARGIN, 1)
+
+    def on_resize(self, event):
+        size = (event.width, event.height)
+        if size != self._size:
+            self._size = size
+            self.reload()
+
+    def set_window(self, window_s):
+        """Zmienia zakres czasu wykresu (s)."""
+        self.window_s = window_s
+        self.reload()
+
+    def reload(self):
+        """Przelicza wykres z historii pomiarów w tle."""
+        if self.loading:
+            return
+        self.loading = True
+        width = self.plot_width()
+        window_s = self.window_s
+
+        def load():
+            now = time.time()
+            model = chart.ChartModel(width, window_s)
+            total = self.store.total
+            try:
+                model.load(self.store.range(now - window_s), list(self.store.servers), now)
+            except Exception as e:
+                logging.warning(f"Nie udało się przygotować wykresu pomiarów: {str(e)}")
+                model = chart.ChartModel(width, window_s)
+            self.canvas.after(0, self.install, model, total, now)
+
+        self.background.run_blocking(load)
+
+    def install(self, model, total, now):
+        """Podmienia przeliczony model i rysuje go w całości (wątek GUI)."""
+        self.model = model
+        self.seen = total
+        self.loading = False
+        if self.plot_width() != model.width or self.window_s != model.window_s:
+            # Rozmiar lub zakres czasu zmienił się w trakcie przeliczania
+            return self.reload()
+        self.first = model.first_column(now)
+        self.ranges = {}
+        for metric in chart.METRICS:
+            value_range = model.value_range(metric)
+            if value_range is not None:
+                self.ranges[metric] = chart.expand_range(None, *value_range)
+        self.redraw()
+
+    def redraw(self):
+        """Rysuje wszystkie widoczne kolumny (tylko po przeliczeniu modelu)."""
+        canvas = self.canvas
+        canvas.delete("all")
+        self.draw_axes()
+        for (metric, server), series in self.model.series.items():
+            previous = None
+            for entry in series.columns:
+                entry[chart.ITEM] = None
+                self.draw(metric, server, entry, previous)
+                previous = entry
+
+    def draw_axes(self):
+        canvas = self.canvas
+        canvas.delete("axes")
+        right = canvas.winfo_width() - self.MARGIN
+        for metric in chart.METRICS:
+            top, height = self.panel(metric)
+            canvas.create_rectangle(self.MARGIN_LEFT, top, right, top + height, outline="#bbbbbb", tags="axes")
+            canvas.create_text(self.MARGIN_LEFT + 4, top + 2, anchor=tk.NW, text=self.TITLES[metric], tags="axes")
+            value_range = self.ranges.get(metric)
+            if value_range is not None:
+                canvas.create_text(self.MARGIN_LEFT - 4, top, anchor=tk.NE, text=f"{value_range[1]:.2f}", tags="axes")
+                canvas.create_text(self.MARGIN_LEFT - 4, top + height, anchor=tk.SE, text=f"{value_range[0]:.2f}",
+                                   tags="axes")
+        for index, (server, color) in enumerate(self.colors.items()):
+            canvas.create_text(right - 4, self.MARGIN + 2 + 14 * index, anchor=tk.NE, text=server, fill=color,
+                               tags="axes")
+
+    def color(self, server):
+        color = self.colors.get(server)
+        if color is None:
+            color = self.colors[server] = self.PALETTE[len(self.colors) % len(self.PALETTE)]
+            self.draw_axes()
+        return color
+
+    def draw(self, metric, server, entry, previous):
+        """Rysuje lub aktualizuje element jednej kolumny pikseli serii."""
+        if metric not in self.ranges:
+            return
+        x = self.MARGIN_LEFT + entry[chart.COLUMN] - self.first
+        coords = [x, self.y(metric, entry[chart.LOW]), x, self.y(metric, entry[chart.HIGH]),
+                  x + 1, self.y(metric, entry[chart.LAST])]
+        if previous is not None and previous[chart.COLUMN] >= self.first:
+            # Połączenie z ostatnią wartością poprzedniej kolumny serii
+            coords[:0] = [x - (entry[chart.COLUMN] - previous[chart.COLUMN]) + 1, self.y(metric, previous[chart.LAST])]
+        if entry[chart.ITEM] is None:
+            entry[chart.ITEM] = self.canvas.create_line(*coords, fill=self.color(server), tags=("data", metric))
+        else:
+            self.canvas.coords(entry[chart.ITEM], *coords)
+
+    def rescale(self, metric, value_range):
+        """Zmienia zakres osi Y panelu przekształceniem istniejących elementów."""
+        old = self.ranges.get(metric)
+        self.ranges[metric] = value_range
+        if old is not None:
+            top, height = self.panel(metric)
+            bottom = top + height
+            factor = (old[1] - old[0]) / (value_range[1] - value_range[0])
+            self.canvas.scale(metric, 0, bottom, 1, factor)
+            self.canvas.move(metric, 0, -(old[0] - value_range[0]) * height / (value_range[1] - value_range[0]))
+        self.draw_axes()
+
+    def refresh(self):
+        """Dorysowuje nowe pomiary z historii i przesuwa okno czasu."""
+        try:
+            if not self.loading and self.model.width > 1:
+                self.update(time.time())
+        finally:
+            self.canvas.after(self.interval_ms, self.refresh)
+
+    def update(self, now):
+        records, self.seen = self.store.since(self.seen)
+        changes = self.model.add_records(records, self.store.servers) if len(records.timestamp) else []
+
+        first = self.model.first_column(now)
+        if first != self.first:
+            self.canvas.move("data", self.first - first, 0)
+            self.first = first
+            removed = [entry[chart.ITEM] for entry in self.model.trim(now) if entry[chart.ITEM] is not None]
+            if removed:
+                self.canvas.delete(*removed)
+
+        for metric in chart.METRICS:
+            values = [value for m, _, entry, _ in changes if m == metric
+                      for value in (entry[chart.LOW], entry[chart.HIGH])]
+            if values:
+                value_range = chart.expand_range(self.ranges.get(metric), min(values), max(values))
+                if value_range is not None:
+                    had_range = metric in self.ranges
+                    self.rescale(metric, value_range)
+                    if not had_range:
+                        return self.redraw()
+
+        for metric, server, entry, new in changes:
+            if entry[chart.COLUMN] >= first:
+                self.draw(metric, server, entry, self.model.series[(metric, server)].previous(entry))
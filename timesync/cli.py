@@ -0,0 +1,551 @@
+"""Tryb bez interfejsu graficznego: pomiar offsetu, synchronizacja i praca jako demon."""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from timesync.logsetup import LOG_FORMAT, start_file_logging
+from timesync.sntp import NTP_PORT
+
+# Budżet czasu startu trybu bez GUI (od uruchomienia time.py do wykonania polecenia)
+STARTUP_BUDGET_MS = 150.0
+
+DEFAULT_SERVER = "tempus1.gum.gov.pl"
+
+# Pomiary wydajności: nazwa -> moduł z funkcją benchmark()
+BENCHMARKS = {
+    "chart": "timesync.chart",
+    "clockwall": "timesync.clockwall",
+    "history": "timesync.history",
+    "logbuffer": "timesync.logbuffer",
+    "metrics": "timesync.metrics",
+    "netsim": "timesync.netsim",
+    "ntpserver": "timesync.ntpserver",
+    "resolver": "timesync.resolver",
+    "shmclock": "timesync.shmclock",
+    "stability": "timesync.stability",
+    "survey": "timesync.survey",
+    "timestamps": "timesync.sntp",
+    "sync": "timesync.tracing",
+    "ticker": "timesync.ticker",
+    "timepatch": "timesync.timepatch",
+    "virtualclock": "timesync.virtualclock",
+}
+
+
+def build_parser():
+    """Tworzy parser argumentów linii poleceń."""
+    parser = argparse.ArgumentParser(prog="time.py --headless",
+                                     description="ZegarSync - praca bez interfejsu graficznego")
+    parser.add_argument("--headless", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("-v", "--verbose", action="store_true", help="szczegółowe logi (DEBUG)")
+    parser.add_argument("--startup-budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="budżet czasu startu; przekroczenie jest zgłaszane w logu")
+    parser.add_argument("--log-file", help="zapisuj logi do pliku (z rotacją i kompresją)")
+    parser.add_argument("--log-json", action="store_true", help="format JSON lines w pliku logów")
+    parser.add_argument("--log-max-bytes", type=int, default=None,
+                        help="rotacja pliku logów po przekroczeniu rozmiaru")
+    parser.add_argument("--log-rotate-when", default=None,
+                        help="rotacja pliku logów wg czasu, np. midnight lub H")
+    parser.add_argument("--trace", metavar="PLIK",
+                        help="zapisz czasy etapów do pliku Chrome trace (JSON) i wypisz podsumowanie")
+    commands = parser.add_subparsers(dest="command", metavar="POLECENIE")
+    commands.required = True
+
+    query = commands.add_parser("query", help="zmierz offset zegara względem serwerów NTP")
+    query.add_argument("servers", nargs="*", help="serwery NTP (domyślnie popularne serwery)")
+    query.add_argument("--port", type=int, default=NTP_PORT)
+    query.add_argument("--timeout", type=float, default=2.0)
+
+    sync = commands.add_parser("sync", help="zsynchronizuj zegar systemowy")
+    sync.add_argument("--server", default=DEFAULT_SERVER)
+    sync.add_argument("--single", action="store_true", help="nie odpytuj popularnych serwerów")
+    sync.add_argument("--simulate", action="store_true", help="tylko symulacja (tryb testowy)")
+    sync.add_argument("--attempts", type=int, default=2, help="maksymalna liczba prób resynchronizacji")
+
+    serve = commands.add_parser("serve", help="ciągła dyscyplina zegara (tryb demona)")
+    serve.add_argument("--server", default=DEFAULT_SERVER)
+    serve.add_argument("--threshold-ms", type=float, default=None,
+                       help="próg przewidywanego offsetu wyzwalający synchronizację")
+    serve.add_argument("--no-auto-sync", action="store_true",
+                       help="tylko monitorowanie, bez synchronizacji zegara")
+    serve.add_argument("--history", metavar="PLIK", default=None,
+                       help="zapisuj pomiary w pliku historii (bufor cykliczny)")
+    serve.add_argument("--metrics-port", type=int, default=None,
+                       help="udostępniaj metryki Prometheus przez HTTP na tym porcie")
+    serve.add_argument("--metrics-bind", default="127.0.0.1", help="adres nasłuchiwania metryk")
+
+    survey = commands.add_parser("survey", help="zmierz offset zegarów wielu hostów NTP (CSV lub JSON lines)")
+    survey.add_argument("targets", help="plik z listą host[:port], jeden w linii (- to standardowe wejście)")
+    survey.add_argument("-o", "--output", default="-", help="plik wyników (domyślnie standardowe wyjście)")
+    survey.add_argument("--format", choices=("csv", "jsonl"), default=None,
+                        help="format wyników (domyślnie wg rozszerzenia pliku, inaczej csv)")
+    survey.add_argument("--port", type=int, default=NTP_PORT, help="port dla hostów bez podanego portu")
+    survey.add_argument("--window", type=int, default=256, help="najwięcej zapytań w locie")
+    survey.add_argument("--timeout", type=float, default=2.0)
+    survey.add_argument("--threshold-ms", type=float, default=100.0,
+                        help="offset, powyżej którego host jest liczony jako rozregulowany")
+
+    commands.add_parser("status", help="pokaż stan usługi czasu")
+
+    server = commands.add_parser("ntpserver", help="udostępnij czas systemowy lub wirtualny jako serwer NTP")
+    server.add_argument("--bind", default="0.0.0.0", help="adres nasłuchiwania")
+    server.add_argument("--port", type=int, default=NTP_PORT)
+    server.add_argument("--virtual", action="store_true",
+                        help="podawaj czas wirtualny udostępniony przez aplikację")
+    server.add_argument("--path", default=None, help="plik zegara współdzielonego")
+    server.add_argument("--unsynchronized", action="store_true",
+                        help="oznaczaj czas jako niezsynchronizowany (LI=3) - klienci NTP go nie użyją")
+
+    loadgen = commands.add_parser("loadgen", help="zmierz przepustowość serwera NTP")
+    loadgen.add_argument("host", nargs="?", default="127.0.0.1")
+    loadgen.add_argument("--port", type=int, default=NTP_PORT)
+    loadgen.add_argument("--seconds", type=float, default=5.0)
+    loadgen.add_argument("--window", type=int, default=64, help="liczba zapytań wysyłanych w jednej partii")
+
+    clock = commands.add_parser("clock", help="pokaż czas wirtualny udostępniony przez aplikację")
+    clock.add_argument("--path", default=None, help="plik zegara współdzielonego")
+
+    history = commands.add_parser("history", help="pokaż ostatnie wpisy historii pomiarów")
+    history.add_argument("path", nargs="?", default=None, help="plik historii")
+    history.add_argument("-n", "--count", type=int, default=20, help="liczba wpisów")
+    history.add_argument("--server", default=None, help="tylko wpisy jednego serwera")
+
+    stats = commands.add_parser("stats", help="statystyki stabilności zegara z historii pomiarów")
+    stats.add_argument("path", nargs="?", default=None, help="plik historii")
+    stats.add_argument("--server", default=None, help="tylko jeden serwer")
+    stats.add_argument("--hours", type=float, default=None, help="tylko pomiary z ostatnich godzin")
+
+    simulate = commands.add_parser("simulate", help="dyscyplina zegara na symulowanej sieci serwerów NTP")
+    simulate.add_argument("--servers", type=int, default=100, help="liczba serwerów symulowanych")
+    simulate.add_argument("--hours", type=float, default=24.0, help="czas symulacji")
+    simulate.add_argument("--seed", type=int, default=1, help="ziarno generatora (ten sam seed - ten sam przebieg)")
+    simulate.add_argument("--falsetickers", type=float, default=0.05, help="odsetek fałszywych źródeł")
+    simulate.add_argument("--loss", type=float, default=0.01, help="prawdopodobieństwo utraty pakietu")
+    simulate.add_argument("--history", metavar="PLIK", default=None, help="zapisuj pomiary w pliku historii")
+
+    bench = commands.add_parser("bench", help="uruchom pomiar wydajności")
+    bench.add_argument("name", choices=sorted(BENCHMARKS))
+    return parser
+
+
+def setup_logging(args):
+    """Konfiguracja logowania na standardowe wyjście błędów i opcjonalnie do pliku."""
+    level = logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=level, format=LOG_FORMAT, stream=sys.stderr)
+
+    if args.log_file:
+        options = {"json_lines": args.log_json, "when": args.log_rotate_when}
+        if args.log_max_bytes is not None:
+            options["max_bytes"] = args.log_max_bytes
+        start_file_logging(args.log_file, level=level, **options)
+
+
+def report_startup(started, budget_ms):
+    """Loguje czas startu trybu bez GUI i ostrzega po przekroczeniu budżetu."""
+    if started is None:
+        return None
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if "tkinter" in sys.modules:
+        logging.warning("Tryb bez GUI zaimportował tkinter")
+    if elapsed_ms > budget_ms:
+        logging.warning(f"Start trybu bez GUI: {elapsed_ms:.1f} ms (przekroczony budżet {budget_ms:.0f} ms)")
+    else:
+        logging.debug(f"Start trybu bez GUI: {elapsed_ms:.1f} ms (budżet {budget_ms:.0f} ms)")
+    return elapsed_ms
+
+
+def write_trace(tracer, path):
+    """Zapisuje zebrane spany do pliku Chrome trace i loguje histogram czasów etapów."""
+    tracer.write_chrome_trace(path)
+    logging.info(f"Zapisano {len(tracer.spans)} spanów do pliku {path}")
+    for line in tracer.summary_lines():
+        logging.info(line)
+
+
+def cmd_query(args):
+    """Odpytuje serwery równolegle i wypisuje offsety oraz wybrane źródło."""
+    from timesync import poller, sync
+
+    servers = args.servers or sync.POPULAR_SERVERS
+    outcome = poller.poll(servers, args.port, args.timeout)
+    survivors = {id(r) for r in outcome.selection.survivors}
+
+    print(f"{'SERWER':<30} {'OFFSET [ms]':>12} {'OPÓŹN. [ms]':>12} {'STRATUM':>8}  ŹRÓDŁO")
+    for result in outcome.results:
+        mark = "*" if id(result) in survivors else "x"
+        print(f"{mark}{result.server:<29} {result.offset_ms:>+12.3f} {result.delay_ms:>12.3f} "
+              f"{result.stratum:>8}  {result.ref_id}")
+    for server, error in outcome.failures.items():
+        print(f"-{server:<29} {str(error)}")
+
+    selection = outcome.selection
+    if selection.offset_ms is None:
+        print("Brak zgodnej większości źródeł czasu")
+        return 1
+    sources = sorted({r.timestamping for r in outcome.results})
+    print(f"Offset: {selection.offset_ms:+.3f} ms, rozrzut: {selection.jitter_ms:.3f} ms, "
+          f"czas: {outcome.elapsed_ms:.0f} ms, znaczniki czasu: {', '.join(sources)}")
+    return 0
+
+
+def cmd_survey(args):
+    """Odpytuje hosty z pliku i zapisuje offsety w chwili nadejścia odpowiedzi."""
+    from timesync import survey
+
+    fmt = args.format or ("jsonl" if args.output.endswith((".jsonl", ".json")) else "csv")
+    try:
+        source = sys.stdin if args.targets == "-" else open(args.targets, encoding="utf-8")
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    except OSError as e:
+        logging.error(f"Nie udało się otworzyć pliku: {str(e)}")
+        return 1
+
+    try:
+        summary = survey.run(survey.read_targets(source, args.port), survey.WRITERS[fmt](output),
+                             args.window, args.timeout, args.threshold_ms)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    results = summary.as_dict()
+    stats = ", ".join(f"{key}: {value:.6g}" if isinstance(value, float) else f"{key}: {value}"
+                      for key, value in results.items())
+    logging.info(f"Przegląd zakończony - {stats}")
+    return 0 if summary.responded else 1
+
+
+def cmd_sync(args):
+    """Synchronizuje zegar systemowy (lub symuluje synchronizację)."""
+    from timesync import service, sync
+
+    if args.simulate:
+        sync.simulate_sync(args.server)
+        return 0
+    if not sync.is_admin():
+        logging.error("Synchronizacja czasu wymaga uprawnień administratora.")
+        return 2
+
+    try:
+        result = sync.sync_time(args.server, multi_server=not args.single, attempts=args.attempts)
+    except service.ServiceError as e:
+        logging.error(f"Nie można synchronizować zegara: {str(e)}")
+        return 1
+    print(result.message)
+    return 0 if result.success else 1
+
+
+def cmd_status(args):
+    """Wypisuje raport o stanie usługi czasu."""
+    from timesync import service, sync
+
+    try:
+        print(sync.service_report(DEFAULT_SERVER))
+    except service.ServiceError as e:
+        logging.error(f"Nie można odczytać stanu usługi czasu: {str(e)}")
+        return 1
+    return 0
+
+
+def cmd_clock(args):
+    """Wypisuje czas wirtualny odczytany z pamięci współdzielonej."""
+    from datetime import datetime
+
+    from timesync import shmclock
+
+    try:
+        clock = shmclock.SharedClock(args.path or shmclock.DEFAULT_PATH)
+    except (OSError, shmclock.SharedClockError) as e:
+        logging.error(f"Brak zegara wirtualnego: {str(e)}")
+        return 1
+    with clock:
+        state = clock.state()
+        now_ns = clock.now_ns()
+    if state is None:
+        print("Zegar wirtualny nie został jeszcze opublikowany")
+        return 1
+    offset_ms = (now_ns - time.time_ns()) / 1e6
+    print(f"Czas wirtualny: {datetime.fromtimestamp(now_ns / 1e9):%Y-%m-%d %H:%M:%S.%f}")
+    print(f"Offset: {offset_ms:+.3f} ms, tempo: {state.num / state.den:g}x, zmiana nr {state.generation}")
+    return 0
+
+
+def cmd_ntpserver(args):
+    """Udostępnia czas jako serwer NTP do czasu otrzymania SIGINT/SIGTERM."""
+    from timesync import ntpserver
+    from timesync.eventloop import BackgroundLoop
+
+    options = {}
+    source = "czas systemowy"
+    clock = None
+    if args.virtual:
+        from timesync import shmclock
+
+        try:
+            clock = shmclock.SharedClock(args.path or shmclock.DEFAULT_PATH)
+        except (OSError, shmclock.SharedClockError) as e:
+            logging.error(f"Brak zegara wirtualnego: {str(e)}")
+            return 1
+        options = {"clock": clock.now_ns, "stratum": ntpserver.STRATUM_VIRTUAL,
+                   "ref_id": ntpserver.REF_ID_VIRTUAL}
+        source = "czas wirtualny"
+    if args.unsynchronized:
+        options["leap"] = ntpserver.LEAP_UNSYNCHRONIZED
+
+    background = BackgroundLoop()
+    try:
+        try:
+            transport, protocol = background.submit(
+                ntpserver.start_server(args.bind, args.port, **options)).result()
+        except OSError as e:
+            logging.error(f"Nie udało się uruchomić serwera NTP: {str(e)}")
+            background.stop()
+            return 1
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+        logging.info(f"Serwer NTP nasłuchuje na {args.bind}:{args.port} ({source}, "
+                     f"znaczniki odbioru: {protocol.timestamping})")
+        while not stop.wait(1):
+            pass
+        background.loop.call_soon_threadsafe(transport.close)
+        background.stop(timeout=5)
+    finally:
+        # Pamięć zegara współdzielonego zamykamy dopiero po zatrzymaniu pętli serwera
+        if clock is not None:
+            clock.close()
+    logging.info(f"Zatrzymano serwer NTP (zapytania: {protocol.requests}, odrzucone: {protocol.dropped})")
+    return 0
+
+
+def cmd_loadgen(args):
+    """Obciąża serwer NTP zapytaniami i wypisuje przepustowość."""
+    from timesync import ntpserver
+
+    results = ntpserver.load_test(args.host, args.port, args.seconds, args.window)
+    print(f"Wysłane: {results['sent']}, odpowiedzi: {results['received']}, zgubione: {results['lost']}")
+    print(f"Przepustowość: {results['responses_per_s']:.0f} odpowiedzi/s")
+    return 0 if results["received"] else 1
+
+
+def cmd_serve(args):
+    """Uruchamia pętlę dyscypliny zegara do czasu otrzymania SIGINT/SIGTERM."""
+    from timesync import service as time_service
+    from timesync import sync
+    from timesync.discipline import DEFAULT_THRESHOLD_MS, DisciplineService
+    from timesync.eventloop import BackgroundLoop
+
+    syncing = threading.Lock()
+    auto_sync = not args.no_auto_sync and sync.is_admin()
+    if not args.no_auto_sync and not auto_sync:
+        logging.warning("Brak uprawnień administratora - tylko monitorowanie offsetu.")
+
+    controller = None
+    if auto_sync:
+        try:
+            controller = time_service.default_controller()
+        except time_service.ServiceError as e:
+            logging.error(f"Nie można synchronizować zegara: {str(e)}")
+            return 1
+
+    def run_sync():
+        try:
+            if sync.sync_time(args.server, controller=controller).success:
+                service.sync_completed()
+        finally:
+            syncing.release()
+
+    def sync_done(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.error(f"Błąd synchronizacji: {str(future.exception())}")
+
+    def on_sync_needed(predicted):
+        if auto_sync and syncing.acquire(blocking=False):
+            background.run_blocking(run_sync).add_done_callback(sync_done)
+
+    background = BackgroundLoop()
+
+    metrics_server = None
+    if args.metrics_port is not None:
+        from timesync import metrics
+
+        try:
+            metrics_server = background.submit(metrics.start_server(args.metrics_bind, args.metrics_port)).result()
+        except OSError as e:
+            logging.error(f"Nie udało się uruchomić punktu końcowego metryk: {str(e)}")
+            background.stop()
+            return 1
+        logging.info(f"Metryki Prometheus: http://{args.metrics_bind}:{args.metrics_port}/metrics")
+
+    store = None
+    if args.history:
+        from timesync.history import HistoryError, HistoryStore
+
+        try:
+            store = HistoryStore(path=args.history)
+        except (OSError, HistoryError) as e:
+            logging.error(f"Nie udało się otworzyć historii: {str(e)}")
+            if metrics_server is not None:
+                background.loop.call_soon_threadsafe(metrics_server.close)
+            background.stop(timeout=5)
+            return 1
+
+    service = DisciplineService([args.server] + sync.POPULAR_SERVERS, on_sync_needed=on_sync_needed,
+                                threshold_ms=args.threshold_ms or DEFAULT_THRESHOLD_MS,
+                                background=background, history=store)
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    logging.info(f"Uruchomiono dyscyplinę zegara (serwer: {args.server}, próg: {service.threshold_ms:.0f} ms)")
+    service.start()
+    # Oczekiwanie z limitem, aby Ctrl+C działało również w Windows
+    while not stop.wait(1):
+        pass
+    logging.info("Zatrzymywanie dyscypliny zegara...")
+    service.stop(timeout=5)
+    if metrics_server is not None:
+        background.loop.call_soon_threadsafe(metrics_server.close)
+    background.stop(timeout=5)
+    if store is not None:
+        store.close()
+    return 0
+
+
+def open_history(path):
+    """Otwiera istniejący plik historii pomiarów; None (z komunikatem w logu), jeśli się nie da."""
+    from timesync import history
+
+    path = path or history.DEFAULT_PATH
+    if not os.path.exists(path):
+        logging.error(f"Brak pliku historii {path}")
+        return None
+    try:
+        return history.HistoryStore(path=path)
+    except (OSError, history.HistoryError) as e:
+        logging.error(f"Nie udało się otworzyć historii: {str(e)}")
+        return None
+
+
+def cmd_simulate(args):
+    """Uruchamia dyscyplinę zegara na symulowanej sieci i wypisuje statystyki przebiegu."""
+    from timesync import netsim
+
+    store = None
+    if args.history:
+        from timesync.history import HistoryError, HistoryStore
+
+        try:
+            store = HistoryStore(path=args.history)
+        except (OSError, HistoryError) as e:
+            logging.error(f"Nie udało się otworzyć historii: {str(e)}")
+            return 1
+    simulator = netsim.NetworkSimulator.generate(args.servers, seed=args.seed, falsetickers=args.falsetickers,
+                                                 loss=args.loss)
+    with simulator:
+        results = netsim.simulate_discipline(simulator, args.hours, history=store)
+    if store is not None:
+        store.close()
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:.6g}"
+        print(f"{key}: {value}")
+    return 0
+
+
+def cmd_history(args):
+    """Wypisuje ostatnie wpisy historii pomiarów."""
+    from datetime import datetime
+
+    from timesync import history
+
+    store = open_history(args.path)
+    if store is None:
+        return 1
+
+    kinds = {history.SAMPLE: "pomiar", history.SYNC_OK: "synchronizacja", history.SYNC_FAILED: "błąd synchronizacji"}
+    with store:
+        if args.server is None:
+            records = store.last(args.count)
+        else:
+            records = store.range(server=args.server)
+        start = max(len(records.timestamp) - args.count, 0)
+        for i in range(start, len(records.timestamp)):
+            print(f"{datetime.fromtimestamp(records.timestamp[i]):%Y-%m-%d %H:%M:%S}  "
+                  f"{store.servers[records.server[i]]:<28} {records.offset_ms[i]:+10.3f} ms  "
+                  f"opóźnienie {records.delay_ms[i]:8.3f} ms  stratum {records.stratum[i]:2}  "
+                  f"{kinds.get(records.kind[i], records.kind[i])}")
+        print(f"Wpisów w historii: {len(store)} z {store.capacity} (łącznie zapisanych: {store.total})")
+    return 0
+
+
+def cmd_stats(args):
+    """Wypisuje statystyki stabilności zegara dla każdego serwera z historii pomiarów."""
+    from timesync import stability
+
+    store = open_history(args.path)
+    if store is None:
+        return 1
+    start = time.time() - args.hours * 3600 if args.hours else None
+    with store:
+        reports = stability.analyze_history(store, start=start, server=args.server)
+    if not reports:
+        print("Za mało pomiarów do analizy")
+        return 1
+    for report in reports.values():
+        print("\n".join(stability.format_report(report)))
+    return 0
+
+
+def cmd_bench(args):
+    """Uruchamia wybrany pomiar wydajności i wypisuje wyniki."""
+    import importlib
+
+    results = importlib.import_module(BENCHMARKS[args.name]).benchmark()
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:.6g}"
+        print(f"{key}: {value}")
+    return 0
+
+
+COMMANDS = {
+    "query": cmd_query,
+    "sync": cmd_sync,
+    "serve": cmd_serve,
+    "status": cmd_status,
+    "clock": cmd_clock,
+    "ntpserver": cmd_ntpserver,
+    "loadgen": cmd_loadgen,
+    "survey": cmd_survey,
+    "simulate": cmd_simulate,
+    "history": cmd_history,
+    "stats": cmd_stats,
+    "bench": cmd_bench,
+}
+
+
+def main(argv=None, started=None):
+    """Punkt wejścia trybu bez GUI; zwraca kod wyjścia."""
+    args = build_parser().parse_args(argv)
+    setup_logging(args)
+    report_startup(started, args.startup_budget_ms)
+    if not args.trace:
+        return COMMANDS[args.command](args)
+
+    from timesync import tracing
+
+    tracer = tracing.enable()
+    try:
+        return COMMANDS[args.command](args)
+    finally:
+        tracing.disable()
+        write_trace(tracer, args.trace)
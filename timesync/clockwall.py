@@ -0,0 +1,256 @@
+"""Ściana zegarów wielu stref czasowych (zoneinfo) z buforowanym przesunięciem strefy.
+
+Przesunięcie strefy względem UTC zmienia się tylko w chwilach przejść (np.
+zmiana czasu letniego), więc każda strefa pamięta bieżące przesunięcie aż do
+najbliższego przejścia. Takt ściany to jeden odczyt czasu (i czasu
+wirtualnego, jeśli są zegary wirtualne) oraz kilka działań na liczbach
+całkowitych na zegar; pełna konwersja strefy odbywa się raz na przejście.
+Zwracane są tylko teksty, które się zmieniły.
+
+Moduł nie zależy od tkinter; wyświetlaniem zajmuje się gui.ClockWallView.
+"""
+import logging
+import os
+import time
+from collections import namedtuple
+from datetime import date, datetime
+
+# Strefy specjalne: czas lokalny systemu i UTC (bez bazy zoneinfo)
+LOCAL = "local"
+UTC = "UTC"
+
+# Słowo kluczowe zegara pokazującego czas wirtualny aplikacji
+VIRTUAL = "virtual"
+
+# Plik konfiguracji ściany: "[virtual] STREFA [= Tytuł]" w każdej linii
+DEFAULT_PATH = "timesync_clocks.txt"
+
+ClockSpec = namedtuple("ClockSpec", [
+    "title",        # tytuł ramki zegara
+    "zone",         # LOCAL, UTC lub klucz zoneinfo (np. Europe/Warsaw)
+    "virtual",      # True - czas wirtualny aplikacji zamiast systemowego
+])
+
+DEFAULT_CLOCKS = (
+    ClockSpec("Czas systemowy", LOCAL, False),
+    ClockSpec("Czas UTC", UTC, False),
+    ClockSpec("Czas wirtualny", LOCAL, True),
+)
+
+# Pola zegara w zmianach zwracanych przez ClockWall.tick
+DATE, TIME = range(2)
+
+# Wyszukiwanie przejścia: krok próbkowania i horyzont (po nim przesunięcie jest sprawdzane ponownie)
+SEARCH_STEP = 86400
+SEARCH_HORIZON = 60 * 86400
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Gotowe fragmenty tekstu czasu: "GG:MM:" dla każdej minuty doby i "SS" dla każdej sekundy
+_MINUTE_TEXTS = [f"{minute // 60:02d}:{minute % 60:02d}:" for minute in range(1440)]
+_SECOND_TEXTS = [f"{second:02d}" for second in range(60)]
+
+
+def _local_offset(timestamp):
+    local = time.localtime(timestamp)
+    return local.tm_gmtoff, local.tm_zone
+
+
+def _utc_offset(timestamp):
+    return 0, "UTC"
+
+
+class ZoneOffset:
+    """Przesunięcie strefy względem UTC (s) buforowane do najbliższego przejścia strefy."""
+
+    def __init__(self, zone):
+        self.zone = zone
+        if zone == UTC:
+            self._offset_at = _utc_offset
+        elif zone == LOCAL:
+            self._offset_at = _local_offset
+        else:
+            import zoneinfo
+
+            tz = zoneinfo.ZoneInfo(zone)
+
+            def offset_at(timestamp):
+                moment = datetime.fromtimestamp(timestamp, tz)
+                return int(moment.utcoffset().total_seconds()), moment.tzname()
+
+            self._offset_at = offset_at
+        self.offset = 0
+        self.abbreviation = ""
+        self.valid_from = 0
+        self.valid_until = 0
+        self.refreshes = 0
+
+    def at(self, timestamp):
+        """Przesunięcie (s) w chwili timestamp (całkowita liczba sekund od epoki Unix)."""
+        if self.valid_from <= timestamp < self.valid_until:
+            return self.offset
+        self._refresh(timestamp)
+        return self.offset
+
+    def _refresh(self, timestamp):
+        """Wyznacza przesunięcie i najbliższe przejście (próbkowanie co dobę, potem bisekcja do sekundy)."""
+        self.refreshes += 1
+        current = self._offset_at(timestamp)
+        self.offset, self.abbreviation = current
+        self.valid_from = timestamp
+        low = timestamp
+        limit = timestamp + SEARCH_HORIZON
+        while low < limit:
+            high = min(low + SEARCH_STEP, limit)
+            if self._offset_at(high) != current:
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if self._offset_at(middle) == current:
+                        low = middle
+                    else:
+                        high = middle
+                break
+            low = high
+        self.valid_until = high
+
+
+class ClockWall:
+    """Stan ściany zegarów: ostatnio wyświetlone teksty daty i czasu każdego zegara."""
+
+    def __init__(self, specs=DEFAULT_CLOCKS):
+        self.specs = list(specs)
+        # Zegary wirtualne mają osobne bufory stref - ich czas może być daleko od czasu systemowego
+        self.zones = {}
+        self.clocks = [(self._zone(spec.zone, spec.virtual), spec.virtual) for spec in self.specs]
+        self.has_virtual = any(spec.virtual for spec in self.specs)
+        self._seconds = [None] * len(self.specs)    # wyświetlona sekunda (czas lokalny strefy)
+        self._dates = [None] * len(self.specs)      # (dzień, skrót strefy) wyświetlonej daty
+
+    def _zone(self, zone, virtual):
+        offset = self.zones.get((zone, virtual))
+        if offset is None:
+            offset = self.zones[zone, virtual] = ZoneOffset(zone)
+        return offset
+
+    def tick(self, now, virtual_now=None):
+        """Przelicza zegary na chwilę now (czas wirtualny: virtual_now); zwraca listę (indeks, pole, tekst)."""
+        wall = int(now // 1)
+        virtual = wall if virtual_now is None else int(virtual_now // 1)
+        seconds = self._seconds
+        changes = []
+        for index, (zone, is_virtual) in enumerate(self.clocks):
+            timestamp = virtual if is_virtual else wall
+            if zone.valid_from <= timestamp < zone.valid_until:
+                local = timestamp + zone.offset
+            else:
+                local = timestamp + zone.at(timestamp)
+            if local == seconds[index]:
+                continue
+            seconds[index] = local
+            day, second = divmod(local, 86400)
+            key = (day, zone.abbreviation)
+            if key != self._dates[index]:
+                self._dates[index] = key
+                changes.append((index, DATE, f"Data: {date.fromordinal(_EPOCH_ORDINAL + day):%Y-%m-%d} "
+                                             f"({zone.abbreviation})"))
+            minute, second = divmod(second, 60)
+            changes.append((index, TIME, _MINUTE_TEXTS[minute] + _SECOND_TEXTS[second]))
+        return changes
+
+
+def parse_clock(line):
+    """Zamienia linię "[virtual] STREFA [= Tytuł]" na ClockSpec; ValueError przy nieznanej strefie."""
+    spec, _, title = line.partition("=")
+    words = spec.split()
+    virtual = bool(words) and words[0] == VIRTUAL
+    if virtual:
+        words = words[1:]
+    if len(words) != 1:
+        raise ValueError(f"Nieprawidłowy zegar: {line.strip()}")
+    zone = words[0]
+    if zone not in (LOCAL, UTC):
+        import zoneinfo
+
+        try:
+            zoneinfo.ZoneInfo(zone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError) as e:
+            if not zoneinfo.available_timezones():
+                # Windows nie ma systemowej bazy IANA - dostarcza ją pakiet tzdata
+                raise ValueError(f"Brak bazy stref czasowych dla {zone} (zainstaluj pakiet tzdata)") from e
+            raise ValueError(f"Nieznana strefa czasowa {zone}") from e
+    title = title.strip()
+    if not title:
+        title = {LOCAL: "Czas lokalny", UTC: "Czas UTC"}.get(zone) or zone.rsplit("/", 1)[-1].replace("_", " ")
+        if virtual:
+            title += " (wirtualny)"
+    return ClockSpec(title, zone, virtual)
+
+
+def load_clocks(path=DEFAULT_PATH):
+    """Zegary z pliku konfiguracji (puste linie i komentarze # są pomijane) lub DEFAULT_CLOCKS."""
+    if not os.path.exists(path):
+        return list(DEFAULT_CLOCKS)
+    specs = []
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            line = line.split("#", 1)[0]
+            if not line.strip():
+                continue
+            try:
+                specs.append(parse_clock(line))
+            except ValueError as e:
+                logging.warning(f"{path}, linia {number}: {str(e)}")
+    return specs or list(DEFAULT_CLOCKS)
+
+
+def benchmark(clocks=100, virtual=10, ticks=3600):
+    """Koszt taktu ściany zegarów w porównaniu z pełną konwersją strefy dla każdego zegara."""
+    import zoneinfo
+
+    keys = sorted(zoneinfo.available_timezones())
+    step = max(len(keys) // clocks, 1)
+    zones = [key for key in keys[::step] if "/" in key][:clocks]
+    specs = [ClockSpec(zone, zone, False) for zone in zones]
+    specs += [ClockSpec(zone, zone, True) for zone in zones[:virtual]]
+    wall = ClockWall(specs)
+
+    # Start tuż przed zmianą czasu w Europie (29 marca 2026, 01:00 UTC)
+    start_time = 1774746000 - ticks // 2
+    started = time.perf_counter()
+    wall.tick(start_time)
+    first_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    changes = 0
+    for i in range(1, ticks):
+        changes += len(wall.tick(start_time + i, start_time + 7 * 86400 + i))
+    tick_us = (time.perf_counter() - started) / (ticks - 1) * 1e6
+
+    tzs = [zoneinfo.ZoneInfo(spec.zone) for spec in specs]
+    started = time.perf_counter()
+    for i in range(100):
+        for tz in tzs:
+            moment = datetime.fromtimestamp(start_time + i, tz)
+            f"{moment.hour:02d}:{moment.minute:02d}:{moment.second:02d}"
+    naive_us = (time.perf_counter() - started) / 100 * 1e6
+
+    # Zgodność z pełną konwersją co 7 minut przez rok we wszystkich strefach
+    check = ClockWall([ClockSpec(zone, zone, False) for zone in zones])
+    mismatches = 0
+    for timestamp in range(start_time - 183 * 86400, start_time + 183 * 86400, 7 * 60):
+        check.tick(timestamp)
+        for index, tz in enumerate(tzs[:len(zones)]):
+            moment = datetime.fromtimestamp(timestamp, tz)
+            expected = (moment.toordinal(), moment.hour * 3600 + moment.minute * 60 + moment.second)
+            if (check._dates[index][0] + _EPOCH_ORDINAL, check._seconds[index] % 86400) != expected:
+                mismatches += 1
+
+    return {
+        "clocks": len(specs),
+        "first_tick_ms": first_ms,
+        "tick_us": tick_us,
+        "full_conversion_tick_us": naive_us,
+        "changes_per_tick": changes / (ticks - 1),
+        "zone_refreshes": sum(zone.refreshes for zone in wall.zones.values()),
+        "mismatches": mismatches,
+    }
@@ -0,0 +1,426 @@
+"""Ciągła dyscyplina zegara: filtr próbek NTP, estymacja dryfu i predykcja offsetu."""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from collections import deque
+
+from timesync import metrics, poller, sntp
+from timesync.eventloop import BackgroundLoop
+from timesync.resolver import default_resolver, host_of
+from timesync.scheduler import MAX_POLL, MIN_POLL, PollScheduler
+from timesync.selection import select_sources
+
+# Liczba próbek w filtrze zegara (rejestr przesuwny jak w RFC 5905)
+FILTER_SIZE = 8
+
+# Maksymalny przyrost dyspersji wynikający z tolerancji częstotliwości (15 ppm)
+PHI_MS_PER_S = 15e-3
+
+# Dyspersja pustego miejsca w filtrze (16 s, jak MAXDISP w RFC 5905)
+MAX_DISPERSION_MS = 16000.0
+
+# Domyślne parametry pętli dyscypliny
+DEFAULT_THRESHOLD_MS = 100.0
+DEFAULT_CHECK_INTERVAL = 5.0
+
+# Liczba kolejnych zapytań bez odpowiedzi, po której adres puli jest wymieniany na inny
+UNREACHABLE_FAILURES = 3
+
+# Ponowienie zlecenia synchronizacji, gdy poprzednie nie zakończyło się korektą zegara (s)
+SYNC_RETRY_INTERVAL = 600.0
+
+# Najmniejszy odstęp punktów dryfu (s) - próbki wielu serwerów z jednej rundy dają jeden punkt
+DRIFT_SPACING = float(2 ** MIN_POLL)
+
+# Dryf jest liczony dopiero, gdy punkty obejmują kilka interwałów odpytywania (s)
+DRIFT_MIN_SPAN = 4 * DRIFT_SPACING
+
+
+class ClockFilter:
+    """Filtr zegara NTP z 8 ostatnimi próbkami jednego serwera.
+
+    Jako wynik wybierana jest próbka o najmniejszej odległości (opóźnienie/2 +
+    dyspersja), bo ma najmniejszy błąd wprowadzany przez sieć.
+    """
+
+    def __init__(self, size=FILTER_SIZE):
+        # (offset_ms, delay_ms, dispersion_ms, epoch) - epoch z time.monotonic()
+        self.samples = deque([(0.0, 0.0, MAX_DISPERSION_MS, None)] * size, maxlen=size)
+        self.last_epoch = None
+        self.offset_ms = None
+        self.delay_ms = None
+        self.dispersion_ms = None
+        self.jitter_ms = None
+
+    def add(self, offset_ms, delay_ms, dispersion_ms=0.0, epoch=None):
+        """Dodaje próbkę i zwraca True, jeśli wynik filtra został zaktualizowany."""
+        if epoch is None:
+            epoch = time.monotonic()
+        self.samples.appendleft((offset_ms, delay_ms, dispersion_ms, epoch))
+
+        aged = []
+        for offset, delay, dispersion, sample_epoch in self.samples:
+            if sample_epoch is not None:
+                dispersion += PHI_MS_PER_S * (epoch - sample_epoch)
+            aged.append((delay / 2 + dispersion, offset, delay, dispersion, sample_epoch))
+        aged.sort(key=lambda item: item[0])
+
+        valid = [item for item in aged if item[4] is not None]
+        _, best_offset, best_delay, best_dispersion, best_epoch = valid[0]
+
+        # Wynik aktualizujemy tylko nowszymi próbkami niż ostatnio użyta
+        if self.last_epoch is not None and best_epoch <= self.last_epoch:
+            return False
+
+        self.last_epoch = best_epoch
+        self.offset_ms = best_offset
+        self.delay_ms = best_delay
+        self.dispersion_ms = best_dispersion
+        if len(valid) > 1:
+            self.jitter_ms = (sum((item[1] - best_offset) ** 2 for item in valid[1:])
+                              / (len(valid) - 1)) ** 0.5
+        else:
+            self.jitter_ms = 0.0
+        return True
+
+
+class DriftEstimator:
+    """Estymacja dryfu częstotliwości zegara metodą najmniejszych kwadratów.
+
+    Punkty regresji są odległe o co najmniej spacing sekund; próbki
+    pomiędzy nimi aktualizują tylko ostatni znany offset. Dopóki punkty nie
+    obejmują min_span sekund, nachylenie wynosi 0.
+    """
+
+    def __init__(self, window=16, spacing=DRIFT_SPACING, min_span=DRIFT_MIN_SPAN):
+        self.points = deque(maxlen=window)
+        self.spacing = spacing
+        self.min_span = min_span
+        # Ostatnia próbka (epoch, offset_ms) - także ta, która nie została punktem regresji
+        self.latest = None
+
+    def add(self, epoch, offset_ms):
+        self.latest = (epoch, offset_ms)
+        if not self.points or epoch - self.points[-1][0] >= self.spacing:
+            self.points.append(self.latest)
+
+    def reset(self):
+        self.points.clear()
+        self.latest = None
+
+    def fit(self):
+        """Zwraca (offset_ms w chwili ostatniej próbki, nachylenie ms/s) lub None."""
+        if self.latest is None:
+            return None
+        last_epoch, last_offset = self.latest
+        if len(self.points) < 2 or self.points[-1][0] - self.points[0][0] < self.min_span:
+            return last_offset, 0.0
+
+        n = len(self.points)
+        mean_t = sum(t for t, _ in self.points) / n
+        mean_o = sum(o for _, o in self.points) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in self.points)
+        if var_t == 0:
+            return mean_o, 0.0
+        slope = sum((t - mean_t) * (o - mean_o) for t, o in self.points) / var_t
+        # Offset ostatniej próbki z regresji (nie z pojedynczego, zaszumionego pomiaru)
+        return mean_o + slope * (last_epoch - mean_t), slope
+
+    @property
+    def frequency_ppm(self):
+        """Dryf częstotliwości zegara lokalnego w ppm (1 ms/s = 1000 ppm)."""
+        fit = self.fit()
+        return None if fit is None else fit[1] * 1000.0
+
+
+class ClockDiscipline:
+    """Stan dyscypliny: filtry per serwer, połączony offset i predykcja dryfu."""
+
+    def __init__(self, drift_window=16, max_age=3 * 2 ** MAX_POLL):
+        self.filters = {}
+        # Ostatni przefiltrowany pomiar każdego serwera: serwer -> (NtpResult, epoch)
+        self.candidates = {}
+        self.max_age = max_age
+        self.estimator = DriftEstimator(drift_window)
+        self.last_epoch = None
+        self.jitter_ms = None
+        # Ostatni wynik wyboru źródeł (selection.Selection)
+        self.selection = None
+        self._lock = threading.Lock()
+
+    def update(self, results, epoch=None):
+        """Przetwarza odpowiedzi serwerów; zwraca połączony offset lub None.
+
+        Odpowiedzi mogą napływać pojedynczo (z harmonogramu) - wybór źródeł
+        obejmuje aktualne wyniki filtrów wszystkich serwerów.
+        """
+        if epoch is None:
+            epoch = time.monotonic()
+
+        with self._lock:
+            updated = False
+            for result in results:
+                clock_filter = self.filters.setdefault(result.server, ClockFilter())
+                if clock_filter.add(result.offset_ms, result.delay_ms,
+                                    result.root_dispersion_ms, epoch):
+                    updated = True
+                    self.candidates[result.server] = (
+                        result._replace(offset_ms=clock_filter.offset_ms, delay_ms=clock_filter.delay_ms),
+                        epoch)
+
+            candidates = [candidate for candidate, candidate_epoch in self.candidates.values()
+                          if epoch - candidate_epoch <= self.max_age]
+            selection = select_sources(candidates)
+            self.selection = selection
+            if selection.offset_ms is None:
+                return None
+            if not updated:
+                # Filtry nie dały nowszych próbek - nie powielamy punktu dryfu
+                return selection.offset_ms
+
+            self.estimator.add(epoch, selection.offset_ms)
+            self.last_epoch = epoch
+            self.jitter_ms = selection.jitter_ms
+            return selection.offset_ms
+
+    def remove(self, servers):
+        """Usuwa filtry i pomiary serwerów, które przestały być źródłami."""
+        with self._lock:
+            for server in servers:
+                self.filters.pop(server, None)
+                self.candidates.pop(server, None)
+
+    def predicted_offset_ms(self, epoch=None):
+        """Przewidywany offset zegara w chwili epoch (domyślnie teraz)."""
+        return self.snapshot(epoch)[0]
+
+    def snapshot(self, epoch=None):
+        """Zwraca (przewidywany offset ms, dryf ppm) z jednego stanu albo (None, None).
+
+        Oba pola są liczone pod tą samą blokadą - reset z innego wątku nie rozdzieli ich.
+        """
+        if epoch is None:
+            epoch = time.monotonic()
+        with self._lock:
+            fit = self.estimator.fit()
+            if fit is None:
+                return None, None
+            offset, slope = fit
+            return offset + slope * (epoch - self.last_epoch), slope * 1000.0
+
+    @property
+    def frequency_ppm(self):
+        with self._lock:
+            return self.estimator.frequency_ppm
+
+    def reset(self):
+        """Czyści historię (np. po skokowej korekcie zegara systemowego)."""
+        with self._lock:
+            self.filters.clear()
+            self.candidates.clear()
+            self.estimator.reset()
+            self.last_epoch = None
+            self.jitter_ms = None
+            self.selection = None
+
+
+class DisciplineService:
+    """Długo działająca pętla dyscypliny zegara na wspólnej pętli asyncio.
+
+    Serwery odpytywane są przez adaptacyjny harmonogram (PollScheduler). Między
+    odpytaniami offset jest przewidywany na podstawie dryfu; pełna
+    synchronizacja (on_sync_needed) wywoływana jest dopiero, gdy przewidywany
+    błąd przekroczy próg. Po korekcie zegara wykonawca synchronizacji wywołuje
+    sync_completed(); dopóki tego nie zrobi, zlecenie jest ponawiane najwyżej
+    co SYNC_RETRY_INTERVAL sekund.
+    """
+
+    def __init__(self, servers, on_sync_needed=None, threshold_ms=DEFAULT_THRESHOLD_MS,
+                 check_interval=DEFAULT_CHECK_INTERVAL, background=None, query=None,
+                 min_poll=MIN_POLL, max_poll=MAX_POLL, port=sntp.NTP_PORT, timeout=2.0, history=None,
+                 monotonic=time.monotonic, resolver=None):
+        # servers może być listą lub funkcją zwracającą aktualną listę serwerów
+        self.servers = servers
+        # Nazwy są rozwijane na adresy (osobne źródła), a metryki zapisywane tylko przy zapytaniach sieciowych
+        self.network = query is None
+        if query is None:
+            self.resolver = resolver or default_resolver()
+            query = functools.partial(poller.query_async, resolver=self.resolver)
+        else:
+            self.resolver = resolver
+        # Opcjonalna historia pomiarów (history.HistoryStore)
+        self.history = history
+        # Zegar chwil pomiarów (w symulacji: czas wirtualny pętli)
+        self.monotonic = monotonic
+        self.on_sync_needed = on_sync_needed
+        self.threshold_ms = threshold_ms
+        self.check_interval = check_interval
+        self.background = background or BackgroundLoop()
+
+        self.discipline = ClockDiscipline()
+        self.scheduler = PollScheduler(on_sample=self.on_sample, query=query, min_poll=min_poll,
+                                       max_poll=max_poll, port=port, timeout=timeout)
+        self.polls = 0
+        self.syncs_requested = 0
+        self.syncs_completed = 0
+
+        # Bieżące źródła każdej nazwy: nazwa -> lista źródeł "host/adres"
+        self.members = {}
+
+        self._future = None
+        self._stop_event = None
+        self._loop = None
+        # Chwila ostatniego zlecenia synchronizacji (None - brak oczekującego zlecenia)
+        self._requested_at = None
+
+    def current_servers(self):
+        return list(self.servers() if callable(self.servers) else self.servers)
+
+    async def current_sources(self):
+        """Aktualne źródła: serwery, a przy resolverze - każdy adres każdej nazwy."""
+        servers = self.current_servers()
+        if self.resolver is None:
+            return servers
+        try:
+            sources = await asyncio.wait_for(self.resolver.expand(servers, self.scheduler.port),
+                                             self.scheduler.timeout)
+        except asyncio.TimeoutError:
+            sources = servers
+        return self.sticky_sources(servers, sources)
+
+    def sticky_sources(self, servers, sources):
+        """Źródła nazw servers ze stałym składem puli.
+
+        DNS puli zwraca przy każdym odświeżeniu inne adresy; adres pozostaje
+        źródłem, dopóki odpowiada (i nie odmówił obsługi), a w miejsce
+        wycofanych wchodzą nowe adresy z sources (wynik Resolver.expand).
+        """
+        resolved = {}
+        for source in sources:
+            resolved.setdefault(host_of(source), []).append(source)
+        members = {}
+        for server in servers:
+            fresh = resolved.get(server, [server])
+            current = self.members.get(server)
+            if current is None:
+                members[server] = fresh
+                continue
+            kept = [source for source in current if self._usable(source)]
+            # Najpierw nowe adresy, potem wycofane (gdy DNS nie zna innych)
+            replacements = [source for source in fresh if source not in current]
+            replacements += [source for source in fresh if source in current and source not in kept]
+            members[server] = kept + replacements[:max(len(fresh) - len(kept), 0)] or fresh
+        self.members = members
+        return [source for group in members.values() for source in group]
+
+    def _usable(self, source):
+        state = self.scheduler.states.get(source)
+        return state is None or not state.denied and state.failures < UNREACHABLE_FAILURES
+
+    def set_sources(self, sources):
+        """Ustawia źródła harmonogramu i usuwa stan (filtry, metryki) źródeł wycofanych."""
+        removed = set(self.scheduler.states).difference(sources)
+        self.scheduler.set_servers(sources)
+        if removed:
+            self.discipline.remove(removed)
+            if self.network:
+                for source in removed:
+                    metrics.forget_server(source)
+
+    def start(self):
+        """Uruchamia pętlę dyscypliny na pętli tła."""
+        if self._future is not None:
+            return
+        self._future = self.background.submit(self.run())
+
+    def stop(self, timeout=None):
+        """Zatrzymuje pętlę dyscypliny."""
+        if self._future is None:
+            return
+        if self._stop_event is not None:
+            self.background.loop.call_soon_threadsafe(self._stop_event.set)
+        try:
+            self._future.result(timeout)
+        finally:
+            self._future = None
+
+    async def run(self, duration=None):
+        """Główna pętla: aktualizacja listy serwerów i kontrola predykcji.
+
+        duration ogranicza czas pracy (s, wg zegara pętli); domyślnie pętla
+        działa do wywołania stop().
+        """
+        loop = self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self.set_sources(await self.current_sources())
+        scheduler_task = loop.create_task(self.scheduler.run())
+        deadline = None if duration is None else loop.time() + duration
+
+        try:
+            while not self._stop_event.is_set():
+                self.check_prediction()
+                timeout = self.check_interval
+                if deadline is not None:
+                    timeout = min(timeout, deadline - loop.time())
+                    if timeout <= 0:
+                        break
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self.set_sources(await self.current_sources())
+        finally:
+            self.scheduler.stop()
+            await scheduler_task
+
+    def on_sample(self, result):
+        """Przyjmuje pomiar z harmonogramu i aktualizuje stan dyscypliny."""
+        self.polls += 1
+        if self.history is not None:
+            self.history.add_result(result)
+        offset = self.discipline.update([result], self.monotonic())
+        if offset is not None:
+            frequency = self.discipline.frequency_ppm
+            if frequency is None:
+                # Reset po synchronizacji z innego wątku między update() a odczytem dryfu
+                return
+            if self.network:
+                metrics.record_selection(self.discipline.selection)
+                metrics.FREQUENCY.set(frequency)
+            logging.debug(f"Dyscyplina zegara: {result.server} offset {result.offset_ms:+.3f} ms, "
+                          f"połączony {offset:+.3f} ms, dryf {frequency:+.3f} ppm")
+
+    def check_prediction(self):
+        """Zleca synchronizację, gdy przewidywany offset przekracza próg."""
+        now = self.monotonic()
+        predicted = self.discipline.predicted_offset_ms(now)
+        if predicted is None or abs(predicted) <= self.threshold_ms:
+            self._requested_at = None
+            return False
+        # Synchronizacja mogła zostać pominięta (brak uprawnień, wyłączona) lub jeszcze trwa
+        if self._requested_at is not None and now - self._requested_at < SYNC_RETRY_INTERVAL:
+            return False
+
+        logging.info(f"Przewidywany offset zegara {predicted:+.3f} ms przekracza próg "
+                     f"{self.threshold_ms:.0f} ms - zlecanie synchronizacji")
+        self._requested_at = now
+        self.syncs_requested += 1
+        if self.on_sync_needed is not None:
+            self.on_sync_needed(predicted)
+        return True
+
+    def sync_completed(self):
+        """Informuje o korekcie zegara: pomiary sprzed niej są nieaktualne (wywoływane z dowolnego wątku)."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._reset_after_sync()
+        else:
+            loop.call_soon_threadsafe(self._reset_after_sync)
+
+    def _reset_after_sync(self):
+        self.syncs_completed += 1
+        self._requested_at = None
+        self.discipline.reset()
+        self.scheduler.reset_intervals()
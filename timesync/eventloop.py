@@ -0,0 +1,60 @@
+"""Wspólna pętla asyncio działająca w jednym wątku tła."""
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """Pętla asyncio w wątku tła, do której zlecane są zadania sieciowe i blokujące.
+
+    Zastępuje tworzenie osobnego wątku dla każdej operacji: korutyny trafiają
+    do jednej pętli, a funkcje blokujące (np. wywołania w32tm) do jej puli
+    wykonawców.
+    """
+
+    def __init__(self, name="TimeSyncLoop"):
+        self.name = name
+        self.loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Uruchamia wątek z pętlą (wywołanie wielokrotne nic nie zmienia)."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._thread_main, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _thread_main(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def submit(self, coro):
+        """Zleca korutynę do pętli; zwraca concurrent.futures.Future."""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_blocking(self, func, *args):
+        """Wykonuje funkcję blokującą w puli wykonawców pętli."""
+        self.start()
+
+        async def run():
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+        return self.submit(run())
+
+    def stop(self, timeout=None):
+        """Zatrzymuje pętlę i czeka na zakończenie wątku."""
+        if self._thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+        self._ready.clear()
@@ -0,0 +1,917 @@
+"""Interfejs graficzny (tkinter) aplikacji ZegarSync."""
+import logging
+import tkinter as tk
+from tkinter import ttk, scrolledtext, messagebox
+import time
+import platform
+import os
+
+from timesync import sync
+from timesync.discipline import DisciplineService
+from timesync.eventloop import BackgroundLoop
+from timesync.logbuffer import DEFAULT_MAX_LINES, BatchingHandler
+from timesync.sync import POPULAR_SERVERS
+from timesync.ticker import SecondTicker, VirtualSecondTicker
+from timesync.virtualclock import DEFAULT_SLEW_SECONDS, NS_PER_S, VirtualClock
+
+
+class TextHandler(BatchingHandler):
+    """Klasa przechwytująca logi i przekierowująca je do widgetu Text.
+
+    Rekordy trafiają do kolejki i są wstawiane do widgetu partiami co
+    interval_ms (jedno wstawienie na partię); widget przechowuje najwyżej
+    max_lines ostatnich linii.
+    """
+
+    def __init__(self, text_widget, max_lines=DEFAULT_MAX_LINES, interval_ms=100):
+        BatchingHandler.__init__(self, max_lines)
+        self.text_widget = text_widget
+        self.interval_ms = interval_ms
+        # Uruchamianie w głównym wątku Tkinter
+        self.text_widget.after(self.interval_ms, self.flush_to_widget)
+
+    def flush_to_widget(self):
+        """Wstawia oczekujące linie do widgetu i usuwa najstarsze ponad limit."""
+        lines = self.drain()
+        if lines:
+            widget = self.text_widget
+            widget.configure(state='normal')
+            widget.insert(tk.END, '\n'.join(lines) + '\n')
+            line_count = int(widget.index('end-1c').split('.')[0]) - 1
+            if line_count > self.max_lines:
+                widget.delete('1.0', f'{line_count - self.max_lines + 1}.0')
+            widget.see(tk.END)  # Przewijanie do końca
+            widget.configure(state='disabled')
+        self.text_widget.after(self.interval_ms, self.flush_to_widget)
+
+
+class ClockWallView:
+    """Siatka zegarów clockwall.ClockWall; po takcie zmieniane są tylko etykiety o nowym tekście."""
+
+    # Do tylu zegarów używana jest duża czcionka (3 zegary w rzędzie)
+    LARGE_CLOCKS = 6
+
+    def __init__(self, parent, wall):
+        self.wall = wall
+        self.labels = []
+        large = len(wall.specs) <= self.LARGE_CLOCKS
+        columns = 3 if large else 6
+        for index, spec in enumerate(wall.specs):
+            frame = ttk.LabelFrame(parent, text=spec.title, padding="5")
+            frame.grid(row=index // columns, column=index % columns, sticky="nsew", padx=5, pady=5)
+            date_label = ttk.Label(frame, font=('Arial', 12 if large else 9))
+            date_label.pack(fill=tk.X)
+            style = ("VirtualClock.TLabel" if spec.virtual else "Clock.TLabel") if large else \
+                ("SmallVirtualClock.TLabel" if spec.virtual else "SmallClock.TLabel")
+            time_label = ttk.Label(frame, style=style)
+            time_label.pack(fill=tk.X, pady=5)
+            self.labels.append((date_label, time_label))
+        for column in range(min(columns, len(wall.specs))):
+            parent.columnconfigure(column, weight=1)
+
+    def update(self, now, virtual_now=None):
+        labels = self.labels
+        for index, field, text in self.wall.tick(now, virtual_now):
+            labels[index][field].config(text=text)
+
+
+class TimeSyncApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("ZegarSync - Aplikacja zegara systemowego")
+        self.root.geometry("700x650")
+        self.root.resizable(True, True)
+
+        # Ustawienie minimalnego rozmiaru okna
+        self.root.minsize(600, 550)
+
+        # Zmienne
+        self.ntp_server = tk.StringVar(value="tempus1.gum.gov.pl")
+        self.is_syncing = False
+        self.sync_future = None
+
+        # Wspólna pętla asyncio dla synchronizacji i dyscypliny zegara
+        self.background = BackgroundLoop()
+
+        # Tryb testowy
+        self.test_mode = tk.BooleanVar(value=False)
+
+        # Wybór źródła czasu spośród wielu serwerów
+        self.multi_server = tk.BooleanVar(value=True)
+
+        # Ciągła dyscyplina zegara z automatyczną synchronizacją po przekroczeniu progu
+        self.auto_sync = tk.BooleanVar(value=True)
+        # Historia pomiarów (plik mapowany) jest otwierana dopiero w start_services lub przy pierwszym użyciu
+        self.history = None
+        self.discipline = DisciplineService(
+            lambda: [self.ntp_server.get()] + POPULAR_SERVERS,
+            on_sync_needed=lambda predicted: self.root.after(0, self.request_auto_sync, predicted),
+            background=self.background)
+
+        # Zegar wirtualny: przesunięcie w ns, tempo upływu i płynna korekta
+        self.virtual_clock = VirtualClock()
+        self.virtual_rate = tk.StringVar(value="1")
+        self.virtual_slew = tk.BooleanVar(value=False)
+
+        # Zakres czasu wykresu pomiarów
+        self.chart_window = tk.StringVar(value="1 h")
+
+        # Lokalny serwer NTP udostępniający czas systemowy lub wirtualny (port ustawiany w create_widgets)
+        self.ntp_server_port = tk.StringVar()
+        self.ntp_server_source = tk.StringVar(value="system")
+        self.ntp_server_transport = None
+        self.ntp_server_protocol = None
+        self._ntp_server_text = None
+
+        # Punkt końcowy HTTP z metrykami Prometheus (na pętli tła; port ustawiany w create_widgets)
+        self.metrics_port = tk.StringVar()
+        self.metrics_server = None
+
+        # Publikacja zegara wirtualnego dla innych procesów (start_services)
+        self.clock_publisher = None
+
+        # Widżety zakładek budowanych przy pierwszym wyświetleniu (None do tej chwili)
+        self.sync_button = None
+        self.progress = None
+        self.discipline_label = None
+        self.offset_chart = None
+        self._discipline_text = None
+
+        # Utworzenie i skonfigurowanie widżetów
+        self.create_widgets()
+        self.setup_logging()
+        self.virtual_clock.on_change = self.on_virtual_clock_change
+
+        # Sprawdzenie uprawnień administratora przy starcie
+        self.is_admin_mode = self.is_admin()
+        if not self.is_admin_mode:
+            logging.warning("Aplikacja nie została uruchomiona z uprawnieniami administratora.")
+            logging.info("Synchronizacja czasu systemowego będzie niedostępna.")
+            logging.info("Dostępna jest praca z czasem wirtualnym (bez modyfikacji czasu systemowego).")
+
+    def create_widgets(self):
+        """Tworzenie elementów interfejsu."""
+        # Główny kontener
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Zakładki
+        notebook = self.notebook = ttk.Notebook(main_frame)
+        notebook.pack(fill=tk.BOTH, expand=True)
+
+        # Zakładka 1: Podstawowe zegary
+        basic_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(basic_frame, text="Zegary")
+
+        # Zakładka 2: Zaawansowana synchronizacja
+        sync_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(sync_frame, text="Synchronizacja")
+
+        # Zakładka 3: Wykres offsetu i opóźnienia
+        chart_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(chart_frame, text="Wykres")
+
+        # Zakładki poza pierwszą są budowane przy pierwszym wyświetleniu (szybszy start)
+        self._tab_builders = {str(sync_frame): self.create_sync_tab, str(chart_frame): self.create_chart_tab}
+        notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+
+        # === ZAKŁADKA 1: ZEGARY ===
+        # Rama z zegarami
+        clocks_frame = ttk.LabelFrame(basic_frame, text="Zegary", padding="10")
+        clocks_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        # Styl dla zegarów - czarny tekst
+        style = ttk.Style()
+        style.configure('Clock.TLabel', font=('Arial', 24, 'bold'), background='white', foreground='black')
+        style.configure('VirtualClock.TLabel', font=('Arial', 24, 'bold'), background='lightblue', foreground='black')
+        style.configure('SmallClock.TLabel', font=('Arial', 14, 'bold'), background='white', foreground='black')
+        style.configure('SmallVirtualClock.TLabel', font=('Arial', 14, 'bold'), background='lightblue',
+                        foreground='black')
+
+        # Ściana zegarów (domyślnie systemowy, UTC i wirtualny; lista w pliku timesync_clocks.txt)
+        clock_container = ttk.Frame(clocks_frame)
+        clock_container.pack(fill=tk.X)
+        from timesync import clockwall
+        self.clock_wall = ClockWallView(clock_container, clockwall.ClockWall(clockwall.load_clocks()))
+
+        # Rama z kontrolą czasu wirtualnego
+        virtual_control_frame = ttk.LabelFrame(basic_frame, text="Zarządzanie czasem wirtualnym", padding="10")
+        virtual_control_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        # Przyciski do regulacji czasu wirtualnego
+        adjust_frame = ttk.Frame(virtual_control_frame)
+        adjust_frame.pack(fill=tk.X, pady=5)
+
+        # Przyciski po lewej
+        left_buttons = ttk.Frame(adjust_frame)
+        left_buttons.pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(left_buttons, text="-1 godzina", command=lambda: self.adjust_virtual_time(-3600)).pack(side=tk.LEFT,
+                                                                                                          padx=2)
+        ttk.Button(left_buttons, text="-10 minut", command=lambda: self.adjust_virtual_time(-600)).pack(side=tk.LEFT,
+                                                                                                        padx=2)
+        ttk.Button(left_buttons, text="-1 minuta", command=lambda: self.adjust_virtual_time(-60)).pack(side=tk.LEFT,
+                                                                                                       padx=2)
+
+        # Przyciski po prawej
+        right_buttons = ttk.Frame(adjust_frame)
+        right_buttons.pack(side=tk.RIGHT, padx=5)
+
+        ttk.Button(right_buttons, text="+1 minuta", command=lambda: self.adjust_virtual_time(60)).pack(side=tk.LEFT,
+                                                                                                       padx=2)
+        ttk.Button(right_buttons, text="+10 minut", command=lambda: self.adjust_virtual_time(600)).pack(side=tk.LEFT,
+                                                                                                        padx=2)
+        ttk.Button(right_buttons, text="+1 godzina", command=lambda: self.adjust_virtual_time(3600)).pack(side=tk.LEFT,
+                                                                                                          padx=2)
+
+        # Tempo upływu czasu wirtualnego i płynna korekta
+        rate_frame = ttk.Frame(virtual_control_frame)
+        rate_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Label(rate_frame, text="Tempo:").pack(side=tk.LEFT, padx=5)
+        rate_combo = ttk.Combobox(rate_frame, textvariable=self.virtual_rate, width=8,
+                                  values=["0", "0.5", "1", "2", "10", "60", "3600"])
+        rate_combo.pack(side=tk.LEFT, padx=5)
+        rate_combo.bind("<<ComboboxSelected>>", lambda event: self.set_virtual_rate())
+        rate_combo.bind("<Return>", lambda event: self.set_virtual_rate())
+
+        ttk.Checkbutton(rate_frame, text="Płynna zmiana czasu (bez skoków)",
+                        variable=self.virtual_slew).pack(side=tk.LEFT, padx=10)
+
+        # Przyciski zarządzania
+        manage_frame = ttk.Frame(virtual_control_frame)
+        manage_frame.pack(fill=tk.X, pady=5)
+
+        ttk.Button(manage_frame, text="Resetuj zegar wirtualny",
+                   command=self.reset_virtual_time).pack(side=tk.LEFT, expand=True)
+
+        ttk.Button(manage_frame, text="Zapisz ustawienie",
+                   command=self.save_time_settings).pack(side=tk.LEFT, expand=True)
+
+        ttk.Button(manage_frame, text="Wczytaj ustawienie",
+                   command=self.load_time_settings).pack(side=tk.LEFT, expand=True)
+
+        # Rama lokalnego serwera NTP
+        from timesync import metrics, ntpserver
+        self.ntp_server_port.set(str(ntpserver.DEFAULT_PORT))
+        self.metrics_port.set(str(metrics.DEFAULT_PORT))
+        server_frame = ttk.LabelFrame(basic_frame, text="Lokalny serwer NTP", padding="10")
+        server_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        server_row = ttk.Frame(server_frame)
+        server_row.pack(fill=tk.X, pady=5)
+
+        ttk.Label(server_row, text="Port UDP:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(server_row, width=7, textvariable=self.ntp_server_port).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(server_row, text="Czas systemowy", value="system",
+                        variable=self.ntp_server_source).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(server_row, text="Czas wirtualny", value="virtual",
+                        variable=self.ntp_server_source).pack(side=tk.LEFT, padx=5)
+
+        self.ntp_server_button = ttk.Button(server_row, text="Uruchom serwer", command=self.toggle_ntp_server)
+        self.ntp_server_button.pack(side=tk.RIGHT, padx=5)
+
+        self.ntp_server_label = ttk.Label(server_frame, text="Serwer NTP zatrzymany")
+        self.ntp_server_label.pack(anchor=tk.W, pady=5)
+
+        # Rama metryk Prometheus
+        metrics_frame = ttk.LabelFrame(basic_frame, text="Metryki Prometheus", padding="10")
+        metrics_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Label(metrics_frame, text="Port HTTP:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(metrics_frame, width=7, textvariable=self.metrics_port).pack(side=tk.LEFT, padx=5)
+        self.metrics_label = ttk.Label(metrics_frame, text="Metryki niedostępne")
+        self.metrics_label.pack(side=tk.LEFT, padx=5)
+        self.metrics_button = ttk.Button(metrics_frame, text="Udostępnij metryki", command=self.toggle_metrics)
+        self.metrics_button.pack(side=tk.RIGHT, padx=5)
+
+        # WSPÓLNE ELEMENTY DLA WSZYSTKICH ZAKŁADEK
+        # Okno logów
+        log_frame = ttk.LabelFrame(main_frame, text="Logi", padding="10")
+        log_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.log_area = scrolledtext.ScrolledText(log_frame, state='disabled', height=8)
+        self.log_area.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        # Status systemu operacyjnego i GitHub link (nowa ramka)
+        status_frame = ttk.Frame(main_frame)
+        status_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        # Informacja o systemie (lewa strona)
+        self.system_label = ttk.Label(status_frame, text=f"System: {platform.system()} {platform.release()}")
+        self.system_label.pack(side=tk.LEFT)
+
+        # Link do repozytorium GitHub (prawa strona)
+        self.github_link = ttk.Label(status_frame, text="GitHub",
+                                     foreground="blue", cursor="hand2")
+        self.github_link.pack(side=tk.RIGHT, padx=10)
+        self.github_link.bind("<Button-1>", self.open_github)
+
+        # Etykieta autora, która wyświetli popup po kliknięciu
+        self.author_label = ttk.Label(status_frame, text="Autor", foreground="blue", cursor="hand2")
+        self.author_label.pack(side=tk.RIGHT)
+        self.author_label.bind("<Button-1>", self.show_author)
+
+        # Uruchomienie aktualizacji zegarów wyrównanej do pełnych sekund
+        self.clock_ticker = SecondTicker(self.root.after, self.update_clocks)
+        self.clock_ticker.start()
+
+        # Zegary wirtualne mają własne granice sekund (ułamkowe przesunięcie, inne tempo)
+        self.virtual_ticker = VirtualSecondTicker(self.root.after, self.update_virtual_clocks, self.virtual_clock)
+        if self.clock_wall.wall.has_virtual:
+            self.virtual_ticker.start()
+
+    def on_tab_changed(self, event):
+        """Buduje zawartość zakładki przy jej pierwszym wyświetleniu."""
+        self.build_tab(self.notebook.select())
+
+    def build_tab(self, tab):
+        """Buduje zawartość zakładki tab (nazwa widżetu ramki), jeśli jeszcze nie została zbudowana."""
+        builder = self._tab_builders.pop(str(tab), None)
+        if builder is None:
+            return
+        started = time.perf_counter()
+        builder(self.notebook.nametowidget(tab))
+        logging.debug(f"Zbudowano zakładkę {self.notebook.tab(tab, 'text')} "
+                      f"w {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def create_sync_tab(self, sync_frame):
+        """Tworzenie zakładki synchronizacji (uprawnienia, opcje, stabilność, usługa Windows Time)."""
+        sync_label = ttk.Label(sync_frame, text="Synchronizacja czasu systemowego z serwerem NTP",
+                               font=("Arial", 12, "bold"))
+        sync_label.pack(pady=10)
+
+        # Informacja o uprawnieniach
+        admin_frame = ttk.Frame(sync_frame)
+        admin_frame.pack(fill=tk.X, pady=5)
+
+        self.admin_icon = ttk.Label(admin_frame, text="⚠️", font=("Arial", 16))
+        self.admin_icon.pack(side=tk.LEFT, padx=5)
+
+        admin_text = "Ta funkcja wymaga uruchomienia aplikacji z uprawnieniami administratora."
+        self.admin_label = ttk.Label(admin_frame, text=admin_text, font=("Arial", 10))
+        self.admin_label.pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(admin_frame, text="Sprawdź ponownie",
+                   command=self.refresh_admin_status).pack(side=tk.RIGHT, padx=5)
+
+        ttk.Separator(sync_frame, orient='horizontal').pack(fill=tk.X, pady=10)
+
+        # Ustawienia serwera NTP
+        ntp_frame = ttk.LabelFrame(sync_frame, text="Serwer NTP", padding="10")
+        ntp_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Label(ntp_frame, text="Adres serwera NTP:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
+        self.server_entry = ttk.Entry(ntp_frame, width=40, textvariable=self.ntp_server)
+        self.server_entry.grid(row=0, column=1, sticky=tk.W + tk.E, padx=5, pady=5)
+
+        # Lista popularnych serwerów
+        ttk.Label(ntp_frame, text="Popularne serwery:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+
+        server_frame = ttk.Frame(ntp_frame)
+        server_frame.grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+
+        for server in POPULAR_SERVERS:
+            btn = ttk.Button(server_frame, text=server,
+                             command=lambda s=server: self.ntp_server.set(s))
+            btn.pack(side=tk.LEFT, padx=5)
+
+        # Opcje synchronizacji
+        options_frame = ttk.LabelFrame(sync_frame, text="Opcje synchronizacji", padding="10")
+        options_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        # Checkbox dla trybu testowego
+        self.test_mode_cb = ttk.Checkbutton(options_frame, text="Tryb testowy (bez synchronizacji)",
+                                            variable=self.test_mode)
+        self.test_mode_cb.pack(anchor=tk.W, pady=5)
+
+        # Checkbox dla wyboru źródła z wielu serwerów
+        self.multi_server_cb = ttk.Checkbutton(options_frame,
+                                               text="Odpytuj wszystkie popularne serwery i odrzucaj fałszywe źródła",
+                                               variable=self.multi_server)
+        self.multi_server_cb.pack(anchor=tk.W, pady=5)
+
+        # Checkbox dla automatycznej synchronizacji z pętli dyscypliny
+        self.auto_sync_cb = ttk.Checkbutton(options_frame,
+                                            text="Automatyczna synchronizacja po przekroczeniu progu offsetu",
+                                            variable=self.auto_sync)
+        self.auto_sync_cb.pack(anchor=tk.W, pady=5)
+
+        # Stan pętli dyscypliny zegara (przewidywany offset i dryf)
+        self.discipline_label = ttk.Label(options_frame,
+                                          text=self._discipline_text or "Dyscyplina zegara: oczekiwanie na pomiary...")
+        self.discipline_label.pack(anchor=tk.W, pady=5)
+
+        # Przycisk synchronizacji
+        sync_button_frame = ttk.Frame(options_frame)
+        sync_button_frame.pack(fill=tk.X, pady=10)
+
+        self.sync_button = ttk.Button(sync_button_frame, text="Synchronizuj czas z serwerem NTP",
+                                      command=self.start_sync, width=30)
+        self.sync_button.pack(pady=5)
+
+        # Pasek postępu
+        self.progress = ttk.Progressbar(options_frame, mode='indeterminate')
+        self.progress.pack(fill=tk.X, pady=5)
+
+        # Statystyki stabilności zegara z historii pomiarów
+        stability_frame = ttk.LabelFrame(sync_frame, text="Stabilność zegara", padding="10")
+        stability_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        ttk.Button(stability_frame, text="Analizuj historię pomiarów",
+                   command=self.analyze_stability).pack(side=tk.LEFT, padx=5)
+        self.stability_label = ttk.Label(stability_frame, text="Wyniki analizy trafiają do logów")
+        self.stability_label.pack(side=tk.LEFT, padx=10)
+
+        # Informacje o usłudze Windows Time
+        service_frame = ttk.LabelFrame(sync_frame, text="Status usługi Windows Time", padding="10")
+        service_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        service_buttons = ttk.Frame(service_frame)
+        service_buttons.pack(fill=tk.X)
+
+        ttk.Button(service_buttons, text="Sprawdź status usługi",
+                   command=self.check_time_service).pack(side=tk.LEFT, expand=True, padx=5, pady=5)
+
+        ttk.Button(service_buttons, text="Uruchom usługę",
+                   command=lambda: self.manage_time_service("start")).pack(side=tk.LEFT, expand=True, padx=5, pady=5)
+
+        ttk.Button(service_buttons, text="Zatrzymaj usługę",
+                   command=lambda: self.manage_time_service("stop")).pack(side=tk.LEFT, expand=True, padx=5, pady=5)
+
+        # Stan zmieniony przed zbudowaniem zakładki
+        self.update_admin_status()
+        if self.is_syncing:
+            self.show_sync_progress(True)
+
+    def create_chart_tab(self, chart_frame):
+        """Tworzenie zakładki wykresu offsetu i opóźnienia."""
+        from timesync.chartview import CHART_WINDOWS, OffsetChart
+
+        chart_controls = ttk.Frame(chart_frame)
+        chart_controls.pack(fill=tk.X, pady=5)
+
+        ttk.Label(chart_controls, text="Zakres czasu:").pack(side=tk.LEFT, padx=5)
+        chart_window = ttk.Combobox(chart_controls, textvariable=self.chart_window, width=8, state="readonly",
+                                    values=list(CHART_WINDOWS))
+        chart_window.pack(side=tk.LEFT, padx=5)
+        chart_window.bind("<<ComboboxSelected>>",
+                          lambda event: self.offset_chart.set_window(CHART_WINDOWS[self.chart_window.get()]))
+
+        self.offset_chart = OffsetChart(chart_frame, self.history_store(), self.background,
+                                        CHART_WINDOWS[self.chart_window.get()])
+
+    def update_admin_status(self):
+        """Aktualizuje interfejs na podstawie uprawnień administratora."""
+        if self.is_admin():
+            self.admin_icon.config(text="✅")
+            self.admin_label.config(text="Aplikacja uruchomiona z uprawnieniami administratora.")
+            self.sync_button.config(state=tk.NORMAL)
+        else:
+            self.admin_icon.config(text="⚠️")
+            self.admin_label.config(text="Wymagane uprawnienia administratora! Funkcje synchronizacji niedostępne.")
+            self.sync_button.config(state=tk.DISABLED)
+
+    def open_github(self, event):
+        """Otwiera repozytorium GitHub w przeglądarce."""
+        import webbrowser
+        webbrowser.open_new("https://github.com/dkoryto/time_sync")
+
+    def show_author(self, event):
+        """Wyświetla popup z informacją o autorze."""
+        messagebox.showinfo("Autor",
+                            "Dariusz Koryto\nE-mail: dariusz@koryto.eu\n\nAplikacja do synchronizacji czasu\nLicencja: MIT")
+
+    def update_clocks(self, now=None):
+        """Aktualizacja wyświetlania zegarów (wywoływana co sekundę przez SecondTicker)."""
+        if now is None:
+            now = time.time()
+
+        # Jeden odczyt czasu dla wszystkich zegarów; zmieniane są tylko etykiety o nowym tekście
+        virtual_now = self.virtual_clock.now_ns() / NS_PER_S if self.clock_wall.wall.has_virtual else None
+        self.clock_wall.update(now, virtual_now)
+
+        # Przewidywany offset zegara między odpytaniami serwerów
+        predicted, frequency = self.discipline.discipline.snapshot()
+        if predicted is not None:
+            text = f"Dyscyplina zegara: przewidywany offset {predicted:+.1f} ms, dryf {frequency:+.2f} ppm"
+            if text != self._discipline_text:
+                self._discipline_text = text
+                if self.discipline_label is not None:
+                    self.discipline_label.config(text=text)
+
+        # Liczba obsłużonych zapytań lokalnego serwera NTP
+        protocol = self.ntp_server_protocol
+        if protocol is not None:
+            text = f"Serwer NTP działa na porcie {self.ntp_server_port.get()}, obsłużone zapytania: {protocol.requests}"
+            if text != self._ntp_server_text:
+                self._ntp_server_text = text
+                self.ntp_server_label.config(text=text)
+
+    def update_virtual_clocks(self, virtual_now):
+        """Aktualizacja zegarów wirtualnych (wywoływana przez VirtualSecondTicker po granicy ich sekundy)."""
+        self.clock_wall.update(time.time(), virtual_now)
+
+    def setup_logging(self):
+        """Konfiguracja logowania do okna tekstowego."""
+        from timesync import logsetup
+
+        # Konfiguracja loggera
+        root_logger = logging.getLogger()
+        root_logger.setLevel(logging.INFO)
+
+        # Usuwanie istniejących handlerów, aby uniknąć duplikacji logów
+        for handler in root_logger.handlers[:]:
+            root_logger.removeHandler(handler)
+
+        # Handler do przekierowania logów do widgetu Text
+        text_handler = TextHandler(self.log_area)
+        text_handler.setLevel(logging.INFO)
+        text_handler.setFormatter(logging.Formatter(logsetup.LOG_FORMAT))
+        root_logger.addHandler(text_handler)
+
+        # Handler do pliku logów (zapis w wątku tła, rotacja z kompresją)
+        log_filename = 'timesync_gui.log'
+        self.log_listener = logsetup.start_file_logging(log_filename, root_logger)
+
+        # Log początkowy
+        logging.info(f"Uruchomiono aplikację na Windows {platform.win32_ver()[0]}")
+
+    def is_admin(self, refresh=False):
+        """Sprawdza, czy aplikacja jest uruchomiona z uprawnieniami administratora (wynik zapamiętany)."""
+        return sync.is_admin(refresh)
+
+    def refresh_admin_status(self):
+        """Ponownie sprawdza uprawnienia administratora i aktualizuje interfejs."""
+        self.is_admin_mode = self.is_admin(refresh=True)
+        self.update_admin_status()
+        logging.info("Uprawnienia administratora: " + ("tak" if self.is_admin_mode else "nie"))
+
+    def start_services(self):
+        """Uruchamia usługi zbędne do narysowania zegarów: historię pomiarów, dyscyplinę zegara i publikację.
+
+        Wywoływane przez main po pierwszym narysowaniu okna.
+        """
+        self.history_store()
+        self.discipline.start()
+        self.start_clock_publisher()
+
+    def history_store(self):
+        """Historia pomiarów, otwierana przy pierwszym wywołaniu (przy błędzie pliku - tylko w pamięci)."""
+        if self.history is None:
+            from timesync import history
+            try:
+                self.history = history.HistoryStore(path=history.DEFAULT_PATH)
+            except (OSError, history.HistoryError) as e:
+                logging.warning(f"Nie udało się otworzyć pliku historii pomiarów: {str(e)}")
+                self.history = history.HistoryStore()
+            self.discipline.history = self.history
+        return self.history
+
+    def start_clock_publisher(self):
+        """Publikuje zegar wirtualny w pamięci współdzielonej dla innych procesów."""
+        from timesync import shmclock
+
+        try:
+            self.clock_publisher = shmclock.ClockPublisher()
+        except OSError as e:
+            self.clock_publisher = None
+            logging.warning(f"Nie udało się udostępnić zegara wirtualnego innym procesom: {str(e)}")
+            return
+        self.clock_publisher.publish(self.virtual_clock.state)
+        logging.info(f"Zegar wirtualny udostępniony w pliku {self.clock_publisher.path}")
+
+    def on_virtual_clock_change(self, state):
+        """Publikuje nowy stan zegara wirtualnego i przelicza termin taktu zegarów wirtualnych."""
+        if self.clock_publisher is not None:
+            self.clock_publisher.publish(state)
+        self.virtual_ticker.reschedule()
+
+    def toggle_ntp_server(self):
+        """Uruchamia lub zatrzymuje lokalny serwer NTP."""
+        from timesync import ntpserver
+
+        if self.ntp_server_transport is not None:
+            self.background.loop.call_soon_threadsafe(self.ntp_server_transport.close)
+            self.ntp_server_transport = None
+            self.ntp_server_protocol = None
+            self._ntp_server_text = None
+            self.ntp_server_button.config(text="Uruchom serwer")
+            self.ntp_server_label.config(text="Serwer NTP zatrzymany")
+            logging.info("Zatrzymano lokalny serwer NTP")
+            return
+
+        if self.ntp_server_source.get() == "virtual":
+            options = {"clock": self.virtual_clock.now_ns, "stratum": ntpserver.STRATUM_VIRTUAL,
+                       "ref_id": ntpserver.REF_ID_VIRTUAL}
+            source = "czas wirtualny"
+        else:
+            options = {"clock": time.time_ns}
+            source = "czas systemowy"
+
+        try:
+            port = int(self.ntp_server_port.get())
+            future = self.background.submit(ntpserver.start_server(port=port, **options))
+            self.ntp_server_transport, self.ntp_server_protocol = future.result(timeout=5)
+        except (OSError, ValueError, OverflowError) as e:
+            logging.error(f"Nie udało się uruchomić serwera NTP: {str(e)}")
+            messagebox.showerror("Błąd", f"Nie udało się uruchomić serwera NTP:\n{str(e)}")
+            return
+
+        self.ntp_server_button.config(text="Zatrzymaj serwer")
+        logging.info(f"Uruchomiono lokalny serwer NTP na porcie {port} ({source}, "
+                     f"znaczniki odbioru: {self.ntp_server_protocol.timestamping})")
+
+    def toggle_metrics(self):
+        """Uruchamia lub zatrzymuje punkt końcowy HTTP z metrykami (obsługiwany przez pętlę tła)."""
+        from timesync import metrics
+
+        if self.metrics_server is not None:
+            self.background.loop.call_soon_threadsafe(self.metrics_server.close)
+            self.metrics_server = None
+            self.metrics_button.config(text="Udostępnij metryki")
+            self.metrics_label.config(text="Metryki niedostępne")
+            logging.info("Zatrzymano udostępnianie metryk")
+            return
+
+        try:
+            port = int(self.metrics_port.get())
+            future = self.background.submit(metrics.start_server(metrics.DEFAULT_BIND, port))
+            self.metrics_server = future.result(timeout=5)
+        except (OSError, ValueError, OverflowError) as e:
+            logging.error(f"Nie udało się udostępnić metryk: {str(e)}")
+            messagebox.showerror("Błąd", f"Nie udało się udostępnić metryk:\n{str(e)}")
+            return
+
+        url = f"http://{metrics.DEFAULT_BIND}:{port}/metrics"
+        self.metrics_button.config(text="Zatrzymaj metryki")
+        self.metrics_label.config(text=url)
+        logging.info(f"Metryki Prometheus dostępne pod adresem {url}")
+
+    def adjust_virtual_time(self, seconds):
+        """Dostosowuje wirtualny czas o podaną liczbę sekund (skokowo lub płynnie)."""
+        delta_ns = seconds * NS_PER_S
+        if self.virtual_slew.get():
+            # Cofnięcie czasu bez skoku wymaga korekty trwającej dłużej niż samo przesunięcie
+            duration = max(DEFAULT_SLEW_SECONDS, 2 * abs(seconds)) if seconds < 0 else DEFAULT_SLEW_SECONDS
+            try:
+                self.virtual_clock.slew(delta_ns, duration)
+                logging.info(f"Płynna zmiana czasu wirtualnego o {seconds} sekund w ciągu {duration:.0f} s")
+                return
+            except ValueError as e:
+                logging.warning(f"{str(e)} - zmiana skokowa")
+        self.virtual_clock.adjust(delta_ns)
+        offset_str = self.format_time_offset(self.virtual_clock.offset_ns())
+        logging.info(f"Zmieniono czas wirtualny o {seconds} sekund. Obecny offset: {offset_str}")
+
+    def set_virtual_rate(self):
+        """Ustawia tempo upływu czasu wirtualnego (0 zatrzymuje czas)."""
+        try:
+            rate = float(self.virtual_rate.get().replace(",", "."))
+            self.virtual_clock.set_rate(rate)
+        except ValueError as e:
+            logging.error(f"Nieprawidłowe tempo czasu wirtualnego: {str(e)}")
+            self.virtual_rate.set(f"{self.virtual_clock.rate:g}")
+            return
+        logging.info(f"Tempo czasu wirtualnego: {rate:g}x")
+
+    def format_time_offset(self, offset_ns):
+        """Formatuje offset czasu (w nanosekundach) do czytelnej postaci."""
+        sign = "+" if offset_ns >= 0 else "-"
+        abs_ms = abs(int(offset_ns)) // 1_000_000
+        abs_seconds, millis = divmod(abs_ms, 1000)
+        hours = abs_seconds // 3600
+        minutes = (abs_seconds % 3600) // 60
+        secs = abs_seconds % 60
+
+        text = f"{sign}{hours:02d}:{minutes:02d}:{secs:02d}"
+        return f"{text}.{millis:03d}" if millis else text
+
+    def reset_virtual_time(self):
+        """Resetuje wirtualny czas do czasu systemowego."""
+        self.virtual_clock.reset()
+        self.virtual_rate.set("1")
+        logging.info("Zresetowano zegar wirtualny do czasu systemowego")
+
+    def save_time_settings(self):
+        """Zapisuje obecne ustawienie czasu do pliku (offset w sekundach i tempo)."""
+        try:
+            offset_ns = self.virtual_clock.offset_ns()
+            with open("time_settings.txt", "w") as file:
+                file.write(f"{offset_ns / NS_PER_S:.9f} {self.virtual_clock.rate:g}")
+            offset_str = self.format_time_offset(offset_ns)
+            logging.info(f"Zapisano ustawienia czasu wirtualnego (offset: {offset_str})")
+            messagebox.showinfo("Zapisano", "Ustawienia czasu zostały zapisane")
+        except Exception as e:
+            logging.error(f"Błąd podczas zapisywania ustawień: {str(e)}")
+            messagebox.showerror("Błąd", f"Nie udało się zapisać ustawień: {str(e)}")
+
+    def load_time_settings(self):
+        """Wczytuje ustawienie czasu z pliku (również starszy format: sam offset w sekundach)."""
+        try:
+            if os.path.exists("time_settings.txt"):
+                with open("time_settings.txt", "r") as file:
+                    fields = file.read().split()
+                offset_ns = round(float(fields[0]) * NS_PER_S)
+                rate = float(fields[1]) if len(fields) > 1 else 1.0
+                self.virtual_clock.set_rate(rate)
+                self.virtual_clock.set_offset(offset_ns)
+                self.virtual_rate.set(f"{rate:g}")
+
+                offset_str = self.format_time_offset(offset_ns)
+                logging.info(f"Wczytano ustawienia czasu wirtualnego (offset: {offset_str}, tempo: {rate:g}x)")
+                messagebox.showinfo("Wczytano", f"Ustawienia czasu zostały wczytane\nOffset: {offset_str}")
+            else:
+                logging.warning("Nie znaleziono zapisanych ustawień czasu")
+                messagebox.showwarning("Brak pliku", "Nie znaleziono zapisanych ustawień czasu")
+        except Exception as e:
+            logging.error(f"Błąd podczas wczytywania ustawień: {str(e)}")
+            messagebox.showerror("Błąd", f"Nie udało się wczytać ustawień: {str(e)}")
+
+    def analyze_stability(self):
+        """Liczy statystyki stabilności z historii pomiarów w tle i wypisuje je w logach."""
+        store = self.history_store()
+
+        def analyze():
+            from timesync import stability
+
+            try:
+                reports = stability.analyze_history(store)
+            except Exception as e:
+                logging.error(f"Błąd analizy stabilności: {str(e)}")
+                return
+            if not reports:
+                logging.info("Za mało pomiarów w historii do analizy stabilności")
+            for report in reports.values():
+                for line in stability.format_report(report):
+                    logging.info(line)
+            self.root.after(0, self.stability_label.config,
+                            {"text": f"Przeanalizowano serwerów: {len(reports)}"})
+
+        self.background.run_blocking(analyze)
+
+    def check_time_service(self):
+        """Sprawdza stan usługi Windows Time i wyświetla informacje."""
+        if not self.is_admin():
+            logging.warning("Sprawdzenie stanu usługi wymaga uprawnień administratora.")
+            messagebox.showwarning("Brak uprawnień",
+                                   "Sprawdzenie stanu usługi Windows Time wymaga uprawnień administratora.")
+            return
+
+        server = self.ntp_server.get()
+
+        def check():
+            # Raport obejmuje pomiar NTP - w tle, aby nie blokować okna; wynik wyświetla wątek tkinter
+            try:
+                info = sync.service_report(server)
+            except Exception as e:
+                logging.error(f"Błąd podczas sprawdzania stanu usługi: {str(e)}")
+                self.root.after(0, messagebox.showerror, "Błąd",
+                                f"Nie udało się sprawdzić stanu usługi: {str(e)}")
+                return
+            self.root.after(0, messagebox.showinfo, "Status usługi Windows Time", info)
+
+        self.background.run_blocking(check)
+
+    def manage_time_service(self, action):
+        """Zarządza usługą Windows Time (start/stop)."""
+        if not self.is_admin():
+            logging.warning(f"Zarządzanie usługą wymaga uprawnień administratora.")
+            messagebox.showwarning("Brak uprawnień",
+                                   "Zarządzanie usługą Windows Time wymaga uprawnień administratora.")
+            return
+
+        try:
+            success, error = sync.manage_time_service(action)
+            if action == "start":
+                if success:
+                    messagebox.showinfo("Sukces", "Usługa Windows Time została uruchomiona.")
+                else:
+                    messagebox.showerror("Błąd", f"Nie udało się uruchomić usługi Windows Time:\n{error}")
+            else:
+                if success:
+                    messagebox.showinfo("Sukces", "Usługa Windows Time została zatrzymana.")
+                else:
+                    messagebox.showerror("Błąd", f"Nie udało się zatrzymać usługi Windows Time:\n{error}")
+
+        except Exception as e:
+            logging.error(f"Błąd podczas zarządzania usługą: {str(e)}")
+            messagebox.showerror("Błąd", f"Wystąpił błąd: {str(e)}")
+
+    def request_auto_sync(self, predicted_offset):
+        """Uruchamia synchronizację zleconą przez pętlę dyscypliny zegara."""
+        if not self.auto_sync.get() or self.test_mode.get():
+            logging.info(f"Automatyczna synchronizacja wyłączona (przewidywany offset {predicted_offset:+.1f} ms)")
+            return
+        if self.is_syncing:
+            return
+        if not self.is_admin():
+            logging.warning("Automatyczna synchronizacja wymaga uprawnień administratora.")
+            return
+        self.start_sync()
+
+    def start_sync(self):
+        """Rozpoczyna proces synchronizacji na pętli tła."""
+        if not self.is_admin():
+            logging.error("Synchronizacja czasu wymaga uprawnień administratora.")
+            messagebox.showerror("Brak uprawnień",
+                                 "Synchronizacja czasu systemowego wymaga uprawnień administratora.\n"
+                                 "Uruchom aplikację jako administrator.")
+            return
+
+        # W trybie testowym tylko symulujemy synchronizację
+        if self.test_mode.get():
+            logging.info("Uruchomiono w trybie testowym - synchronizacja jest symulowana")
+            self.simulate_sync()
+            return
+
+        if self.is_syncing:
+            messagebox.showinfo("Synchronizacja w toku", "Proces synchronizacji już trwa.")
+            return
+
+        self.is_syncing = True
+        self.show_sync_progress(True)
+
+        # Uruchomienie synchronizacji na pętli tła
+        self.sync_future = self.background.run_blocking(self.sync_time)
+
+    def simulate_sync(self):
+        """Symuluje proces synchronizacji (do celów testowych)."""
+        self.is_syncing = True
+        self.show_sync_progress(True)
+
+        def simulate_process():
+            try:
+                sync.simulate_sync(self.ntp_server.get())
+            except Exception as e:
+                logging.error(f"[SYMULACJA] Błąd: {str(e)}")
+            finally:
+                self.root.after(0, self.finish_sync)
+
+        # Uruchomienie symulacji na pętli tła
+        self.sync_future = self.background.run_blocking(simulate_process)
+
+    def sync_time(self):
+        """Synchronizuje zegar systemowy z serwerem NTP."""
+        from timesync import history
+
+        try:
+            result = sync.sync_time(self.ntp_server.get(), multi_server=self.multi_server.get())
+            self.history_store().append(time.time(), result.server,
+                                        result.offset_ms if result.offset_ms is not None else 0.0,
+                                        kind=history.SYNC_OK if result.success else history.SYNC_FAILED)
+            if result.success:
+                self.discipline.sync_completed()
+                messagebox.showinfo("Sukces", result.message)
+            else:
+                messagebox.showwarning("Ostrzeżenie", result.message)
+
+        except Exception as e:
+            logging.error(f"Wystąpił błąd podczas synchronizacji: {str(e)}")
+            messagebox.showerror("Błąd", f"Wystąpił błąd podczas synchronizacji:\n{str(e)}")
+        finally:
+            # Zakończenie procesu synchronizacji (w głównym wątku GUI)
+            self.root.after(0, self.finish_sync)
+
+    def finish_sync(self):
+        """Kończy proces synchronizacji i aktualizuje UI."""
+        self.show_sync_progress(False)
+        self.is_syncing = False
+
+    def show_sync_progress(self, running):
+        """Blokuje przycisk synchronizacji i uruchamia pasek postępu (lub przywraca je po zakończeniu).
+
+        Synchronizacja automatyczna może trwać przed zbudowaniem zakładki - wtedy nie ma czego zmieniać.
+        """
+        if self.sync_button is None:
+            return
+        if running:
+            self.sync_button.config(state=tk.DISABLED)
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.sync_button.config(state=tk.NORMAL)
+
+
+def report_startup(root, started, imported, built):
+    """Loguje czasy etapów startu: import modułów, budowa widżetów i pierwsze narysowanie okna z zegarami."""
+    root.update_idletasks()
+    painted = time.perf_counter()
+    logging.info(f"Start GUI: import {(imported - started) * 1000:.1f} ms, "
+                 f"budowa widżetów {(built - imported) * 1000:.1f} ms, "
+                 f"pierwsze rysowanie {(painted - built) * 1000:.1f} ms, "
+                 f"pierwszy zegar po {(painted - started) * 1000:.1f} ms")
+
+
+def main(started=None, profile=False):
+    """Funkcja główna aplikacji; profile=True loguje czasy startu liczone od chwili started (perf_counter)."""
+    imported = time.perf_counter()
+    root = tk.Tk()
+    app = TimeSyncApp(root)
+    if profile:
+        # Wywołanie po obsłużeniu zadań bezczynności zaplanowanych przy budowie okna (rysowanie)
+        root.after_idle(report_startup, root, imported if started is None else started,
+                        imported, time.perf_counter())
+    # Historia, dyscyplina zegara i publikacja zegara wirtualnego - dopiero po narysowaniu okna z zegarami
+    root.after_idle(app.start_services)
+    root.mainloop()
@@ -0,0 +1,442 @@
+"""Historia pomiarów w buforze cyklicznym o stałych kolumnach (w pamięci lub w pliku mapowanym).
+
+Każda kolumna to osobny bufor o stałej szerokości (array lub plik mapowany
+w pamięci), więc dopisanie próbki to kilka przypisań do istniejących
+buforów, a pamięć nie rośnie niezależnie od czasu pracy. Zapytania o zakres
+czasu wyszukują granice binarnie i kopiują co najwyżej dwa ciągłe fragmenty
+każdej kolumny. Jeśli zainstalowano NumPy, kolumny wyników są tablicami
+NumPy, w przeciwnym razie array.array.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections import namedtuple
+
+# NumPy jest importowany przy pierwszym zapytaniu o zakres (import trwa ~0,1 s), zob. load_numpy
+_numpy = False
+
+
+def load_numpy():
+    """Moduł numpy importowany przy pierwszym wywołaniu albo None, jeśli NumPy nie jest zainstalowany."""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+# Domyślna pojemność: ok. miesiąc odpytywania 8 serwerów co 64 s (ok. 40 B na próbkę)
+DEFAULT_CAPACITY = 1 << 20
+
+# Rodzaj wpisu
+SAMPLE = 0          # pomiar offsetu z odpowiedzi serwera
+SYNC_OK = 1         # udana synchronizacja zegara systemowego
+SYNC_FAILED = 2     # nieudana synchronizacja
+
+# Kolumny: (nazwa, kod typu array) - najpierw 8-bajtowe, aby każda była wyrównana
+COLUMNS = (
+    ("timestamp", "d"),       # czas Unix (s)
+    ("offset_ms", "d"),
+    ("delay_ms", "d"),
+    ("dispersion_ms", "d"),
+    ("server", "H"),          # identyfikator serwera (indeks na liście servers)
+    ("stratum", "B"),
+    ("kind", "B"),            # SAMPLE, SYNC_OK lub SYNC_FAILED
+)
+
+# Domyślny plik historii (w katalogu roboczym, obok time_settings.txt)
+DEFAULT_PATH = "timesync_history.bin"
+
+HistoryRange = namedtuple("HistoryRange", [name for name, _ in COLUMNS])
+
+MAGIC = b"ZSHS"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sIQQ")    # magic, wersja, pojemność, liczba wszystkich dopisanych wpisów
+HEADER_SIZE = 64
+TOTAL_OFFSET = 16
+# Liczba wszystkich wpisów, od której znaczniki czasu w buforze znów nie maleją (0 - zawsze nie malały)
+ORDERED_FROM = struct.Struct("<Q")
+ORDERED_FROM_OFFSET = 24
+
+# Identyfikator serwera jest liczbą uint16 (kolumna "H"); gdy zabraknie wolnych identyfikatorów,
+# wpisy nowych serwerów trafiają pod nazwę OVERFLOW_SERVER
+MAX_SERVERS = 1 << 16
+OVERFLOW_SERVER = "(inne)"
+# Co ile dopisanych wpisów (najwyżej; 1/16 pojemności dla małych buforów) wolno ponownie szukać
+# identyfikatorów zwolnionych przez bufor cykliczny
+RESCAN_INTERVAL = 4096
+
+
+class HistoryError(Exception):
+    """Nieprawidłowy plik historii pomiarów."""
+
+
+def _column_layout(capacity):
+    """Przesunięcia kolumn w pliku i rozmiar całego pliku."""
+    offsets = []
+    position = HEADER_SIZE
+    for _, code in COLUMNS:
+        offsets.append(position)
+        position += capacity * array(code).itemsize
+        position = (position + 7) & ~7
+    return offsets, position
+
+
+class HistoryStore:
+    """Bufor cykliczny pomiarów o pojemności capacity, opcjonalnie zapisany w pliku path.
+
+    Przy pliku kolumny są widokami pliku mapowanego w pamięci - dane trwają
+    między uruchomieniami bez osobnego zapisu. Nazwy serwerów zapisywane są
+    w pliku obok (path + ".servers", jedna nazwa w linii). Istniejący plik
+    zachowuje swoją pojemność; capacity=None oznacza pojemność z pliku albo
+    DEFAULT_CAPACITY, a inna podana wartość jest zgłaszana w logu.
+
+    Tablica nazw serwerów ma najwyżej max_servers pozycji. Po jej zapełnieniu
+    nowa nazwa dostaje identyfikator serwera, którego wpisy bufor już nadpisał
+    (plik .servers jest wtedy zapisywany od nowa), a gdy takiego nie ma -
+    wspólny identyfikator OVERFLOW_SERVER.
+
+    Zapytania o zakres wyszukują granice binarnie, dopóki znaczniki czasu
+    w buforze nie maleją; po cofnięciu zegara systemowego (do nadpisania
+    wpisów sprzed cofnięcia) przeszukują wpisy liniowo.
+    """
+
+    max_servers = MAX_SERVERS
+
+    def __init__(self, capacity=None, path=None):
+        self.path = path
+        self.servers = []
+        self._server_ids = {}
+        self._free_ids = []
+        self._scanned_total = None
+        self._ordered_from = 0
+        self._lock = threading.Lock()
+        # Osobna blokada dopisywania nazw serwerów: zapis pliku .servers nie blokuje zapytań o zakres
+        self._servers_lock = threading.Lock()
+        self._map = None
+
+        if path is None:
+            capacity = capacity or DEFAULT_CAPACITY
+            self.capacity = capacity
+            self.total = 0
+            buffers = [array(code, bytes(capacity * array(code).itemsize)) for _, code in COLUMNS]
+            self._columns = [memoryview(buffer) for buffer in buffers]
+        else:
+            self._open_file(path, capacity)
+            self._load_servers()
+
+    def _open_file(self, path, capacity):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = os.fstat(fd).st_size
+            if size:
+                header = os.read(fd, HEADER.size)
+                if len(header) < HEADER.size:
+                    raise HistoryError(f"Plik historii {path} jest uszkodzony (brak nagłówka)")
+                magic, version, file_capacity, total = HEADER.unpack(header)
+                if magic != MAGIC or version != LAYOUT_VERSION:
+                    raise HistoryError(f"Nieobsługiwany plik historii {path} ({magic!r}, wersja {version})")
+                if capacity is not None and file_capacity != capacity:
+                    logging.warning(f"Plik historii {path} ma pojemność {file_capacity} wpisów zamiast {capacity} "
+                                    f"- używana jest pojemność z pliku (aby ją zmienić, usuń plik)")
+                capacity = file_capacity
+                offsets, file_size = _column_layout(capacity)
+                if size < file_size:
+                    raise HistoryError(f"Plik historii {path} jest uszkodzony (za krótki)")
+            else:
+                total = 0
+                capacity = capacity or DEFAULT_CAPACITY
+                offsets, file_size = _column_layout(capacity)
+                os.ftruncate(fd, file_size)
+            self._map = mmap.mmap(fd, file_size)
+        finally:
+            os.close(fd)
+
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, capacity, total)
+        self.capacity = capacity
+        self.total = total
+        self._ordered_from, = ORDERED_FROM.unpack_from(self._map, ORDERED_FROM_OFFSET)
+        view = memoryview(self._map)
+        self._columns = [view[offset:offset + capacity * array(code).itemsize].cast(code)
+                         for offset, (_, code) in zip(offsets, COLUMNS)]
+        view.release()
+
+    def _servers_path(self):
+        return self.path + ".servers"
+
+    def _load_servers(self):
+        if os.path.exists(self._servers_path()):
+            with open(self._servers_path(), encoding="utf-8") as file:
+                for line in file:
+                    self._register(line.rstrip("\n"))
+
+    def _register(self, name):
+        server_id = len(self.servers)
+        self.servers.append(name)
+        self._server_ids[name] = server_id
+        return server_id
+
+    def _add_server(self, name):
+        # Najpierw plik: identyfikator istnieje dopiero, gdy nazwa jest zapisana
+        if self.path is not None:
+            with open(self._servers_path(), "a", encoding="utf-8") as file:
+                file.write(name + "\n")
+        return self._register(name)
+
+    def _write_servers(self):
+        """Zapisuje plik .servers od nowa (po ponownym użyciu identyfikatora)."""
+        if self.path is None:
+            return
+        temporary = self._servers_path() + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            file.writelines(name + "\n" for name in self.servers)
+        os.replace(temporary, self._servers_path())
+
+    def server_id(self, name):
+        """Identyfikator serwera (nowe nazwy dostają wolny identyfikator, zob. _allocate)."""
+        server_id = self._server_ids.get(name)
+        if server_id is not None:
+            return server_id
+        with self._servers_lock:
+            server_id = self._server_ids.get(name)
+            if server_id is None:
+                server_id = self._allocate(name)
+        return server_id
+
+    def _allocate(self, name):
+        """Identyfikator nowej nazwy serwera (wywoływane z blokadą _servers_lock)."""
+        if len(self.servers) < self.max_servers - 1:
+            return self._add_server(name)
+
+        while True:
+            if not self._free_ids:
+                interval = min(RESCAN_INTERVAL, max(self.capacity // 16, 1))
+                if self._scanned_total is not None and self.total - self._scanned_total < interval:
+                    break
+                self._scan_free_ids()
+                if not self._free_ids:
+                    break
+            server_id = self._free_ids.pop()
+            with self._lock:
+                # Identyfikator mógł zostać zapisany po przeszukaniu bufora
+                if server_id in self._recent_ids():
+                    continue
+                del self._server_ids[self.servers[server_id]]
+                self.servers[server_id] = name
+                self._server_ids[name] = server_id
+            self._write_servers()
+            return server_id
+
+        # Brak wolnych identyfikatorów - wspólny identyfikator dla pozostałych nazw (ostatni w tablicy)
+        overflow = self._server_ids.get(OVERFLOW_SERVER)
+        if overflow is None:
+            logging.warning(f"Tablica nazw serwerów historii pomiarów jest pełna ({self.max_servers}) - "
+                            f"wpisy nowych serwerów są zapisywane jako {OVERFLOW_SERVER}")
+            overflow = self._add_server(OVERFLOW_SERVER)
+        return overflow
+
+    def _scan_free_ids(self):
+        """Wyszukuje identyfikatory serwerów, których wpisy zostały już nadpisane."""
+        overflow = self._server_ids.get(OVERFLOW_SERVER)
+        with self._lock:
+            used = set(self._columns[4][:len(self)])
+            self._scanned_total = self.total
+        self._free_ids = [i for i in range(len(self.servers) - 1, -1, -1) if i not in used and i != overflow]
+
+    def _recent_ids(self):
+        """Identyfikatory serwerów wpisów dopisanych od ostatniego przeszukania (z blokadą _lock)."""
+        count = self.total - self._scanned_total
+        if count >= self.capacity:
+            return set(self._columns[4])
+        column = self._columns[4]
+        first = self._scanned_total % self.capacity
+        last = first + count
+        if last <= self.capacity:
+            return set(column[first:last])
+        return set(column[first:]) | set(column[:last - self.capacity])
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp, server, offset_ms, delay_ms=0.0, dispersion_ms=0.0, stratum=0, kind=SAMPLE):
+        """Dopisuje wpis, nadpisując najstarszy po zapełnieniu bufora (O(1))."""
+        server_id = self.server_id(server)
+        with self._lock:
+            # Identyfikator mógł zostać w międzyczasie przydzielony innej nazwie (_allocate)
+            while self.servers[server_id] != server and self.servers[server_id] != OVERFLOW_SERVER:
+                self._lock.release()
+                try:
+                    server_id = self.server_id(server)
+                finally:
+                    self._lock.acquire()
+            total = self.total
+            index = total % self.capacity
+            columns = self._columns
+            if total and timestamp < columns[0][index - 1]:
+                # Zegar cofnięty - wyszukiwanie binarne dopiero po nadpisaniu wpisów sprzed cofnięcia
+                self._ordered_from = total + self.capacity
+                if self._map is not None:
+                    ORDERED_FROM.pack_into(self._map, ORDERED_FROM_OFFSET, self._ordered_from)
+            columns[0][index] = timestamp
+            columns[1][index] = offset_ms
+            columns[2][index] = delay_ms
+            columns[3][index] = dispersion_ms
+            columns[4][index] = server_id
+            columns[5][index] = stratum
+            columns[6][index] = kind
+            self.total = total + 1
+            if self._map is not None:
+                struct.pack_into("<Q", self._map, TOTAL_OFFSET, self.total)
+
+    def add_result(self, result, kind=SAMPLE):
+        """Dopisuje pomiar sntp.NtpResult."""
+        self.append(result.received_at, result.server, result.offset_ms, result.delay_ms,
+                    result.root_dispersion_ms, result.stratum, kind)
+
+    def _physical(self, logical):
+        """Indeks w buforze dla indeksu logicznego (0 = najstarszy zachowany wpis)."""
+        if self.total <= self.capacity:
+            return logical
+        return (self.total + logical) % self.capacity
+
+    def _bisect(self, timestamp):
+        """Pierwszy indeks logiczny, którego znacznik czasu jest >= timestamp."""
+        timestamps = self._columns[0]
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if timestamps[self._physical(middle)] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _segments(self, start, end):
+        """Ciągłe fragmenty bufora (od, do) odpowiadające indeksom logicznym [start, end)."""
+        if start >= end:
+            return []
+        first = self._physical(start)
+        last = first + (end - start)
+        if last <= self.capacity:
+            return [(first, last)]
+        return [(first, self.capacity), (0, last - self.capacity)]
+
+    def _copy(self, column, code, segments):
+        numpy = load_numpy()
+        if numpy is not None:
+            data = numpy.frombuffer(column, dtype=code)
+            return numpy.concatenate([data[a:b] for a, b in segments]) if segments else data[:0].copy()
+        result = array(code)
+        for a, b in segments:
+            result.frombytes(column[a:b].cast("B"))
+        return result
+
+    def range(self, start=None, end=None, server=None):
+        """Wpisy z przedziału czasu [start, end) (opcjonalnie jednego serwera) jako HistoryRange."""
+        with self._lock:
+            ordered = self.total >= self._ordered_from
+            if ordered:
+                low = 0 if start is None else self._bisect(start)
+                high = len(self) if end is None else self._bisect(end)
+            else:
+                # Znaczniki czasu nie są uporządkowane - granice wyznacza przeszukanie liniowe niżej
+                low, high = 0, len(self)
+            segments = self._segments(low, high)
+            columns = [self._copy(column, code, segments) for column, (_, code) in zip(self._columns, COLUMNS)]
+            server_id = self._server_ids.get(server) if server is not None else None
+
+        scan = not ordered and (start is not None or end is not None)
+        if server is None and not scan:
+            return HistoryRange(*columns)
+        if server is not None and server_id is None:
+            return HistoryRange(*[self._copy(column, code, []) for column, (_, code) in zip(self._columns, COLUMNS)])
+        numpy = load_numpy()
+        if numpy is not None:
+            mask = columns[4] == server_id if server is not None else numpy.ones(len(columns[4]), dtype=bool)
+            if scan and start is not None:
+                mask &= columns[0] >= start
+            if scan and end is not None:
+                mask &= columns[0] < end
+            return HistoryRange(*[column[mask] for column in columns])
+        selected = [i for i, (t, value) in enumerate(zip(columns[0], columns[4]))
+                    if (server is None or value == server_id)
+                    and not (scan and ((start is not None and t < start) or (end is not None and t >= end)))]
+        return HistoryRange(*[array(code, [column[i] for i in selected])
+                              for column, (_, code) in zip(columns, COLUMNS)])
+
+    def _rows(self, start, end):
+        segments = self._segments(start, end)
+        return HistoryRange(*[self._copy(column, code, segments) for column, (_, code) in zip(self._columns, COLUMNS)])
+
+    def last(self, count):
+        """Ostatnie count wpisów jako HistoryRange."""
+        with self._lock:
+            size = len(self)
+            return self._rows(max(size - count, 0), size)
+
+    def since(self, total):
+        """Wpisy dopisane, odkąd w historii było total wpisów: (HistoryRange, bieżące total).
+
+        Wpisy nadpisane w międzyczasie przez bufor cykliczny są pomijane.
+        """
+        with self._lock:
+            size = len(self)
+            return self._rows(max(size - (self.total - total), 0), size), self.total
+
+    def flush(self):
+        """Zapisuje zmiany pliku mapowanego na dysk."""
+        if self._map is not None:
+            self._map.flush()
+
+    def close(self):
+        if self._map is None:
+            return
+        with self._lock:
+            for column in self._columns:
+                column.release()
+            self._map.flush()
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def benchmark(samples=500000, capacity=1 << 18, servers=8):
+    """Szybkość dopisywania do bufora cyklicznego i zapytań o zakres (w pamięci i w pliku)."""
+    import tempfile
+    import time
+
+    results = {"samples": samples, "capacity": capacity, "numpy": load_numpy() is not None}
+    directory = tempfile.mkdtemp(prefix="zegarsync-")
+    path = os.path.join(directory, "history.bin")
+    names = [f"ntp{i}.example" for i in range(servers)]
+    for name, store in (("memory", HistoryStore(capacity)), ("mmap", HistoryStore(capacity, path))):
+        start = time.perf_counter()
+        for i in range(samples):
+            store.append(1e9 + i, names[i % servers], i * 1e-3, 5.0, 0.1, 2)
+        results[f"{name}_appends_per_s"] = samples / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        window = store.range(1e9 + samples - capacity // 2, 1e9 + samples)
+        results[f"{name}_range_ms"] = (time.perf_counter() - start) * 1000
+        results[f"{name}_range_rows"] = len(window.timestamp)
+
+        start = time.perf_counter()
+        store.range(server=names[0])
+        results[f"{name}_server_range_ms"] = (time.perf_counter() - start) * 1000
+        store.close()
+
+    os.remove(path)
+    os.remove(path + ".servers")
+    os.rmdir(directory)
+    return results
@@ -0,0 +1,73 @@
+"""Ograniczony bufor logów pobieranych partiami (np. przez widget tkinter)."""
+import logging
+import time
+from collections import deque
+
+# Domyślna liczba przechowywanych linii logu
+DEFAULT_MAX_LINES = 1000
+
+
+class BatchingHandler(logging.Handler):
+    """Handler odkładający sformatowane rekordy do ograniczonej kolejki.
+
+    Rekordy są pobierane partiami metodą drain(). Gdy odbiorca nie nadąża,
+    najstarsze linie są odrzucane - i tak nie zmieściłyby się w widoku.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        logging.Handler.__init__(self)
+        # deque.append/popleft są bezpieczne wątkowo - drain nie blokuje emitujących wątków
+        self.pending = deque(maxlen=max_lines)
+        self.max_lines = max_lines
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self):
+        """Zwraca wszystkie oczekujące linie (od najstarszej) i czyści kolejkę."""
+        lines = []
+        pending = self.pending
+        try:
+            while True:
+                lines.append(pending.popleft())
+        except IndexError:
+            pass
+        return lines
+
+
+def benchmark(records=50000, batch_interval=0.01):
+    """Przepustowość handlera: zapis rekordów i pobieranie partiami do bufora linii."""
+    handler = BatchingHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger = logging.getLogger("timesync.bench.logbuffer")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    # Odbiorca symuluje widget: jedno wstawienie na partię i obcinanie do max_lines
+    view = deque(maxlen=handler.max_lines)
+    batches = 0
+    start = time.perf_counter()
+    next_drain = start + batch_interval
+    try:
+        for i in range(records):
+            logger.info("Offset względem serwera %d: %+.3f ms", i % 10, i * 0.001)
+            if time.perf_counter() >= next_drain:
+                view.extend(handler.drain())
+                batches += 1
+                next_drain += batch_interval
+        view.extend(handler.drain())
+        batches += 1
+    finally:
+        logger.removeHandler(handler)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "records": records,
+        "batches": batches,
+        "records_per_s": records / elapsed,
+        "lines_kept": len(view),
+    }
@@ -0,0 +1,91 @@
+"""Nieblokujące logowanie do pliku: kolejka, format JSON lines i rotacja z kompresją."""
+import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+from datetime import datetime, timezone
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Domyślna rotacja: 5 plików po 5 MB
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# Pola pomiarowe przekazywane przez extra={...} i zapisywane w formacie JSON
+STRUCTURED_FIELDS = ("server", "offset_ms", "delay_ms", "stratum", "stage", "duration_ms")
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formatuje rekord jako jeden obiekt JSON w linii (z polami pomiarowymi)."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="microseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    """Kompresuje zamknięty segment logu i usuwa oryginał."""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def create_file_handler(path, json_lines=False, max_bytes=DEFAULT_MAX_BYTES,
+                        backup_count=DEFAULT_BACKUP_COUNT, when=None, compress=True):
+    """Tworzy handler pliku z rotacją wg rozmiaru (domyślnie) lub czasu (when, np. 'midnight')."""
+    if when:
+        handler = logging.handlers.TimedRotatingFileHandler(path, when=when, backupCount=backup_count,
+                                                            encoding="utf-8", delay=True)
+    else:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding="utf-8", delay=True)
+    if compress:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    handler.setFormatter(JsonLinesFormatter() if json_lines else logging.Formatter(LOG_FORMAT))
+    return handler
+
+
+def start_file_logging(path, logger=None, level=logging.INFO, **handler_options):
+    """Podpina do loggera QueueHandler; zapis na dysk wykonuje wątek QueueListener.
+
+    Wątki logujące (w tym wątek synchronizacji) nigdy nie czekają na dysk.
+    Zwraca uruchomiony QueueListener (zatrzymywany automatycznie przy wyjściu).
+    """
+    if logger is None:
+        logger = logging.getLogger()
+
+    file_handler = create_file_handler(path, **handler_options)
+    file_handler.setLevel(level)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
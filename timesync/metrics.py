@@ -0,0 +1,364 @@
+"""Metryki w formacie tekstowym Prometheus i lokalny punkt końcowy HTTP do ich pobierania.
+
+Zapis metryk nie używa blokad: liczniki i histogramy mają osobny fragment
+(listę wartości) dla każdego wątku piszącego, więc inkrementacja to zwykłe
+przypisanie do listy, której nie zmienia żaden inny wątek. Miernik (gauge)
+to pojedyncze przypisanie atrybutu. Odczyt sumuje fragmenty wszystkich
+wątków - wynik może nie uwzględniać zapisów trwających w chwili odczytu,
+ale żaden zapis nie ginie.
+
+Serwer HTTP działa na pętli tła (eventloop.BackgroundLoop), więc pobieranie
+metryk nie angażuje wątku interfejsu graficznego.
+"""
+import asyncio
+import logging
+import math
+from bisect import bisect_left
+from threading import get_ident
+
+# Domyślny port punktu końcowego (lokalnie, obok portów innych eksporterów Prometheus)
+DEFAULT_PORT = 9105
+DEFAULT_BIND = "127.0.0.1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Granice przedziałów histogramów (s)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RTT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+
+# Limit czasu odczytu żądania HTTP (s)
+REQUEST_TIMEOUT = 5.0
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels_text(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = {}       # identyfikator wątku -> [wartość]
+
+    def inc(self, amount=1.0):
+        ident = get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            shard = self._shards[ident] = [0.0]
+        shard[0] += amount
+
+    @property
+    def value(self):
+        return sum(shard[0] for shard in list(self._shards.values()))
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = math.nan
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "_shards")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self._shards = {}       # identyfikator wątku -> [liczności przedziałów..., +Inf, suma]
+
+    def observe(self, value):
+        ident = get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            shard = self._shards[ident] = [0] * (len(self.bounds) + 1) + [0.0]
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self):
+        """(liczności przedziałów łącznie z +Inf, suma) ze wszystkich wątków."""
+        totals = [0] * (len(self.bounds) + 2)
+        for shard in list(self._shards.values()):
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals[:-1], totals[-1]
+
+
+class Metric:
+    """Metryka z opcjonalnymi etykietami; każda kombinacja wartości etykiet to osobna seria."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        if registry is None:
+            registry = REGISTRY
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Seria dla podanych wartości etykiet (tworzona przy pierwszym użyciu)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"Metryka {self.name} wymaga etykiet {self.label_names}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def remove(self, *values):
+        self._children.pop(values, None)
+
+    def clear(self):
+        self._children = {}
+
+    def series(self):
+        return list(self._children.items())
+
+    def exposition(self):
+        """Linie formatu tekstowego Prometheus dla wszystkich serii."""
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self.series():
+            lines.append(f"{self.name}{_labels_text(self.label_names, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Licznik rosnący monotonicznie."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """Miernik - ostatnia ustawiona wartość."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(Metric):
+    """Histogram o stałych granicach przedziałów (łącznie z sumą i liczbą obserwacji)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=STAGE_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        Metric.__init__(self, name, documentation, labels, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def exposition(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        bounds = [_format_value(bound) for bound in self.bounds] + ["+Inf"]
+        for values, child in self.series():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _labels_text(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels_text(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Zbiór metryk udostępnianych razem."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def exposition(self):
+        """Wszystkie metryki w formacie tekstowym Prometheus."""
+        lines = []
+        for metric in list(self.metrics):
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SERVER_OFFSET = Gauge("timesync_server_offset_seconds", "Offset zegara lokalnego względem serwera NTP",
+                      ["server"])
+SERVER_DELAY = Gauge("timesync_server_delay_seconds", "Opóźnienie w obie strony do serwera NTP", ["server"])
+SERVER_STRATUM = Gauge("timesync_server_stratum", "Stratum serwera NTP", ["server"])
+SERVER_SELECTED = Gauge("timesync_server_selected", "1, gdy serwer przeszedł wybór źródeł czasu", ["server"])
+POLL_FAILURES = Counter("timesync_poll_failures_total", "Zapytania NTP bez poprawnej odpowiedzi", ["server"])
+POLL_RTT = Histogram("timesync_poll_rtt_seconds", "Opóźnienie w obie strony zapytań NTP", buckets=RTT_BUCKETS)
+OFFSET = Gauge("timesync_offset_seconds", "Połączony offset zegara z wybranych źródeł")
+FREQUENCY = Gauge("timesync_frequency_ppm", "Oszacowany dryf częstotliwości zegara lokalnego")
+SYNC_ATTEMPTS = Counter("timesync_sync_attempts_total", "Rozpoczęte synchronizacje zegara systemowego")
+SYNC_SUCCESS = Counter("timesync_sync_success_total", "Synchronizacje potwierdzone pomiarem offsetu")
+LAST_SYNC = Gauge("timesync_last_sync_success_timestamp_seconds", "Czas Unix ostatniej udanej synchronizacji")
+SYNC_STAGE = Histogram("timesync_sync_stage_seconds", "Czas trwania etapów synchronizacji", ["stage"])
+
+
+def record_result(result):
+    """Zapisuje pomiar sntp.NtpResult (offset, opóźnienie, stratum, RTT)."""
+    server = result.server
+    SERVER_OFFSET.labels(server).set(result.offset_ms / 1000)
+    SERVER_DELAY.labels(server).set(result.delay_ms / 1000)
+    SERVER_STRATUM.labels(server).set(result.stratum)
+    POLL_RTT.observe(result.delay_ms / 1000)
+
+
+def record_failure(server):
+    POLL_FAILURES.labels(server).inc()
+
+
+def forget_server(server):
+    """Usuwa serie serwera, który przestał być źródłem (np. adres wymieniony w puli)."""
+    for metric in (SERVER_OFFSET, SERVER_DELAY, SERVER_STRATUM, SERVER_SELECTED, POLL_FAILURES):
+        metric.remove(server)
+
+
+def record_selection(selection, servers=()):
+    """Zapisuje wynik selection.select_sources: wybrane źródła i połączony offset.
+
+    servers to pozostałe odpytane serwery (np. bez odpowiedzi) - oznaczane jako niewybrane.
+    """
+    selected = {result.server for result in selection.survivors}
+    for server in {result.server for result in selection.falsetickers}.union(servers):
+        if server not in selected:
+            SERVER_SELECTED.labels(server).set(0)
+    for server in selected:
+        SERVER_SELECTED.labels(server).set(1)
+    if selection.offset_ms is not None:
+        OFFSET.set(selection.offset_ms / 1000)
+
+
+def record_sync(result, timestamp):
+    """Zapisuje zakończoną synchronizację pipeline.SyncResult (czasy etapów, sukces w chwili timestamp).
+
+    Próbę liczy wywołujący przed jej rozpoczęciem (SYNC_ATTEMPTS), aby obejmowała też przerwane wyjątkiem.
+    """
+    for stage, duration_ms in result.stages:
+        SYNC_STAGE.labels(stage).observe(duration_ms / 1000)
+    if result.success:
+        SYNC_SUCCESS.inc()
+        LAST_SYNC.set(timestamp)
+
+
+async def _handle(reader, writer, registry):
+    try:
+        request = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        while True:
+            line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request.split()
+        if len(parts) < 2 or parts[0] not in (b"GET", b"HEAD"):
+            status, body = "405 Method Not Allowed", b""
+        elif parts[1].split(b"?")[0] in (b"/metrics", b"/"):
+            status, body = "200 OK", registry.exposition().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b""
+        header = (f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\n"
+                  f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(header.encode("ascii") + (body if parts[:1] != [b"HEAD"] else b""))
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError) as e:
+        logging.debug(f"Przerwane żądanie metryk: {str(e) or type(e).__name__}")
+    finally:
+        writer.close()
+
+
+async def start_server(host=DEFAULT_BIND, port=DEFAULT_PORT, registry=None):
+    """Uruchamia punkt końcowy HTTP /metrics na bieżącej pętli; zwraca asyncio.Server."""
+    registry = registry or REGISTRY
+    return await asyncio.start_server(lambda reader, writer: _handle(reader, writer, registry), host, port)
+
+
+def benchmark(updates=200000, servers=200):
+    """Koszt zapisu metryk na ścieżce pomiaru i czas pełnego pobrania przez HTTP."""
+    import time
+    import urllib.request
+
+    from timesync.eventloop import BackgroundLoop
+    from timesync.sntp import NtpResult
+
+    registry = Registry()
+    counter = Counter("bench_total", "Licznik", registry=registry)
+    histogram = Histogram("bench_seconds", "Histogram", ["server"], buckets=RTT_BUCKETS, registry=registry)
+    gauge = Gauge("bench_offset_seconds", "Miernik", ["server"], registry=registry)
+    names = [f"ntp{i}.example" for i in range(servers)]
+    children = [histogram.labels(name) for name in names]
+
+    results = {"updates": updates, "servers": servers}
+    start = time.perf_counter()
+    for _ in range(updates):
+        counter.inc()
+    results["counter_inc_ns"] = (time.perf_counter() - start) / updates * 1e9
+
+    start = time.perf_counter()
+    for i in range(updates):
+        children[i % servers].observe(i * 1e-6)
+    results["histogram_observe_ns"] = (time.perf_counter() - start) / updates * 1e9
+
+    start = time.perf_counter()
+    for i in range(updates):
+        gauge.labels(names[i % servers]).set(i)
+    results["labelled_gauge_set_ns"] = (time.perf_counter() - start) / updates * 1e9
+
+    # Pełna ścieżka zapisu pomiaru z harmonogramu (globalne metryki aplikacji)
+    sample = NtpResult(names[0], 0.5, 12.0, 2, "GPS", 0, 4, 6, -20, 0.0, 0.1, 0.0)
+    start = time.perf_counter()
+    for _ in range(updates):
+        record_result(sample)
+    results["record_result_ns"] = (time.perf_counter() - start) / updates * 1e9
+
+    background = BackgroundLoop()
+    server = background.submit(start_server("127.0.0.1", 0, registry)).result()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        start = time.perf_counter()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read()
+        results["scrape_ms"] = (time.perf_counter() - start) * 1000
+        results["scrape_bytes"] = len(body)
+    finally:
+        background.loop.call_soon_threadsafe(server.close)
+        background.stop(timeout=5)
+    return results
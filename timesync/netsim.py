@@ -0,0 +1,305 @@
+"""Symulacja sieci serwerów NTP na wirtualnej osi czasu (zdarzenia dyskretne, powtarzalna z ziarna).
+
+Zapytania do serwerów symulowanych (NetworkSimulator.query) mają tę samą
+postać co poller.query_async, więc prawdziwy harmonogram, filtry, wybór
+źródeł i potok synchronizacji działają bez zmian - tyle że na pętli
+VirtualTimeLoop, w której czas nie płynie, tylko przeskakuje do najbliższego
+zdarzenia. Doba pracy dyscypliny zegara trwa więc sekundy, a ten sam seed
+daje ten sam przebieg:
+
+    simulator = NetworkSimulator.generate(1000, seed=1)
+    outcome = simulator.poll(list(simulator.servers))
+    stats = simulate_discipline(simulator, hours=24)
+"""
+import asyncio
+import math
+import random
+import selectors
+import time
+
+from timesync import poller, service, sntp
+
+# Czas odniesienia symulacji (ns od epoki Unix) - chwila 0 pętli wirtualnej
+DEFAULT_EPOCH_NS = 1_700_000_000 * 1_000_000_000
+
+# Domyślne parametry generowanej sieci
+FALSETICKER_RATE = 0.05      # odsetek serwerów podających błędny czas
+LOSS_RATE = 0.01             # prawdopodobieństwo zgubienia pakietu
+MEDIAN_LATENCY_MS = 10.0     # mediana opóźnienia w jedną stronę
+PROCESSING_NS = 20_000       # czas obsługi zapytania przez serwer
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Pętla asyncio z czasem wirtualnym: zamiast czekać na termin zdarzenia, przeskakuje do niego.
+
+    Gniazda są nadal obsługiwane (np. call_soon_threadsafe), ale czekanie
+    na nie nie przesuwa czasu - pętla nadaje się do kodu, który nie wykonuje
+    prawdziwej komunikacji sieciowej.
+    """
+
+    def __init__(self, start=0.0):
+        self._virtual_time = start
+        asyncio.SelectorEventLoop.__init__(self, _VirtualSelector(self))
+
+    def time(self):
+        return self._virtual_time
+
+    def advance(self, seconds):
+        self._virtual_time += seconds
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """Selektor, którego czekanie z limitem czasu przesuwa czas pętli wirtualnej."""
+
+    def __init__(self, loop):
+        selectors.DefaultSelector.__init__(self)
+        self.loop = loop
+
+    def select(self, timeout=None):
+        ready = selectors.DefaultSelector.select(self, 0)
+        if ready or (timeout is not None and timeout <= 0):
+            return ready
+        if timeout is None:
+            # Brak zaplanowanych zdarzeń - czekamy na inny wątek (czas wirtualny stoi)
+            return selectors.DefaultSelector.select(self, None)
+        self.loop.advance(timeout)
+        return []
+
+
+class SimulatedClock:
+    """Zegar z przesunięciem offset_ms (w chwili 0) i dryfem drift_ppm względem czasu prawdziwego."""
+
+    def __init__(self, offset_ms=0.0, drift_ppm=0.0, epoch_ns=DEFAULT_EPOCH_NS):
+        self.offset_ms = offset_ms
+        self.drift_ppm = drift_ppm
+        self.epoch_ns = epoch_ns
+
+    def error_ms(self, true_s):
+        """Błąd zegara (wskazanie - czas prawdziwy) w chwili true_s."""
+        return self.offset_ms + self.drift_ppm * 1e-3 * true_s
+
+    def ns(self, true_s):
+        """Wskazanie zegara (ns od epoki Unix) w chwili true_s symulacji."""
+        return self.epoch_ns + int(true_s * 1e9 + self.error_ms(true_s) * 1e6)
+
+    def step(self, delta_ms):
+        """Skokowa korekta wskazań (np. synchronizacja zegara)."""
+        self.offset_ms += delta_ms
+
+
+class SimulatedServer:
+    """Parametry serwera symulowanego: ścieżka sieciowa i jego własny zegar."""
+
+    __slots__ = ("name", "latency_ms", "jitter_ms", "asymmetry", "loss", "stratum", "clock", "falseticker", "kod")
+
+    def __init__(self, name, latency_ms=MEDIAN_LATENCY_MS, jitter_ms=1.0, asymmetry=0.0, loss=0.0, stratum=2,
+                 offset_ms=0.0, drift_ppm=0.0, falseticker=False, kod=None, epoch_ns=DEFAULT_EPOCH_NS):
+        self.name = name
+        self.latency_ms = latency_ms      # opóźnienie w jedną stronę bez kolejkowania
+        self.jitter_ms = jitter_ms        # średnie dodatkowe opóźnienie kolejkowania (rozkład wykładniczy)
+        self.asymmetry = asymmetry        # -1..1: o ile ścieżka do serwera jest dłuższa niż powrotna
+        self.loss = loss
+        self.stratum = stratum
+        self.clock = SimulatedClock(offset_ms, drift_ppm, epoch_ns)
+        self.falseticker = falseticker
+        self.kod = kod                    # kod Kiss-o'-Death (np. "RATE") zamiast odpowiedzi
+
+
+class NetworkSimulator:
+    """Sieć serwerów symulowanych i zegar lokalny klienta na wspólnej pętli VirtualTimeLoop."""
+
+    def __init__(self, seed=None, clock=None, epoch_ns=DEFAULT_EPOCH_NS):
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.epoch_ns = epoch_ns
+        self.clock = clock or SimulatedClock(epoch_ns=epoch_ns)
+        self.servers = {}
+        self.loop = VirtualTimeLoop()
+        self.queries = 0
+        self.lost = 0
+
+    @classmethod
+    def generate(cls, servers, seed=None, falsetickers=FALSETICKER_RATE, loss=LOSS_RATE, kod=0.0,
+                 local_offset_ms=None, local_drift_ppm=None):
+        """Tworzy sieć losowych serwerów: servers to liczba lub lista nazw.
+
+        Opóźnienia mają rozkład logarytmiczno-normalny, fałszywe źródła
+        przesunięcie od 50 ms do 2 s; zegar lokalny bez podanych parametrów
+        ma losowy offset (do ±500 ms) i dryf (odchylenie 15 ppm).
+        """
+        simulator = cls(seed)
+        rng = simulator.random
+        names = [f"sim{i}.ntp.test" for i in range(servers)] if isinstance(servers, int) else list(servers)
+        for name in names:
+            latency = min(max(rng.lognormvariate(math.log(MEDIAN_LATENCY_MS), 0.8), 0.2), 300.0)
+            falseticker = rng.random() < falsetickers
+            if falseticker:
+                offset = rng.choice((-1, 1)) * rng.uniform(50.0, 2000.0)
+                drift = rng.gauss(0.0, 20.0)
+            else:
+                offset = rng.gauss(0.0, 0.5)
+                drift = rng.gauss(0.0, 0.05)
+            simulator.add_server(name, latency_ms=latency, jitter_ms=latency * rng.uniform(0.02, 0.3),
+                                 asymmetry=rng.uniform(-0.3, 0.3), loss=loss, stratum=rng.choice((1, 2, 2, 2, 3)),
+                                 offset_ms=offset, drift_ppm=drift, falseticker=falseticker,
+                                 kod="RATE" if rng.random() < kod else None)
+        simulator.clock.offset_ms = rng.uniform(-500.0, 500.0) if local_offset_ms is None else local_offset_ms
+        simulator.clock.drift_ppm = rng.gauss(0.0, 15.0) if local_drift_ppm is None else local_drift_ppm
+        return simulator
+
+    def add_server(self, name, **params):
+        server = self.servers[name] = SimulatedServer(name, epoch_ns=self.epoch_ns, **params)
+        return server
+
+    def now(self):
+        """Czas prawdziwy symulacji (s od chwili 0)."""
+        return self.loop.time()
+
+    def error_ms(self):
+        """Bieżący błąd zegara lokalnego względem czasu prawdziwego."""
+        return self.clock.error_ms(self.now())
+
+    def run(self, coro):
+        """Wykonuje korutynę na pętli wirtualnej."""
+        return self.loop.run_until_complete(coro)
+
+    def poll(self, servers, port=sntp.NTP_PORT, timeout=2.0):
+        """Odpowiednik poller.poll dla serwerów symulowanych."""
+        return self.run(poller.poll_servers(servers, port, timeout, query=self.query))
+
+    def _delay(self, server, share):
+        """Opóźnienie jednej drogi pakietu w sekundach."""
+        base = server.latency_ms * share
+        return (base + self.random.expovariate(1.0 / server.jitter_ms) if server.jitter_ms else base) / 1000
+
+    async def query(self, server, port=sntp.NTP_PORT, timeout=2.0):
+        """Zapytanie SNTP do serwera symulowanego (jak poller.query_async, np. jako query= harmonogramu)."""
+        model = self.servers.get(server)
+        if model is None:
+            raise sntp.NtpError(f"Nie można rozwiązać nazwy serwera {server}")
+        self.queries += 1
+
+        loop = asyncio.get_running_loop()
+        originate_ns = self.clock.ns(loop.time())
+        request = sntp.build_request(originate_ns)
+        outbound = self._delay(model, 1 + model.asymmetry)
+        inbound = self._delay(model, 1 - model.asymmetry)
+        if self.random.random() < model.loss or outbound + inbound > timeout:
+            self.lost += 1
+            await asyncio.sleep(timeout)
+            raise sntp.NtpError(f"Przekroczono limit czasu odpowiedzi serwera {server}")
+
+        await asyncio.sleep(outbound)
+        receive_ns = model.clock.ns(loop.time())
+        if model.kod is not None:
+            response = sntp.build_response(request, receive_ns, receive_ns, stratum=0, ref_id=model.kod.encode())
+        else:
+            response = sntp.build_response(request, receive_ns, receive_ns + PROCESSING_NS, stratum=model.stratum,
+                                           ref_id=b"SIM")
+        await asyncio.sleep(inbound + PROCESSING_NS / 1e9)
+        return sntp.parse_response(response, originate_ns, self.clock.ns(loop.time()), server)
+
+    def close(self):
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SimulatedTimeService(service.FakeTimeServiceController):
+    """Atrapa usługi czasu, której resynchronizacja koryguje zegar symulowany wg skonfigurowanych serwerów."""
+
+    display_name = "SimTime"
+
+    def __init__(self, simulator, **kwargs):
+        service.FakeTimeServiceController.__init__(self, **kwargs)
+        self.simulator = simulator
+
+    def _resync(self):
+        result = self._record("resync")
+        if result.ok:
+            selection = self.simulator.poll(self.peers).selection
+            if selection.offset_ms is None:
+                return service.CommandResult(False, "resync: brak zgodnych źródeł czasu")
+            self.simulator.clock.step(selection.offset_ms)
+        return result
+
+
+def simulate_discipline(simulator, hours=24.0, threshold_ms=None, history=None):
+    """Ciągła dyscyplina zegara (harmonogram, filtry, wybór źródeł, predykcja) na sieci symulowanej.
+
+    Synchronizacja zlecona przez dyscyplinę koryguje zegar symulowany
+    o przewidywany offset. Zwraca słownik ze statystykami przebiegu.
+    """
+    from timesync.discipline import DEFAULT_THRESHOLD_MS, DisciplineService
+
+    def on_sync_needed(predicted):
+        simulator.clock.step(predicted)
+        discipline.sync_completed()
+
+    discipline = DisciplineService(list(simulator.servers), on_sync_needed=on_sync_needed,
+                                   threshold_ms=threshold_ms or DEFAULT_THRESHOLD_MS, query=simulator.query,
+                                   history=history, monotonic=simulator.loop.time)
+    start_error = simulator.error_ms()
+    started = time.perf_counter()
+    simulator.run(discipline.run(duration=hours * 3600))
+    elapsed = time.perf_counter() - started
+
+    predicted, frequency = discipline.discipline.snapshot(simulator.now())
+    return {
+        "seed": simulator.seed,
+        "servers": len(simulator.servers),
+        "falsetickers": sum(1 for s in simulator.servers.values() if s.falseticker),
+        "simulated_hours": hours,
+        "real_s": elapsed,
+        "speedup": hours * 3600 / elapsed,
+        "queries": simulator.queries,
+        "lost": simulator.lost,
+        "samples": discipline.polls,
+        "syncs": discipline.syncs_requested,
+        "start_error_ms": start_error,
+        "final_error_ms": simulator.error_ms(),
+        # Offset serwerów względem zegara lokalnego to minus błąd zegara
+        "prediction_error_ms": None if predicted is None else predicted + simulator.error_ms(),
+        "drift_error_ppm": None if frequency is None else frequency + simulator.clock.drift_ppm,
+    }
+
+
+def benchmark(servers=5000, discipline_servers=50, hours=24.0, seed=1):
+    """Wybór źródeł spośród tysięcy serwerów i doba dyscypliny zegara w czasie wirtualnym."""
+    import logging
+
+    results = {}
+    with NetworkSimulator.generate(servers, seed=seed) as simulator:
+        started = time.perf_counter()
+        outcome = simulator.poll(list(simulator.servers))
+        results["poll_servers"] = servers
+        results["poll_real_ms"] = (time.perf_counter() - started) * 1000
+        results["poll_virtual_ms"] = outcome.elapsed_ms
+        rejected = {r.server for r in outcome.selection.falsetickers}
+        actual = {name for name, s in simulator.servers.items() if s.falseticker}
+        results["falsetickers_rejected"] = f"{len(rejected & actual)}/{len(actual)}"
+        results["truechimers_rejected"] = len(rejected - actual)
+        results["selection_error_ms"] = outcome.selection.offset_ms + simulator.error_ms()
+
+    previous = logging.root.manager.disable
+    logging.disable(logging.WARNING)
+    try:
+        with NetworkSimulator.generate(discipline_servers, seed=seed) as simulator:
+            stats = simulate_discipline(simulator, hours)
+        # Ten sam seed musi dać identyczny przebieg
+        runs = []
+        for _ in range(2):
+            with NetworkSimulator.generate(discipline_servers, seed=seed) as simulator:
+                runs.append(simulate_discipline(simulator, 1.0))
+    finally:
+        logging.disable(previous)
+    for key, value in stats.items():
+        if key not in ("seed", "real_s"):
+            results[f"discipline_{key}"] = value
+    results["deterministic"] = all(runs[0][key] == runs[1][key] for key in runs[0]
+                                   if key not in ("real_s", "speedup"))
+    return results
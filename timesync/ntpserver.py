@@ -0,0 +1,244 @@
+"""Lokalny serwer SNTP udostępniający czas systemowy lub wirtualny oraz generator obciążenia."""
+import asyncio
+import logging
+import socket
+import struct
+import time
+
+from timesync import sntp
+
+DEFAULT_PORT = sntp.NTP_PORT
+
+# Zegar lokalny bez synchronizacji (RFC 5905) i zegar wirtualny aplikacji; czas wirtualny
+# celowo odbiega od rzeczywistego, więc ma najwyższe ważne stratum - klient NTP wybierze
+# go dopiero wtedy, gdy nie ma żadnego innego źródła
+STRATUM_SYSTEM = 10
+STRATUM_VIRTUAL = 15
+REF_ID_SYSTEM = b"LOCL"
+REF_ID_VIRTUAL = b"VIRT"
+
+# Wskaźnik sekundy przestępnej 3: zegar niezsynchronizowany (klienci NTP odrzucają taki czas)
+LEAP_UNSYNCHRONIZED = 3
+
+# Bufor odbiorczy gniazda - pakiety nie giną przy chwilowych skokach obciążenia
+RECEIVE_BUFFER = 4 * 1024 * 1024
+
+# Najwięcej datagramów odbieranych jednorazowo po zgłoszeniu gotowości gniazda
+RECEIVE_BATCH = 64
+
+# Znacznik odniesienia (8 B), znacznik nadania klienta (8 B), odbioru i wysłania
+TIMESTAMPS = struct.Struct("!Q8sQQ")
+TIMESTAMPS_OFFSET = 16
+
+_NTP_EPOCH_NS = sntp.NTP_EPOCH_DELTA * 1_000_000_000
+_NTP_MASK = (1 << 64) - 1
+_VERSION_MASK = 0x38
+_DEFAULT_VERSION = sntp.NTP_VERSION << 3
+
+
+class NtpServerProtocol(asyncio.DatagramProtocol):
+    """Odpowiada na zapytania klientów SNTP czasem z funkcji clock() (ns od epoki Unix).
+
+    Odpowiedź jest budowana w jednym, wstępnie zaalokowanym buforze: stałe pola
+    nagłówka są wypełnione raz, a dla każdego pakietu nadpisywane są tylko
+    wersja, interwał odpytywania i cztery znaczniki czasu. Transport kopiuje
+    bufor tylko wtedy, gdy nie może wysłać pakietu od razu.
+
+    timestamping mówi, skąd pochodzi czas odebrania zapytania (T2): ze
+    znacznika jądra (TimestampingTransport) lub z odczytu zegara.
+    """
+
+    def __init__(self, clock=time.time_ns, stratum=STRATUM_SYSTEM, ref_id=REF_ID_SYSTEM, precision=-20, leap=0):
+        self.clock = clock
+        self.transport = None
+        self.timestamping = sntp.TIMESTAMP_USER
+        self.requests = 0
+        self.dropped = 0
+        self._system_clock = clock is time.time_ns
+        self._leap = leap << 6
+        self.response = bytearray(sntp.NTP_PACKET_SIZE)
+        sntp.NTP_PACKET.pack_into(self.response, 0, self._leap | _DEFAULT_VERSION | sntp.MODE_SERVER, stratum, 0,
+                                  precision, 0, 0, ref_id, 0, 0, 0, 0)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except OSError:
+            pass
+
+    def datagram_received(self, data, addr):
+        self.respond(data, addr)
+
+    def respond(self, data, addr, arrival_ns=None):
+        """Odpowiada na zapytanie; arrival_ns to czas odbioru wg jądra (zegar systemowy) lub None."""
+        if arrival_ns is None:
+            receive = self.clock()
+        elif self._system_clock:
+            receive = arrival_ns
+        else:
+            # Czas wirtualny w chwili odbioru: cofamy bieżący odczyt o czas, który minął od odbioru
+            receive = self.clock() - (time.time_ns() - arrival_ns)
+        receive = ((receive + _NTP_EPOCH_NS) << 32) // 1_000_000_000 & _NTP_MASK
+        self.requests += 1
+        if len(data) < sntp.NTP_PACKET_SIZE or data[0] & 0x07 != sntp.MODE_CLIENT:
+            self.dropped += 1
+            return
+
+        response = self.response
+        response[0] = self._leap | (data[0] & _VERSION_MASK or _DEFAULT_VERSION) | sntp.MODE_SERVER
+        response[2] = data[2]
+        # Zegar jest stale prowadzony, więc jako czas ostatniego ustawienia podajemy pełną sekundę
+        transmit = ((self.clock() + _NTP_EPOCH_NS) << 32) // 1_000_000_000 & _NTP_MASK
+        TIMESTAMPS.pack_into(response, TIMESTAMPS_OFFSET, receive & ~0xFFFFFFFF, data[40:48], receive, transmit)
+        self.transport.sendto(response, addr)
+
+    def error_received(self, exc):
+        logging.debug(f"Błąd gniazda serwera NTP: {str(exc)}")
+
+
+class TimestampingTransport(asyncio.DatagramTransport):
+    """Transport UDP odbierający datagramy partiami przez recvmsg ze znacznikami czasu jądra.
+
+    Gniazdo jest obserwowane przez pętlę (add_reader); po zgłoszeniu gotowości
+    odbieranych jest do RECEIVE_BATCH datagramów, a każdy trafia do
+    protocol.respond wraz z czasem odbioru nadanym przez jądro.
+    """
+
+    def __init__(self, loop, sock, protocol):
+        asyncio.DatagramTransport.__init__(self, {"socket": sock, "sockname": sock.getsockname()})
+        self._loop = loop
+        self._sock = sock
+        self._protocol = protocol
+        self._closing = False
+        self.send_dropped = 0
+        protocol.timestamping = sntp.TIMESTAMP_KERNEL
+        protocol.connection_made(self)
+        loop.add_reader(sock.fileno(), self._read_ready)
+
+    def _read_ready(self):
+        sock = self._sock
+        respond = self._protocol.respond
+        for _ in range(RECEIVE_BATCH):
+            try:
+                data, addr, arrival_ns = sntp.recv_timestamped(sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self._protocol.error_received(e)
+                return
+            respond(data, addr, arrival_ns)
+
+    def sendto(self, data, addr=None):
+        try:
+            self._sock.sendto(data, addr)
+        except (BlockingIOError, InterruptedError):
+            # Pełny bufor nadawczy - klient ponowi zapytanie
+            self.send_dropped += 1
+        except OSError as e:
+            self._protocol.error_received(e)
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._protocol.connection_lost(None)
+
+    abort = close
+
+
+async def start_server(host="0.0.0.0", port=DEFAULT_PORT, clock=time.time_ns, kernel_timestamps=True, **options):
+    """Uruchamia serwer na bieżącej pętli; zwraca (transport, protokół).
+
+    Tam, gdzie to możliwe (Linux), czas odebrania zapytań pochodzi z jądra;
+    w pozostałych systemach używany jest zwykły transport datagramowy asyncio.
+    """
+    loop = asyncio.get_running_loop()
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    if kernel_timestamps and sntp.SO_TIMESTAMPNS is not None:
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            sock.bind((host, port))
+            if sntp.enable_kernel_timestamps(sock):
+                protocol = NtpServerProtocol(clock, **options)
+                return TimestampingTransport(loop, sock, protocol), protocol
+        except NotImplementedError:
+            pass
+        except BaseException:
+            sock.close()
+            raise
+        sock.close()
+    return await loop.create_datagram_endpoint(lambda: NtpServerProtocol(clock, **options),
+                                               local_addr=(host, port), family=family)
+
+
+def load_test(host="127.0.0.1", port=DEFAULT_PORT, seconds=2.0, window=64, timeout=0.5):
+    """Generator obciążenia: wysyła zapytania partiami po window i liczy odpowiedzi.
+
+    Zwraca słownik z liczbą wysłanych zapytań, odpowiedzi, zgubionych pakietów
+    i przepustowością (odpowiedzi na sekundę).
+    """
+    request = sntp.build_request(time.time_ns())
+    buffer = bytearray(512)
+    sent = received = 0
+
+    with socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        sock.connect((host, port))
+        sock.settimeout(timeout)
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(window):
+                sock.send(request)
+            sent += window
+            try:
+                for _ in range(window):
+                    sock.recv_into(buffer)
+                    received += 1
+            except socket.timeout:
+                pass
+            except ConnectionRefusedError:
+                break
+        elapsed = time.perf_counter() - start
+
+    return {
+        "sent": sent,
+        "received": received,
+        "lost": sent - received,
+        "responses_per_s": received / elapsed,
+    }
+
+
+def _server_process(port_queue):
+    """Proces serwera w benchmarku (osobny rdzeń dla generatora obciążenia)."""
+    async def run():
+        transport, _ = await start_server("127.0.0.1", 0)
+        port_queue.put(transport.get_extra_info("sockname")[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def benchmark(seconds=2.0, window=64):
+    """Przepustowość serwera na jednym rdzeniu mierzona generatorem w osobnym procesie."""
+    import multiprocessing
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_server_process, args=(port_queue,), daemon=True)
+    server.start()
+    try:
+        port = port_queue.get(timeout=10)
+        results = load_test("127.0.0.1", port, seconds, window)
+    finally:
+        server.terminate()
+        server.join()
+    results["window"] = window
+    return results
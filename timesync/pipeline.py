@@ -0,0 +1,214 @@
+"""Synchronizacja jako maszyna stanów z oczekiwaniem na gotowość usługi i weryfikacją offsetu."""
+import logging
+import time
+from collections import namedtuple
+
+from timesync import service, tracing
+
+# Offset po synchronizacji, poniżej którego uznajemy ją za udaną (ms)
+VERIFY_THRESHOLD_MS = 100.0
+
+# Domyślna liczba prób resynchronizacji i limit czasu pojedynczego etapu (s)
+DEFAULT_ATTEMPTS = 2
+STAGE_TIMEOUT = 15.0
+
+# Oczekiwanie na gotowość: pierwszy odstęp, mnożnik i maksymalny odstęp (s)
+POLL_INITIAL = 0.05
+POLL_FACTOR = 2.0
+POLL_MAX = 1.0
+
+# Etapy synchronizacji
+STATUS = "status"
+ENABLE = "enable"
+STOP = "stop"
+CONFIGURE = "config"
+START = "start"
+RESYNC = "resync"
+VERIFY = "verify"
+DONE = "done"
+FAILED = "failed"
+
+SyncResult = namedtuple("SyncResult", [
+    "success",      # czy synchronizacja została potwierdzona
+    "server",       # serwer wskazany przez użytkownika
+    "peers",        # serwery przekazane usłudze czasu
+    "attempts",     # liczba prób resynchronizacji
+    "message",      # opis wyniku do wyświetlenia użytkownikowi
+    "offset_ms",    # offset zmierzony po synchronizacji (None, gdy pomiar się nie udał)
+    "stages",       # lista (etap, czas trwania w ms) w kolejności wykonania
+])
+
+
+def wait_until(predicate, timeout, initial=POLL_INITIAL, factor=POLL_FACTOR, maximum=POLL_MAX,
+               sleep=time.sleep, clock=time.monotonic):
+    """Sprawdza warunek z wykładniczo rosnącym odstępem aż do spełnienia lub upływu czasu.
+
+    Zwraca True, jeśli warunek został spełniony przed upływem limitu.
+    """
+    deadline = clock() + timeout
+    interval = initial
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return False
+        with tracing.span("sleep", tracing.SLEEP):
+            sleep(min(interval, remaining))
+        interval = min(interval * factor, maximum)
+
+
+class SyncPipeline:
+    """Maszyna stanów synchronizacji: status, włączenie, zatrzymanie, konfiguracja,
+    uruchomienie, resynchronizacja i weryfikacja.
+
+    Zamiast stałych opóźnień każdy etap czeka na faktyczną gotowość usługi
+    (z wykładniczym odstępem i limitem czasu). O sukcesie decyduje offset
+    zmierzony po synchronizacji (measure() zwraca offset w ms lub None),
+    a nie tekst zwracany przez narzędzia systemowe.
+    """
+
+    def __init__(self, server, controller, peers=None, measure=None, attempts=DEFAULT_ATTEMPTS,
+                 verify_threshold_ms=VERIFY_THRESHOLD_MS, stage_timeout=STAGE_TIMEOUT, sleep=time.sleep):
+        self.server = server
+        self.controller = controller
+        self.peers = list(peers or [server])
+        self.measure = measure
+        self.attempts = attempts
+        self.verify_threshold_ms = verify_threshold_ms
+        self.stage_timeout = stage_timeout
+        self.sleep = sleep
+
+        self.state = STATUS
+        self.attempt = 0
+        self.offset_ms = None
+        self.message = None
+        self.stages = []
+        self._service_status = None
+        self._resync_ok = False
+
+        self.handlers = {
+            STATUS: self.stage_status,
+            ENABLE: self.stage_enable,
+            STOP: self.stage_stop,
+            CONFIGURE: self.stage_configure,
+            START: self.stage_start,
+            RESYNC: self.stage_resync,
+            VERIFY: self.stage_verify,
+        }
+
+    def wait_for(self, predicate):
+        return wait_until(predicate, self.stage_timeout, sleep=self.sleep)
+
+    def wait_for_status(self, *states):
+        return self.wait_for(lambda: self.controller.status(refresh=True) in states)
+
+    def run(self):
+        """Wykonuje kolejne etapy aż do stanu DONE lub FAILED i zwraca SyncResult."""
+        while self.state not in (DONE, FAILED):
+            stage = self.state
+            started = time.perf_counter_ns()
+            with tracing.span(stage, tracing.STAGE, attempt=self.attempt):
+                self.state = self.handlers[stage]()
+            self.stages.append((stage, (time.perf_counter_ns() - started) / 1e6))
+
+        return SyncResult(self.state == DONE, self.server, self.peers, self.attempt, self.message,
+                          self.offset_ms, self.stages)
+
+    def fail(self, message):
+        self.message = message
+        return FAILED
+
+    def stage_status(self):
+        name = self.controller.display_name
+        logging.info(f"Etap 1/5: Sprawdzanie stanu usługi {name}...", extra={"stage": STATUS})
+        self._service_status = self.controller.status()
+        logging.info(f"Status usługi {name}: {self._service_status}")
+
+        if self._service_status == service.DISABLED:
+            return ENABLE
+        logging.info(f"Etap 2/5: Usługa {name} jest już włączona.", extra={"stage": ENABLE})
+        if self._service_status == service.RUNNING:
+            return STOP
+        logging.info(f"Etap 3/5: Usługa {name} już była zatrzymana.", extra={"stage": STOP})
+        return CONFIGURE
+
+    def stage_enable(self):
+        name = self.controller.display_name
+        logging.info(f"Etap 2/5: Włączanie usługi {name}...", extra={"stage": ENABLE})
+        result = self.controller.enable()
+        if not result.ok or not self.wait_for(lambda: self.controller.status(refresh=True) != service.DISABLED):
+            logging.error(f"Nie udało się włączyć usługi {name}: {result.output}")
+            return self.fail(f"Nie udało się włączyć usługi {name}.")
+        logging.info(f"Usługa {name} została włączona.")
+        logging.info(f"Etap 3/5: Usługa {name} już była zatrzymana.", extra={"stage": STOP})
+        return CONFIGURE
+
+    def stage_stop(self):
+        name = self.controller.display_name
+        logging.info(f"Etap 3/5: Zatrzymywanie usługi {name}...", extra={"stage": STOP})
+        result = self.controller.stop()
+        if not result.ok:
+            logging.warning(f"Ostrzeżenie przy zatrzymywaniu usługi: {result.output}")
+        elif self.wait_for_status(service.STOPPED):
+            logging.info(f"Usługa {name} zatrzymana pomyślnie.")
+        else:
+            logging.warning(f"Usługa {name} nie zatrzymała się w ciągu {self.stage_timeout:.0f} s.")
+        return CONFIGURE
+
+    def stage_configure(self):
+        logging.info("Etap 4/5: Konfiguracja serwera czasu...", extra={"stage": CONFIGURE})
+        result = self.controller.configure(self.peers)
+        if not result.ok:
+            logging.error(f"Błąd przy konfiguracji serwera czasu: {result.output}")
+        else:
+            logging.info("Serwer czasu skonfigurowany pomyślnie.")
+        return START
+
+    def stage_start(self):
+        name = self.controller.display_name
+        logging.info(f"Etap 5/5: Uruchamianie usługi {name}...", extra={"stage": START})
+        result = self.controller.start()
+        if not result.ok:
+            logging.error(f"Błąd przy uruchamianiu usługi: {result.output}")
+        if not self.wait_for_status(service.RUNNING):
+            return self.fail(f"Usługa {name} nie uruchomiła się w ciągu {self.stage_timeout:.0f} s.")
+        logging.info(f"Usługa {name} uruchomiona pomyślnie.")
+        return RESYNC
+
+    def stage_resync(self):
+        self.attempt += 1
+        logging.info(f"Wymuszanie resynchronizacji (próba {self.attempt}/{self.attempts})...",
+                     extra={"stage": RESYNC})
+
+        # Jedno wymuszenie; usługa tuż po uruchomieniu może jeszcze nie mieć danych o czasie,
+        # więc wtedy czekamy tanim zapytaniem o stan, a ponowne wymuszenie zleca dopiero weryfikacja
+        result = self.controller.resync()
+        self._resync_ok = result.ok or self.wait_for(self.controller.synchronized)
+        if not self._resync_ok:
+            logging.warning(f"Resynchronizacja mogła się nie powieść: {result.output}", extra={"stage": RESYNC})
+        return VERIFY
+
+    def stage_verify(self):
+        offset = self.measure() if self.measure is not None else None
+        self.offset_ms = offset
+
+        if offset is None:
+            # Bez pomiaru polegamy na wyniku zwróconym przez usługę
+            verified = self._resync_ok
+            logging.warning("Nie udało się zmierzyć offsetu po synchronizacji.", extra={"stage": VERIFY})
+        else:
+            verified = abs(offset) <= self.verify_threshold_ms
+            logging.info(f"Offset po synchronizacji: {offset:+.3f} ms (próg {self.verify_threshold_ms:.0f} ms)",
+                         extra={"stage": VERIFY, "server": self.server, "offset_ms": offset})
+
+        if verified:
+            logging.info("Synchronizacja zakończona pomyślnie!", extra={"stage": VERIFY})
+            suffix = "" if self.attempt == 1 else f" (próba {self.attempt})"
+            self.message = f"Czas został zsynchronizowany z serwerem {self.server}{suffix}"
+            return DONE
+
+        if self.attempt < self.attempts:
+            return RESYNC
+        logging.warning(f"Synchronizacja nie powiodła się po {self.attempt} próbach.", extra={"stage": VERIFY})
+        return self.fail("Synchronizacja mogła się nie powieść. Sprawdź logi dla szczegółów.")
@@ -0,0 +1,220 @@
+"""Równoległe odpytywanie wielu serwerów NTP w asyncio i wybór źródła czasu."""
+import asyncio
+import functools
+import socket
+from collections import namedtuple
+
+from timesync import metrics, sntp, tracing
+from timesync.resolver import default_resolver, split_source
+from timesync.selection import select_sources
+
+PollOutcome = namedtuple("PollOutcome", [
+    "selection",     # wynik selection.select_sources dla udanych odpowiedzi
+    "results",       # lista NtpResult od serwerów, które odpowiedziały
+    "failures",      # słownik serwer -> wyjątek dla serwerów bez odpowiedzi
+    "elapsed_ms",    # całkowity czas odpytywania
+])
+
+
+def _complete(future, server, data, originate_ns, destination_ns, timestamping=sntp.TIMESTAMP_USER):
+    if future.done():
+        return
+    try:
+        future.set_result(sntp.parse_response(data, originate_ns, destination_ns, server=server,
+                                              timestamping=timestamping))
+    except sntp.NtpError as e:
+        future.set_exception(e)
+
+
+class _NtpClientProtocol(asyncio.DatagramProtocol):
+    """Protokół wysyłający jedno zapytanie SNTP i czekający na odpowiedź."""
+
+    def __init__(self, server, future):
+        self.server = server
+        self.future = future
+        self.stamp = None
+        self.originate_ns = None
+
+    def connection_made(self, transport):
+        self.stamp = sntp.Timestamper()
+        self.originate_ns = self.stamp.wall_ns
+        transport.sendto(sntp.build_request(self.originate_ns))
+
+    def datagram_received(self, data, addr):
+        _complete(self.future, self.server, data, self.originate_ns, self.stamp.now_ns())
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(sntp.NtpError(f"Błąd komunikacji z serwerem {self.server}: {exc}"))
+
+    def connection_lost(self, exc):
+        if not self.future.done():
+            self.future.set_exception(sntp.NtpError(f"Połączenie z serwerem {self.server} zostało zamknięte"))
+
+
+class _TimestampedClient:
+    """Zapytanie SNTP przez gniazdo obserwowane przez pętlę (add_reader) i odbierane przez recvmsg.
+
+    Czas odebrania (T4) pochodzi ze znacznika jądra SO_TIMESTAMPNS, więc nie
+    obejmuje opóźnienia wybudzenia pętli ani oczekiwania na GIL.
+    """
+
+    def __init__(self, loop, server, future, sock):
+        self.loop = loop
+        self.server = server
+        self.future = future
+        self.sock = sock
+        self.stamp = sntp.Timestamper()
+        self.originate_ns = self.stamp.wall_ns
+
+    @classmethod
+    def open(cls, loop, server, future, family, address):
+        """Wysyła zapytanie; zwraca None, gdy znaczniki jądra lub add_reader są niedostępne."""
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        try:
+            sock.setblocking(False)
+            if not sntp.enable_kernel_timestamps(sock):
+                sock.close()
+                return None
+            sock.connect(address)
+            client = cls(loop, server, future, sock)
+            loop.add_reader(sock.fileno(), client._read_ready)
+        except NotImplementedError:
+            sock.close()
+            return None
+        except OSError as e:
+            sock.close()
+            raise sntp.NtpError(f"Błąd komunikacji z serwerem {server}: {e}") from e
+        try:
+            sock.send(sntp.build_request(client.originate_ns))
+        except OSError as e:
+            client.close()
+            raise sntp.NtpError(f"Błąd komunikacji z serwerem {server}: {e}") from e
+        return client
+
+    def _read_ready(self):
+        try:
+            data, _, arrival_ns = sntp.recv_timestamped(self.sock)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            if not self.future.done():
+                self.future.set_exception(sntp.NtpError(f"Błąd komunikacji z serwerem {self.server}: {e}"))
+            return
+        if arrival_ns is None:
+            _complete(self.future, self.server, data, self.originate_ns, self.stamp.now_ns())
+        else:
+            _complete(self.future, self.server, data, self.originate_ns, arrival_ns, sntp.TIMESTAMP_KERNEL)
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+
+async def query_async(server, port=sntp.NTP_PORT, timeout=2.0, kernel_timestamps=True, record=True,
+                      resolver=None):
+    """Asynchroniczny odpowiednik sntp.query z limitem czasu na całe zapytanie.
+
+    server to nazwa, adres IP lub źródło "host/adres" z resolver.Resolver.expand
+    (zapytanie bez rozwiązywania nazwy). Nazwy są rozwiązywane przez resolver
+    z pamięcią podręczną (domyślnie wspólny resolver aplikacji).
+    record=False pomija metryki serwera (np. przy jednorazowym przeglądzie tysięcy hostów).
+    """
+    if not record:
+        return await _query(server, port, timeout, kernel_timestamps, resolver)
+    try:
+        result = await _query(server, port, timeout, kernel_timestamps, resolver)
+    except Exception:
+        # Każde nieudane zapytanie, także z błędem innym niż NtpError
+        metrics.record_failure(server)
+        raise
+    metrics.record_result(result)
+    return result
+
+
+async def _query(server, port, timeout, kernel_timestamps, resolver):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    resolver = resolver or default_resolver()
+    host, address = split_source(server)
+
+    # Zapytania biegną równolegle, więc każdy serwer ma własną ścieżkę na osi czasu
+    track = f"ntp {server}"
+    try:
+        with tracing.span("dns", tracing.NETWORK, track=track, server=server):
+            addresses = await asyncio.wait_for(resolver.resolve(address or host, port), timeout)
+    except asyncio.TimeoutError as e:
+        raise sntp.NtpError(f"Przekroczono limit czasu rozwiązywania nazwy {host}") from e
+    except socket.gaierror as e:
+        raise sntp.NtpError(f"Nie można rozwiązać nazwy serwera {host}: {e}") from e
+
+    family, address = addresses[0]
+    with tracing.span("ntp", tracing.NETWORK, track=track, server=server):
+        future = loop.create_future()
+        client = None
+        if kernel_timestamps:
+            client = _TimestampedClient.open(loop, server, future, family, address)
+        if client is None:
+            # create_datagram_endpoint przyjmuje tylko (host, port), także dla IPv6
+            try:
+                client, _ = await loop.create_datagram_endpoint(
+                    lambda: _NtpClientProtocol(server, future), remote_addr=address[:2], family=family)
+            except OSError as e:
+                raise sntp.NtpError(f"Błąd komunikacji z serwerem {server}: {e}") from e
+        try:
+            return await asyncio.wait_for(future, max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError as e:
+            raise sntp.NtpError(f"Przekroczono limit czasu odpowiedzi serwera {server}") from e
+        finally:
+            client.close()
+
+
+async def poll_servers(servers, port=sntp.NTP_PORT, timeout=2.0, query=None, resolver=None):
+    """Odpytuje wszystkie serwery równolegle i wybiera źródła algorytmem przecięć.
+
+    Czas trwania jest ograniczony przez najwolniejszą odpowiedź (lub limit
+    czasu), a nie przez sumę kolejnych zapytań. Nazwy są rozwijane przez
+    resolver na wszystkie adresy (każdy adres puli to osobne źródło).
+    query(server, port, timeout) zastępuje zapytania sieciowe (np.
+    netsim.NetworkSimulator.query) - nazwy nie są wtedy rozwijane.
+    """
+    loop = asyncio.get_running_loop()
+    network = query is None
+    servers = list(dict.fromkeys(servers))
+    if network:
+        resolver = resolver or default_resolver()
+        try:
+            servers = await asyncio.wait_for(resolver.expand(servers, port), timeout)
+        except asyncio.TimeoutError:
+            # Wolny DNS - nazwy nierozwinięte; zapytania zgłoszą brak odpowiedzi jak dotąd
+            pass
+        query = functools.partial(query_async, resolver=resolver)
+    start = loop.time()
+    replies = await asyncio.gather(*(query(s, port, timeout) for s in servers),
+                                   return_exceptions=True)
+
+    results = []
+    failures = {}
+    for server, reply in zip(servers, replies):
+        if isinstance(reply, sntp.NtpResult):
+            results.append(reply)
+        elif isinstance(reply, Exception):
+            failures[server] = reply
+        else:
+            raise reply
+
+    selection = select_sources(results)
+    if network:
+        # Metryki opisują tylko rzeczywistą sieć (bez serwerów symulowanych)
+        metrics.record_selection(selection, failures)
+    return PollOutcome(
+        selection=selection,
+        results=results,
+        failures=failures,
+        elapsed_ms=(loop.time() - start) * 1000,
+    )
+
+
+def poll(servers, port=sntp.NTP_PORT, timeout=2.0):
+    """Synchroniczna nakładka na poll_servers (np. dla wątku synchronizacji)."""
+    return asyncio.run(poll_servers(servers, port, timeout))
@@ -0,0 +1,277 @@
+"""Rozwiązywanie nazw serwerów NTP z pamięcią podręczną i rozwijaniem pul na osobne źródła.
+
+Nazwa (np. pool.ntp.org) jest zamieniana na wszystkie jej adresy A/AAAA,
+a każdy adres staje się osobnym źródłem o nazwie "host/adres" - wybór źródeł
+widzi wtedy każdy serwer puli z osobna, a zapytanie do źródła nie wymaga
+ponownego rozwiązywania nazwy. Wyniki są pamiętane przez ttl sekund, błędy
+przez negative_ttl sekund. getaddrinfo jest blokujące, więc działa w puli
+wątków resolvera, a współbieżne zapytania o tę samą nazwę czekają na jedno
+wyszukiwanie. Pula wątków nie jest związana z żadną pętlą asyncio, więc
+jeden resolver obsługuje pętlę tła i pętle tworzone przez asyncio.run.
+"""
+import asyncio
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from timesync import sntp
+
+# getaddrinfo nie zwraca TTL rekordów - przyjmujemy czas zbliżony do TTL pool.ntp.org
+DEFAULT_TTL = 300.0
+
+# Czas pamiętania błędu rozwiązywania (i przedłużenia nieaktualnego wpisu po błędzie)
+NEGATIVE_TTL = 30.0
+
+# Najwięcej pamiętanych nazw, wątków wyszukiwania i źródeł z jednej nazwy
+MAX_ENTRIES = 4096
+MAX_WORKERS = 8
+MAX_ADDRESSES = 8
+
+# Separator nazwy hosta i adresu w nazwie źródła (nie występuje w nazwach DNS ani adresach IP)
+SOURCE_SEPARATOR = "/"
+
+
+def source_name(host, address):
+    """Nazwa źródła dla jednego adresu nazwy host."""
+    return f"{host}{SOURCE_SEPARATOR}{address}"
+
+
+def split_source(name):
+    """Rozdziela nazwę źródła na (host, adres); adres jest None dla zwykłej nazwy."""
+    host, _, address = name.partition(SOURCE_SEPARATOR)
+    return host, address or None
+
+
+def host_of(name):
+    """Nazwa hosta źródła (bez adresu) - np. do konfiguracji usługi czasu."""
+    return split_source(name)[0]
+
+
+def getaddrinfo_lookup(host, port):
+    """Adresy UDP nazwy host jako lista (rodzina, sockaddr) bez powtórzeń."""
+    infos = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+    return list(dict.fromkeys((family, sockaddr) for family, _, _, _, sockaddr in infos))
+
+
+def _numeric(host, port):
+    """Adres dla literału IP (bez zapytania DNS) lub None, gdy host jest nazwą."""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM, flags=socket.AI_NUMERICHOST)
+    except (socket.gaierror, UnicodeError):
+        return None
+    return [(family, sockaddr) for family, _, _, _, sockaddr in infos[:1]]
+
+
+def _copy_result(waiter, future):
+    if waiter.cancelled():
+        return
+    if future.exception() is not None:
+        waiter.set_exception(future.exception())
+    else:
+        waiter.set_result(future.result())
+
+
+def _waiter(future):
+    """Future bieżącej pętli z wynikiem wyszukiwania w puli wątków.
+
+    Przerwanie oczekiwania (np. limit czasu) nie anuluje wyszukiwania
+    współdzielonego z innymi, a zakończenie po zamknięciu pętli (asyncio.run)
+    jest pomijane.
+    """
+    loop = asyncio.get_running_loop()
+    waiter = loop.create_future()
+
+    def done(_):
+        try:
+            loop.call_soon_threadsafe(_copy_result, waiter, future)
+        except RuntimeError:
+            pass
+
+    future.add_done_callback(done)
+    return waiter
+
+
+class Resolver:
+    """Resolver z pamięcią podręczną (TTL, pamięć błędów) i pulą wątków dla getaddrinfo.
+
+    lookup(host, port) zwraca listę (rodzina, sockaddr) lub zgłasza OSError
+    (np. socket.gaierror); domyślnie to getaddrinfo_lookup.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES,
+                 max_workers=MAX_WORKERS, lookup=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_workers = max_workers
+        self.lookup = lookup or getaddrinfo_lookup
+        self.clock = clock
+        self.hits = 0
+        self.lookups = 0
+
+        # (host, port) -> (chwila wygaśnięcia, adresy lub None, argumenty błędu)
+        self._cache = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    async def resolve(self, host, port=sntp.NTP_PORT):
+        """Adresy (rodzina, sockaddr) nazwy host; błąd rozwiązywania zgłaszany jako socket.gaierror."""
+        entry = self._cache.get((host, port))
+        if entry is not None and entry[0] > self.clock():
+            self.hits += 1
+            if entry[1] is None:
+                raise socket.gaierror(*entry[2])
+            return entry[1]
+
+        addresses = _numeric(host, port)
+        if addresses is not None:
+            return addresses
+        return await _waiter(self._submit((host, port)))
+
+    def _submit(self, key):
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="TimeSyncDNS")
+                self.lookups += 1
+                future = self._pending[key] = self._executor.submit(self._lookup, key)
+            return future
+
+    def _lookup(self, key):
+        host, port = key
+        try:
+            try:
+                addresses = self.lookup(host, port)[:MAX_ADDRESSES]
+            except UnicodeError as e:
+                raise socket.gaierror(socket.EAI_NONAME, f"Nieprawidłowa nazwa {host}") from e
+            if not addresses:
+                raise socket.gaierror(socket.EAI_NONAME, f"Brak adresów dla nazwy {host}")
+        except OSError as e:
+            with self._lock:
+                stale = self._cache.get(key)
+                if stale is not None and stale[1] is not None:
+                    # Chwilowa awaria DNS nie wyłącza znanych źródeł - przedłużamy nieaktualny wpis
+                    self._store(key, stale[1], None, self.negative_ttl)
+                    logging.warning(f"Nie udało się odświeżyć adresów {host}: {str(e)} - używam poprzednich")
+                    return stale[1]
+                self._store(key, None, e.args, self.negative_ttl)
+            raise
+        else:
+            with self._lock:
+                self._store(key, addresses, None, self.ttl)
+            return addresses
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _store(self, key, addresses, error, ttl):
+        cache = self._cache
+        if key not in cache and len(cache) >= self.max_entries:
+            # Usuwamy najdawniej dodaną nazwę (słownik zachowuje kolejność wstawiania)
+            del cache[next(iter(cache))]
+        cache[key] = (self.clock() + ttl, addresses, error)
+
+    async def expand(self, servers, port=sntp.NTP_PORT):
+        """Lista źródeł: każdy adres nazwy jako "host/adres"; literały IP i nazwy z błędem bez zmian."""
+        servers = list(dict.fromkeys(servers))
+        replies = await asyncio.gather(*(self.resolve(server, port) for server in servers),
+                                       return_exceptions=True)
+        sources = []
+        for server, reply in zip(servers, replies):
+            if isinstance(reply, OSError):
+                # Błąd zostanie zgłoszony przy zapytaniu do serwera (jako brak odpowiedzi)
+                sources.append(server)
+            elif isinstance(reply, BaseException):
+                raise reply
+            elif len(reply) == 1 and reply[0][1][0] == server:
+                sources.append(server)
+            else:
+                sources.extend(source_name(server, sockaddr[0]) for _, sockaddr in reply)
+        return list(dict.fromkeys(sources))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Zatrzymuje pulę wątków (trwające wyszukiwania są kończone w tle)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class StubResolver(Resolver):
+    """Resolver z tabelą nazw zamiast DNS (testy bez sieci): nazwa -> lista adresów IP."""
+
+    def __init__(self, table, **options):
+        Resolver.__init__(self, lookup=self._lookup_table, **options)
+        self.table = table
+
+    def _lookup_table(self, host, port):
+        addresses = self.table.get(host)
+        if addresses is None:
+            raise socket.gaierror(socket.EAI_NONAME, f"Nieznana nazwa {host}")
+        return [_numeric(address, port)[0] for address in addresses]
+
+
+_default = None
+
+
+def default_resolver():
+    """Wspólny resolver aplikacji (tworzony przy pierwszym użyciu)."""
+    global _default
+    if _default is None:
+        _default = Resolver()
+    return _default
+
+
+def benchmark(names=200, lookup_ms=20.0, pool_size=8):
+    """Zimne i ciepłe rozwiązywanie nazw (symulowane opóźnienie DNS) i odpytanie puli lokalnych serwerów."""
+    from timesync import ntpserver, poller
+
+    def slow_lookup(host, port):
+        time.sleep(lookup_ms / 1000)
+        return [(socket.AF_INET, ("127.0.0.1", port))]
+
+    resolver = Resolver(lookup=slow_lookup)
+    hosts = [f"ntp{i}.example" for i in range(names)]
+    results = {"names": names, "lookup_ms": lookup_ms}
+
+    async def resolve_all():
+        start = time.perf_counter()
+        await asyncio.gather(*(resolver.resolve(host) for host in hosts))
+        return (time.perf_counter() - start) * 1000
+
+    results["cold_ms"] = asyncio.run(resolve_all())
+    results["warm_ms"] = asyncio.run(resolve_all())
+    results["lookups"] = resolver.lookups
+    results["hits"] = resolver.hits
+    resolver.close()
+
+    # Pula: jedna nazwa, pool_size lokalnych serwerów na adresach 127.0.0.x
+    addresses = [f"127.0.0.{i + 1}" for i in range(pool_size)]
+    stub = StubResolver({"pool.test": addresses})
+
+    async def poll_pool():
+        transport, _ = await ntpserver.start_server(addresses[0], 0)
+        port = transport.get_extra_info("sockname")[1]
+        transports = [transport]
+        for address in addresses[1:]:
+            transports.append((await ntpserver.start_server(address, port))[0])
+        try:
+            return await poller.poll_servers(["pool.test"], port, resolver=stub)
+        finally:
+            for transport in transports:
+                transport.close()
+
+    outcome = asyncio.run(poll_pool())
+    stub.close()
+    results["pool_sources"] = len(outcome.results) + len(outcome.failures)
+    results["pool_survivors"] = len(outcome.selection.survivors)
+    results["pool_poll_ms"] = outcome.elapsed_ms
+    return results
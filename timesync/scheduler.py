@@ -0,0 +1,229 @@
+"""Adaptacyjny harmonogram odpytywania serwerów NTP z obsługą Kiss-o'-Death."""
+import asyncio
+import heapq
+import itertools
+import logging
+
+from timesync import poller, sntp
+
+# Wykładniki interwału odpytywania (2**n sekund), jak minpoll/maxpoll w NTP
+MIN_POLL = 6     # 64 s
+MAX_POLL = 10    # 1024 s
+
+# Liczba kolejnych stabilnych pomiarów, po której interwał jest podwajany
+STABLE_POLLS = 4
+
+# Pomiar jest stabilny, gdy zmiana offsetu nie przekracza PGATE * jitter
+PGATE = 4.0
+
+# Wygładzanie wykładnicze oszacowania jittera
+JITTER_WEIGHT = 0.25
+
+# Odstęp po odpowiedzi DENY/RSTR - serwer odmówił obsługi
+DENY_BACKOFF = 24 * 3600
+
+# Limit jednoczesnych zapytań w locie
+MAX_IN_FLIGHT = 64
+
+
+def _precision_ms(result):
+    """Rozdzielczość zegara serwera w ms (pole precision to wykładnik potęgi 2)."""
+    return 1000.0 * 2.0 ** result.precision
+
+
+class ServerState:
+    """Stan odpytywania jednego serwera."""
+
+    __slots__ = ("server", "poll", "min_poll", "stable", "last_offset_ms", "jitter_ms",
+                 "due", "denied", "kod_code", "failures")
+
+    def __init__(self, server, poll, min_poll):
+        self.server = server
+        self.poll = poll
+        self.min_poll = min_poll
+        self.stable = 0
+        self.last_offset_ms = None
+        self.jitter_ms = None
+        self.due = 0.0
+        self.denied = False
+        self.kod_code = None
+        self.failures = 0
+
+    @property
+    def interval(self):
+        return float(2 ** self.poll)
+
+
+class PollScheduler:
+    """Harmonogram odpytywania wielu serwerów z jednej pętli asyncio.
+
+    Interwał serwera rośnie wykładniczo, dopóki offset i jitter są stabilne,
+    i maleje, gdy się pogarszają. Kody Kiss-o'-Death RATE wydłużają interwał,
+    a DENY/RSTR wstrzymują odpytywanie danego serwera.
+    """
+
+    def __init__(self, on_sample=None, on_failure=None, query=None, min_poll=MIN_POLL,
+                 max_poll=MAX_POLL, max_in_flight=MAX_IN_FLIGHT, port=sntp.NTP_PORT, timeout=2.0):
+        self.on_sample = on_sample
+        self.on_failure = on_failure
+        self.query = query or poller.query_async
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.max_in_flight = max_in_flight
+        self.port = port
+        self.timeout = timeout
+
+        self.states = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._stopping = False
+        self._tasks = set()
+
+    def set_servers(self, servers, now=None):
+        """Ustawia listę serwerów, zachowując stan tych, które już były odpytywane."""
+        servers = list(dict.fromkeys(servers))
+        if now is None:
+            now = self._now()
+        for server in list(self.states):
+            if server not in servers:
+                del self.states[server]
+        for server in servers:
+            if server not in self.states:
+                state = ServerState(server, self.min_poll, self.min_poll)
+                self.states[server] = state
+                self._schedule(state, now)
+
+    def reset_intervals(self, now=None):
+        """Przywraca minimalny interwał (np. po skokowej korekcie zegara)."""
+        if now is None:
+            now = self._now()
+        for state in self.states.values():
+            if state.denied:
+                continue
+            state.poll = state.min_poll
+            state.stable = 0
+            state.last_offset_ms = None
+            # Serwer z zapytaniem w locie zostanie zaplanowany po jego zakończeniu (już z nowym interwałem)
+            if state.due is not None:
+                self._schedule(state, now)
+
+    def _now(self):
+        try:
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return 0.0
+
+    def _schedule(self, state, due):
+        state.due = due
+        heapq.heappush(self._heap, (due, next(self._counter), state.server))
+        # Pętla mogła zasnąć z dłuższym terminem (lub bez terminu) - budzimy ją
+        self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def record_sample(self, state, result, now):
+        """Dostosowuje interwał serwera do stabilności offsetu i jittera."""
+        state.failures = 0
+        state.denied = False
+        state.kod_code = None
+        if state.last_offset_ms is not None:
+            change = abs(result.offset_ms - state.last_offset_ms)
+            if state.jitter_ms is None:
+                state.jitter_ms = change
+            else:
+                state.jitter_ms += JITTER_WEIGHT * (change - state.jitter_ms)
+
+            # Jitter nie mniejszy niż połowa opóźnienia - pomiar nie jest dokładniejszy
+            gate = PGATE * max(state.jitter_ms, result.delay_ms / 2, _precision_ms(result))
+            if change <= gate:
+                state.stable += 1
+                if state.stable >= STABLE_POLLS and state.poll < self.max_poll:
+                    state.poll += 1
+                    state.stable = 0
+            else:
+                state.stable = 0
+                state.poll = max(state.poll - 1, state.min_poll)
+        state.last_offset_ms = result.offset_ms
+        self._schedule(state, now + state.interval)
+
+    def record_failure(self, state, error, now):
+        """Wydłuża interwał po braku odpowiedzi lub odpowiedzi Kiss-o'-Death."""
+        state.failures += 1
+        # Odmowa obsługi trwa do następnej odpowiedzi DENY/RSTR
+        state.denied = False
+        if isinstance(error, sntp.KissOfDeath):
+            state.kod_code = error.code
+            if error.code in ("DENY", "RSTR"):
+                state.denied = True
+                logging.warning(f"Serwer {state.server} odmówił obsługi ({error.code}) - "
+                                f"wstrzymano odpytywanie na {DENY_BACKOFF // 3600} h")
+                self._schedule(state, now + DENY_BACKOFF)
+                return
+            if error.code == "RATE":
+                # Serwer ogranicza częstotliwość - trwale podnosimy minimalny interwał
+                state.min_poll = min(state.min_poll + 1, self.max_poll)
+                logging.warning(f"Serwer {state.server} ogranicza częstotliwość zapytań (RATE) - "
+                                f"minimalny interwał {2 ** state.min_poll} s")
+        state.poll = min(max(state.poll + 1, state.min_poll), self.max_poll)
+        state.stable = 0
+        self._schedule(state, now + state.interval)
+
+    async def _poll(self, state, semaphore):
+        async with semaphore:
+            try:
+                result = await self.query(state.server, self.port, self.timeout)
+            except Exception as e:
+                # Inny błąd niż NtpError nie może zatrzymać odpytywania pozostałych serwerów
+                if not isinstance(e, sntp.NtpError):
+                    logging.error(f"Nieoczekiwany błąd zapytania do serwera {state.server}: "
+                                  f"{type(e).__name__}: {str(e)}")
+                self.record_failure(state, e, self._now())
+                if self.on_failure is not None:
+                    self.on_failure(state.server, e)
+                return
+        if self.states.get(state.server) is not state:
+            return
+        self.record_sample(state, result, self._now())
+        if self.on_sample is not None:
+            self.on_sample(result)
+
+    async def run(self):
+        """Pętla harmonogramu: uruchamia zapytania serwerów w chwili ich terminu."""
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        try:
+            while not self._stopping:
+                now = loop.time()
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, server = heapq.heappop(self._heap)
+                    state = self.states.get(server)
+                    # Pomijamy wpisy nieaktualne (serwer usunięty lub przeplanowany)
+                    if state is None or state.due != due:
+                        continue
+                    state.due = None
+                    task = loop.create_task(self._poll(state, semaphore))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+                delay = self._heap[0][0] - now if self._heap else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self):
+        """Kończy pętlę harmonogramu."""
+        self._stopping = True
+        self._wake()
@@ -0,0 +1,100 @@
+"""Wybór źródeł czasu: algorytm przecięć (Marzullo / RFC 5905) i łączenie offsetów."""
+from collections import namedtuple
+
+# Minimalny promień przedziału poprawności, aby pomiary w sieci lokalnej
+# (opóźnienie bliskie zeru) nie dawały przedziałów zerowej szerokości
+MIN_DISTANCE_MS = 1.0
+
+Selection = namedtuple("Selection", [
+    "offset_ms",      # połączony offset ocalałych źródeł (None, gdy brak większości)
+    "jitter_ms",      # rozrzut (RMS) offsetów ocalałych źródeł
+    "low_ms",         # dolna granica przedziału przecięcia
+    "high_ms",        # górna granica przedziału przecięcia
+    "survivors",      # lista NtpResult uznanych za prawdomówne (truechimers)
+    "falsetickers",   # lista NtpResult odrzuconych
+])
+
+
+def root_distance(result, min_distance_ms=MIN_DISTANCE_MS):
+    """Promień przedziału, w którym musi leżeć prawdziwy offset (w ms)."""
+    distance = (result.delay_ms / 2 + result.root_delay_ms / 2
+                + result.root_dispersion_ms)
+    return max(distance, min_distance_ms)
+
+
+def intersect(candidates, min_distance_ms=MIN_DISTANCE_MS):
+    """Znajduje przedział przecięcia wspólny dla większości źródeł.
+
+    Zwraca krotkę (low, high, allow), gdzie allow to liczba dopuszczonych
+    fałszywych źródeł, albo None, gdy większość nie istnieje.
+    """
+    n = len(candidates)
+    if n == 0:
+        return None
+
+    edges = []
+    for result in candidates:
+        distance = root_distance(result, min_distance_ms)
+        edges.append((result.offset_ms - distance, -1))
+        edges.append((result.offset_ms, 0))
+        edges.append((result.offset_ms + distance, 1))
+    edges.sort()
+
+    allow = 0
+    while 2 * allow < n:
+        found = 0
+        low = high = None
+
+        chime = 0
+        for edge, kind in edges:
+            chime -= kind
+            if chime >= n - allow:
+                low = edge
+                break
+            if kind == 0:
+                found += 1
+
+        chime = 0
+        for edge, kind in reversed(edges):
+            chime += kind
+            if chime >= n - allow:
+                high = edge
+                break
+            if kind == 0:
+                found += 1
+
+        if found <= allow and low is not None and high is not None and low <= high:
+            return low, high, allow
+        allow += 1
+
+    return None
+
+
+def combine(survivors, min_distance_ms=MIN_DISTANCE_MS):
+    """Łączy offsety źródeł średnią ważoną odwrotnością odległości od korzenia."""
+    weights = [1.0 / root_distance(r, min_distance_ms) for r in survivors]
+    total = sum(weights)
+    offset = sum(w * r.offset_ms for w, r in zip(weights, survivors)) / total
+    jitter = (sum(w * (r.offset_ms - offset) ** 2 for w, r in zip(weights, survivors)) / total) ** 0.5
+    return offset, jitter
+
+
+def select_sources(candidates, min_distance_ms=MIN_DISTANCE_MS):
+    """Odrzuca fałszywe źródła (falsetickers) i łączy pozostałe w jeden offset."""
+    candidates = list(candidates)
+    bounds = intersect(candidates, min_distance_ms)
+    if bounds is None:
+        return Selection(None, None, None, None, [], candidates)
+
+    low, high, _ = bounds
+    survivors = []
+    falsetickers = []
+    for result in candidates:
+        distance = root_distance(result, min_distance_ms)
+        if result.offset_ms + distance < low or result.offset_ms - distance > high:
+            falsetickers.append(result)
+        else:
+            survivors.append(result)
+
+    offset, jitter = combine(survivors, min_distance_ms)
+    return Selection(offset, jitter, low, high, survivors, falsetickers)
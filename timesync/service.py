@@ -0,0 +1,371 @@
+"""Sterowanie systemową usługą czasu: Windows Time, systemd-timesyncd, chrony i atrapa testowa."""
+import os
+import platform
+import shutil
+import subprocess
+import time
+from collections import namedtuple
+
+from timesync import tracing
+
+RUNNING = "running"
+STOPPED = "stopped"
+DISABLED = "disabled"
+UNKNOWN = "unknown"
+
+# Czas ważności zapamiętanego stanu usługi (sekundy)
+STATUS_TTL = 2.0
+
+# Pliki konfiguracji chrony (Debian/Ubuntu, Fedora/RHEL) i nazwa pliku z serwerami w katalogu sourcedir
+CHRONY_CONFIGS = ("/etc/chrony/chrony.conf", "/etc/chrony.conf")
+SOURCES_NAME = "zegarsync.sources"
+
+CommandResult = namedtuple("CommandResult", ["ok", "output"])
+
+
+class ServiceError(Exception):
+    """Brak obsługiwanej usługi czasu lub błąd sterowania usługą."""
+
+
+class TimeServiceController:
+    """Interfejs sterowania usługą czasu z pamięcią podręczną stanu.
+
+    Stan usługi jest zapamiętywany na status_ttl sekund i unieważniany przy
+    każdej operacji zmieniającej stan, więc kolejne etapy synchronizacji nie
+    uruchamiają ponownie procesów tylko po to, by odczytać ten sam stan.
+    Podklasy implementują metody _query_status, _enable, _start, _stop,
+    _configure, _resync, _synchronized, _source i _configuration.
+    """
+
+    display_name = "czasu"
+
+    def __init__(self, status_ttl=STATUS_TTL, clock=time.monotonic):
+        self.status_ttl = status_ttl
+        self.clock = clock
+        self.spawns = 0
+        self._status = None
+        self._status_time = None
+
+    def run(self, args):
+        """Uruchamia polecenie bez pośrednictwa powłoki i zwraca CommandResult."""
+        self.spawns += 1
+        try:
+            with tracing.span(args[0], tracing.SUBPROCESS, command=" ".join(args)):
+                result = subprocess.run(args, capture_output=True, text=True)
+        except OSError as e:
+            return CommandResult(False, str(e))
+        return CommandResult(result.returncode == 0, (result.stdout + result.stderr).strip())
+
+    def status(self, refresh=False):
+        """Zwraca stan usługi (RUNNING/STOPPED/DISABLED/UNKNOWN)."""
+        now = self.clock()
+        if refresh or self._status is None or now - self._status_time > self.status_ttl:
+            self._status = self._query_status()
+            self._status_time = now
+        return self._status
+
+    def invalidate(self):
+        """Unieważnia zapamiętany stan usługi."""
+        self._status = None
+
+    def _changing(self, operation, *args):
+        try:
+            return operation(*args)
+        finally:
+            self.invalidate()
+
+    def enable(self):
+        return self._changing(self._enable)
+
+    def start(self):
+        return self._changing(self._start)
+
+    def stop(self):
+        return self._changing(self._stop)
+
+    def configure(self, peers):
+        """Ustawia listę serwerów NTP usługi."""
+        return self._changing(self._configure, list(peers))
+
+    def resync(self):
+        """Wymusza natychmiastową resynchronizację zegara."""
+        return self._changing(self._resync)
+
+    def synchronized(self):
+        """Sprawdza (jednym zapytaniem, bez wymuszania), czy usługa zsynchronizowała zegar."""
+        return self._synchronized()
+
+    def source(self):
+        """Zwraca aktualne źródło czasu usługi lub None."""
+        return self._source()
+
+    def configuration(self):
+        """Zwraca wybrane linie konfiguracji usługi."""
+        return self._configuration()
+
+    def _configuration(self):
+        return []
+
+
+class W32TimeController(TimeServiceController):
+    """Usługa Windows Time (w32time) sterowana przez sc, net i w32tm."""
+
+    display_name = "Windows Time"
+
+    def _query_status(self):
+        output = self.run(["sc", "query", "w32time"]).output
+        if "RUNNING" in output:
+            return RUNNING
+        elif "STOPPED" in output:
+            return STOPPED
+        elif "DISABLED" in output:
+            return DISABLED
+        return UNKNOWN
+
+    def _enable(self):
+        return self.run(["sc", "config", "w32time", "start=", "auto"])
+
+    def _start(self):
+        result = self.run(["net", "start", "w32time"])
+        if not result.ok:
+            # Alternatywna metoda uruchomienia usługi
+            result = self.run(["sc", "start", "w32time"])
+        return result
+
+    def _stop(self):
+        result = self.run(["net", "stop", "w32time"])
+        if not result.ok and "nie jest uruchomiona" in result.output:
+            return CommandResult(True, result.output)
+        return result
+
+    def _configure(self, peers):
+        peer_list = " ".join(peers)
+        return self.run(["w32tm", "/config", f"/manualpeerlist:{peer_list}", "/syncfromflags:manual",
+                         "/reliable:yes", "/update"])
+
+    def _resync(self):
+        # Komunikaty w32tm są tłumaczone na język systemu - liczy się tylko kod wyjścia;
+        # gdy usługa nie ma jeszcze danych o czasie, potok czeka na stan z _synchronized
+        return self.run(["w32tm", "/resync", "/force"])
+
+    def _synchronized(self):
+        # Pierwsza linia to wskaźnik sekundy przestępnej; 3 oznacza zegar niezsynchronizowany
+        result = self.run(["w32tm", "/query", "/status"])
+        lines = result.output.splitlines()
+        return result.ok and bool(lines) and ": 3(" not in lines[0]
+
+    def _source(self):
+        result = self.run(["w32tm", "/query", "/source"])
+        return result.output if result.ok else None
+
+    def _configuration(self):
+        output = self.run(["w32tm", "/query", "/configuration"]).output
+        important_keys = ["Type", "NtpServer", "TimeProviders"]
+        return [line.strip() for line in output.splitlines() if any(key in line for key in important_keys)]
+
+
+class _SystemdController(TimeServiceController):
+    """Wspólna część usług czasu uruchamianych przez systemd."""
+
+    unit = None
+
+    def _query_status(self):
+        # Jedno wywołanie zwraca stan działania i stan włączenia jednostki
+        output = self.run(["systemctl", "show", self.unit, "--property=ActiveState,UnitFileState"]).output
+        properties = dict(line.split("=", 1) for line in output.splitlines() if "=" in line)
+        if properties.get("UnitFileState") in ("disabled", "masked"):
+            return DISABLED
+        state = properties.get("ActiveState")
+        if state == "active":
+            return RUNNING
+        elif state in ("inactive", "failed"):
+            return STOPPED
+        return UNKNOWN
+
+    def _enable(self):
+        return self.run(["systemctl", "enable", self.unit])
+
+    def _start(self):
+        return self.run(["systemctl", "start", self.unit])
+
+    def _stop(self):
+        return self.run(["systemctl", "stop", self.unit])
+
+    def _write_config(self, path, content):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                file.write(content)
+        except OSError as e:
+            return CommandResult(False, str(e))
+        return CommandResult(True, path)
+
+
+class TimesyncdController(_SystemdController):
+    """Usługa systemd-timesyncd (Linux)."""
+
+    display_name = "systemd-timesyncd"
+    unit = "systemd-timesyncd"
+    config_path = "/etc/systemd/timesyncd.conf.d/zegarsync.conf"
+
+    def _configure(self, peers):
+        return self._write_config(self.config_path, "[Time]\nNTP=" + " ".join(peers) + "\n")
+
+    def _resync(self):
+        # timesyncd synchronizuje zegar zaraz po uruchomieniu
+        return self.run(["systemctl", "restart", self.unit])
+
+    def _synchronized(self):
+        result = self.run(["timedatectl", "show", "--property=NTPSynchronized", "--value"])
+        return result.ok and result.output == "yes"
+
+    def _source(self):
+        result = self.run(["timedatectl", "show-timesync", "--property=ServerName", "--value"])
+        return result.output if result.ok and result.output else None
+
+    def _configuration(self):
+        result = self.run(["timedatectl", "show-timesync"])
+        return [line for line in result.output.splitlines()
+                if line.startswith(("ServerName", "SystemNTPServers", "FallbackNTPServers"))]
+
+
+class ChronyController(_SystemdController):
+    """Usługa chrony (Linux) sterowana przez chronyc.
+
+    Serwery są zapisywane w pliku SOURCES_NAME w katalogu z dyrektywy
+    sourcedir konfiguracji chrony (pierwszy istniejący z config_paths),
+    chyba że podano sources_path.
+    """
+
+    display_name = "chrony"
+
+    def __init__(self, unit="chronyd", sources_path=None, config_paths=CHRONY_CONFIGS, **kwargs):
+        _SystemdController.__init__(self, **kwargs)
+        self.unit = unit
+        self.sources_path = sources_path
+        self.config_paths = config_paths
+
+    def _sources_directory(self):
+        """Katalog z pierwszej dyrektywy sourcedir konfiguracji chrony albo None."""
+        for path in self.config_paths:
+            try:
+                with open(path) as file:
+                    for line in file:
+                        words = line.split()
+                        if len(words) >= 2 and words[0] == "sourcedir":
+                            return words[1]
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return None
+            return None
+        return None
+
+    def _configure(self, peers):
+        path = self.sources_path
+        if path is None:
+            directory = self._sources_directory()
+            if directory is None:
+                return CommandResult(False, f"Konfiguracja chrony ({', '.join(self.config_paths)}) nie ma dyrektywy "
+                                            f"sourcedir - dodaj np. \"sourcedir /etc/chrony/sources.d\"")
+            path = os.path.join(directory, SOURCES_NAME)
+        result = self._write_config(path, "".join(f"server {p} iburst\n" for p in peers))
+        if not result.ok:
+            return result
+        return self.run(["chronyc", "reload", "sources"])
+
+    def _resync(self):
+        return self.run(["chronyc", "makestep"])
+
+    def _synchronized(self):
+        # Ostatnie pole to stan sekundy przestępnej ("Not synchronised" bez źródła)
+        result = self.run(["chronyc", "-c", "tracking"])
+        return result.ok and "," in result.output and not result.output.endswith("Not synchronised")
+
+    def _source(self):
+        result = self.run(["chronyc", "-c", "tracking"])
+        if not result.ok or "," not in result.output:
+            return None
+        return result.output.split(",")[1]
+
+    def _configuration(self):
+        result = self.run(["chronyc", "-c", "sources"])
+        return result.output.splitlines() if result.ok else []
+
+
+class FakeTimeServiceController(TimeServiceController):
+    """Atrapa usługi czasu w pamięci (testy, tryb symulacji)."""
+
+    display_name = "FakeTime"
+
+    def __init__(self, state=STOPPED, fail=(), **kwargs):
+        TimeServiceController.__init__(self, **kwargs)
+        self.state = state
+        self.peers = []
+        self.fail = set(fail)
+        self.calls = []
+
+    def _record(self, name):
+        self.calls.append(name)
+        self.spawns += 1
+        return CommandResult(name not in self.fail, f"{name}: {'błąd' if name in self.fail else 'OK'}")
+
+    def _query_status(self):
+        self._record("status")
+        return self.state
+
+    def _enable(self):
+        result = self._record("enable")
+        if result.ok and self.state == DISABLED:
+            self.state = STOPPED
+        return result
+
+    def _start(self):
+        result = self._record("start")
+        if result.ok and self.state != DISABLED:
+            self.state = RUNNING
+        return result
+
+    def _stop(self):
+        result = self._record("stop")
+        if result.ok and self.state == RUNNING:
+            self.state = STOPPED
+        return result
+
+    def _configure(self, peers):
+        result = self._record("configure")
+        if result.ok:
+            self.peers = peers
+        return result
+
+    def _resync(self):
+        return self._record("resync")
+
+    def _synchronized(self):
+        return self._record("synchronized").ok and self.state == RUNNING
+
+    def _source(self):
+        return self.peers[0] if self.peers else None
+
+    def _configuration(self):
+        return [f"NtpServer: {' '.join(self.peers)}"]
+
+
+_controller = None
+
+
+def default_controller():
+    """Zwraca (zapamiętany) kontroler usługi czasu właściwy dla systemu."""
+    global _controller
+    if _controller is None:
+        system = platform.system()
+        if system == "Windows":
+            _controller = W32TimeController()
+        elif system == "Linux" and shutil.which("chronyc"):
+            unit = "chronyd" if os.path.exists("/usr/lib/systemd/system/chronyd.service") else "chrony"
+            _controller = ChronyController(unit=unit)
+        elif system == "Linux" and shutil.which("timedatectl"):
+            _controller = TimesyncdController()
+        else:
+            raise ServiceError(f"Brak obsługiwanej usługi czasu w systemie {system}")
+    return _controller
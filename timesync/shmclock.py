@@ -0,0 +1,259 @@
+"""Publikacja zegara wirtualnego w pliku mapowanym w pamięci dla innych procesów.
+
+Układ pliku (little-endian, 96 bajtów):
+
+    0   4s  magic b"ZSVC"
+    4   I   wersja układu
+    8   Q   licznik sekwencji (seqlock: nieparzysty w trakcie zapisu)
+    16  9q  ClockState: mono_ns, virtual_ns, rate_num, rate_den, slew_end_ns,
+            end_virtual_ns, num, den, generation
+
+Czytelnik odczytuje licznik, stan i ponownie licznik; stan jest spójny, gdy
+oba odczyty są równe i parzyste. Zegar monotoniczny jest wspólny dla
+wszystkich procesów w systemie, więc czytelnik liczy czas wirtualny sam,
+bez ponownego czytania pliku i bez komunikacji z aplikacją.
+
+Moduł korzysta tylko z biblioteki standardowej:
+
+    from timesync.shmclock import SharedClock
+    clock = SharedClock()
+    clock.now_ns()
+"""
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import time
+
+from timesync.virtualclock import ClockState, at_ns
+
+MAGIC = b"ZSVC"
+LAYOUT_VERSION = 1
+
+HEADER = struct.Struct("<4sI")
+SEQUENCE = struct.Struct("<Q")
+STATE = struct.Struct("<8qQ")
+
+SEQUENCE_OFFSET = HEADER.size
+STATE_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+FILE_SIZE = STATE_OFFSET + STATE.size
+
+# Plik w katalogu prywatnym użytkownika: w katalogu wspólnym dla wszystkich (/tmp) inny
+# użytkownik mógłby podstawić dowiązanie symboliczne do pliku nadpisywanego przez aplikację
+if hasattr(os, "getuid"):
+    DEFAULT_DIRECTORY = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(),
+                                                                          f"zegarsync-{os.getuid()}")
+else:
+    # Katalog tymczasowy w Windows jest prywatny dla użytkownika
+    DEFAULT_DIRECTORY = tempfile.gettempdir()
+DEFAULT_PATH = os.path.join(DEFAULT_DIRECTORY, "zegarsync_clock.bin")
+
+# Liczba prób spójnego odczytu, zanim czytelnik zgłosi błąd
+MAX_READ_RETRIES = 10000
+
+
+class SharedClockError(Exception):
+    """Nieprawidłowy plik zegara współdzielonego lub brak spójnego odczytu."""
+
+
+def _private_directory(directory):
+    """Tworzy katalog dostępny tylko dla właściciela; PermissionError, gdy istniejący jest cudzy."""
+    os.makedirs(directory, 0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"Katalog {directory} nie jest prywatnym katalogiem użytkownika")
+
+
+def _open_owned(path):
+    """Otwiera (tworzy) plik zegara bez podążania za dowiązaniem; tylko zwykły plik bieżącego użytkownika."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    info = os.fstat(fd)
+    if not stat.S_ISREG(info.st_mode) or hasattr(os, "getuid") and info.st_uid != os.getuid():
+        os.close(fd)
+        raise PermissionError(f"Plik {path} nie jest zwykłym plikiem bieżącego użytkownika")
+    return fd
+
+
+class ClockPublisher:
+    """Zapisuje stan zegara wirtualnego do pliku mapowanego w pamięci (jeden pisarz)."""
+
+    def __init__(self, path=DEFAULT_PATH, monotonic_ns=time.monotonic_ns):
+        self.path = path
+        self.monotonic_ns = monotonic_ns
+        if path == DEFAULT_PATH:
+            _private_directory(DEFAULT_DIRECTORY)
+        fd = _open_owned(path)
+        try:
+            if os.fstat(fd).st_size < FILE_SIZE:
+                os.ftruncate(fd, FILE_SIZE)
+            self._map = mmap.mmap(fd, FILE_SIZE)
+        finally:
+            os.close(fd)
+
+        self._sequence = SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0]
+        if self._sequence % 2:
+            # Poprzedni pisarz przerwał zapis w połowie
+            self._sequence += 1
+            SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION)
+
+    def publish(self, state):
+        """Publikuje ClockState; czytelnicy nigdy nie zobaczą stanu zapisanego częściowo."""
+        self._sequence += 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+        # Kotwica pobrana dopiero w trakcie zapisu: czytelnik, który użył poprzedniego
+        # stanu, odczytał zegar wcześniej, więc czas wirtualny nigdy się nie cofa
+        mono = self.monotonic_ns()
+        virtual = at_ns(state, mono)
+        if mono < state.slew_end_ns:
+            state = state._replace(mono_ns=mono, virtual_ns=virtual)
+        else:
+            state = state._replace(mono_ns=mono, virtual_ns=virtual, slew_end_ns=mono, end_virtual_ns=virtual)
+        STATE.pack_into(self._map, STATE_OFFSET, *state)
+        self._sequence += 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self._sequence)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedClock:
+    """Czytelnik zegara wirtualnego opublikowanego przez ClockPublisher.
+
+    Stan jest czytany z pliku tylko po zmianie licznika sekwencji; pozostałe
+    odczyty kosztują jedno porównanie licznika i odczyt zegara monotonicznego.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, monotonic_ns=time.monotonic_ns, wall_ns=time.time_ns):
+        self.path = path
+        self.monotonic_ns = monotonic_ns
+        self.wall_ns = wall_ns
+        self.retries = 0
+        with open(path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), FILE_SIZE, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise SharedClockError(f"Plik {path} jest za krótki na stan zegara") from e
+
+        magic, version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self._map.close()
+            raise SharedClockError(f"Nieobsługiwany plik zegara {path} ({magic!r}, wersja {version})")
+
+        self._sequence = None
+        self._state = None
+        self._refresh()
+
+    def _refresh(self):
+        shm = self._map
+        for _ in range(MAX_READ_RETRIES):
+            before = SEQUENCE.unpack_from(shm, SEQUENCE_OFFSET)[0]
+            if not before % 2:
+                values = STATE.unpack_from(shm, STATE_OFFSET)
+                if SEQUENCE.unpack_from(shm, SEQUENCE_OFFSET)[0] == before:
+                    self._sequence = before
+                    self._state = ClockState._make(values)
+                    return self._state
+            self.retries += 1
+        raise SharedClockError("Nie udało się spójnie odczytać stanu zegara")
+
+    def state(self):
+        """Aktualny ClockState (None, jeśli nic jeszcze nie opublikowano)."""
+        if SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] != self._sequence:
+            self._refresh()
+        return self._state if self._sequence else None
+
+    def now_ns(self):
+        """Bieżący czas wirtualny w nanosekundach od epoki Unix."""
+        # Zegar odczytany przed sprawdzeniem licznika: jeśli stan się nie zmienił,
+        # pisarz pobierze kotwicę nowego stanu później niż ten odczyt
+        mono = self.monotonic_ns()
+        if SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] != self._sequence:
+            self._refresh()
+            mono = self.monotonic_ns()
+        if not self._sequence:
+            # Brak opublikowanego stanu - czas systemowy
+            return self.wall_ns()
+        return at_ns(self._state, mono)
+
+    def now(self):
+        """Bieżący czas wirtualny w sekundach (jak time.time)."""
+        return self.now_ns() / 1e9
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _reader(path, seconds, results):
+    """Proces czytelnika w benchmarku: liczy odczyty i sprawdza monotoniczność."""
+    with SharedClock(path) as clock:
+        now_ns = clock.now_ns
+        reads = backwards = 0
+        last = now_ns()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(1000):
+                value = now_ns()
+                if value < last:
+                    backwards += 1
+                last = value
+            reads += 1000
+        results.put((reads, clock.retries, backwards))
+
+
+def benchmark(readers=4, seconds=1.0, updates_per_s=1000):
+    """Przepustowość odczytu zegara przez wiele procesów przy ciągłych zmianach tempa."""
+    import multiprocessing
+
+    from timesync.virtualclock import VirtualClock
+
+    path = os.path.join(tempfile.mkdtemp(prefix="zegarsync-"), "clock.bin")
+    publisher = ClockPublisher(path)
+    clock = VirtualClock(on_change=publisher.publish)
+    clock.set_rate(1)
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_reader, args=(path, seconds, results))
+                 for _ in range(readers)]
+    for process in processes:
+        process.start()
+
+    # Zmiany tempa (zawsze >= 1) nie mogą cofnąć czasu wirtualnego
+    updates = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        clock.set_rate(1 + updates % 2)
+        updates += 1
+        time.sleep(1 / updates_per_s)
+
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    publisher.close()
+    os.remove(path)
+    os.rmdir(os.path.dirname(path))
+
+    reads = sum(t[0] for t in totals)
+    return {
+        "readers": readers,
+        "updates": updates,
+        "reads_per_s": reads / seconds,
+        "reads_per_s_per_reader": reads / seconds / readers,
+        "retries": sum(t[1] for t in totals),
+        "backwards": sum(t[2] for t in totals),
+    }
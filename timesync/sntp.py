@@ -0,0 +1,284 @@
+"""Klient SNTP/NTPv4 (RFC 4330, RFC 5905) oparty o pojedyncze zapytanie UDP."""
+import platform
+import socket
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from timesync import tracing
+
+NTP_PORT = 123
+NTP_VERSION = 4
+MODE_CLIENT = 3
+MODE_SERVER = 4
+MODE_BROADCAST = 5
+
+# Różnica między epoką NTP (1900-01-01) a epoką Unix (1970-01-01) w sekundach
+NTP_EPOCH_DELTA = 2208988800
+
+# LI/VN/Mode, stratum, poll, precision, root delay, root dispersion, ref ID,
+# reference, originate, receive i transmit timestamp
+NTP_PACKET = struct.Struct("!BBbbII4sQQQQ")
+NTP_PACKET_SIZE = NTP_PACKET.size  # 48 bajtów
+
+NtpResult = namedtuple("NtpResult", [
+    "server",              # adres serwera, który odpowiedział
+    "offset_ms",           # przesunięcie zegara lokalnego względem serwera
+    "delay_ms",            # opóźnienie w obie strony (round-trip)
+    "stratum",
+    "ref_id",              # identyfikator źródła czasu serwera
+    "leap",
+    "version",
+    "poll",
+    "precision",
+    "root_delay_ms",
+    "root_dispersion_ms",
+    "received_at",         # czas lokalny (Unix) odebrania odpowiedzi
+    "timestamping",        # źródło znacznika odebrania: TIMESTAMP_KERNEL lub TIMESTAMP_USER
+], defaults=("user",))
+
+# Źródło znacznika czasu odebrania pakietu
+TIMESTAMP_KERNEL = "kernel"
+TIMESTAMP_USER = "user"
+
+# Znaczniki czasu jądra (SO_TIMESTAMPNS == SCM_TIMESTAMPNS); None, gdy system ich nie obsługuje
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", None)
+# Gdy moduł socket nie udostępnia stałej, na Linuksie użyta jest wartość z <asm-generic/socket.h>
+# (alpha, parisc i sparc mają własne wartości - tam pozostają znaczniki z przestrzeni użytkownika)
+_OWN_SOCKET_CONSTANTS = ("alpha", "parisc", "sparc")
+if SO_TIMESTAMPNS is None and sys.platform == "linux" and not platform.machine().startswith(_OWN_SOCKET_CONSTANTS):
+    SO_TIMESTAMPNS = 35
+_TIMESPEC = struct.Struct("@ll")
+_ANCILLARY_SIZE = socket.CMSG_SPACE(_TIMESPEC.size) if hasattr(socket, "CMSG_SPACE") else 0
+
+
+class NtpError(Exception):
+    """Błąd zapytania lub nieprawidłowa odpowiedź serwera NTP."""
+
+
+class KissOfDeath(NtpError):
+    """Odpowiedź Kiss-o'-Death (stratum 0) z kodem np. RATE lub DENY."""
+
+    def __init__(self, code, server=None):
+        NtpError.__init__(self, f"Serwer {server} odpowiedział Kiss-o'-Death: {code}")
+        self.code = code
+        self.server = server
+
+
+def to_ntp_time(unix_ns):
+    """Zamienia czas Unix w nanosekundach na 64-bitowy znacznik czasu NTP."""
+    seconds, remainder = divmod(unix_ns + NTP_EPOCH_DELTA * 1_000_000_000, 1_000_000_000)
+    return ((seconds & 0xFFFFFFFF) << 32) | ((remainder << 32) // 1_000_000_000)
+
+
+def from_ntp_time(ntp_time):
+    """Zamienia 64-bitowy znacznik czasu NTP na czas Unix w nanosekundach."""
+    seconds = ntp_time >> 32
+    fraction = ntp_time & 0xFFFFFFFF
+    return (seconds - NTP_EPOCH_DELTA) * 1_000_000_000 + ((fraction * 1_000_000_000) >> 32)
+
+
+def _short_to_ms(value):
+    """Zamienia format NTP short (16.16) na milisekundy."""
+    return value * 1000.0 / 65536.0
+
+
+def format_ref_id(stratum, raw):
+    """Zwraca czytelną postać identyfikatora źródła (kod ASCII lub adres IPv4)."""
+    if stratum <= 1:
+        return raw.rstrip(b"\x00").decode("ascii", errors="replace")
+    return socket.inet_ntoa(raw)
+
+
+def build_request(transmit_ns):
+    """Buduje 48-bajtowe zapytanie klienta z podanym znacznikiem nadania."""
+    return NTP_PACKET.pack((0 << 6) | (NTP_VERSION << 3) | MODE_CLIENT,
+                           0, 0, 0, 0, 0, b"\x00" * 4, 0, 0, 0, to_ntp_time(transmit_ns))
+
+
+def build_response(request, receive_ns, transmit_ns, stratum=1, ref_id=b"LOCL",
+                   reference_ns=None, precision=-20, leap=0):
+    """Buduje odpowiedź serwera na zapytanie klienta (np. dla lokalnego serwera zastępczego)."""
+    if len(request) < NTP_PACKET_SIZE:
+        raise NtpError("Zapytanie NTP jest za krótkie")
+    version = (request[0] >> 3) & 0x07 or NTP_VERSION
+    poll = struct.unpack_from("!b", request, 2)[0]
+    originate = request[40:48]
+    if reference_ns is None:
+        reference_ns = receive_ns
+    return (struct.pack("!BBbbII4sQ", (leap << 6) | (version << 3) | MODE_SERVER, stratum, poll,
+                        precision, 0, 0, ref_id, to_ntp_time(reference_ns))
+            + originate
+            + struct.pack("!QQ", to_ntp_time(receive_ns), to_ntp_time(transmit_ns)))
+
+
+def parse_response(data, originate_ns, destination_ns, server=None, timestamping=TIMESTAMP_USER):
+    """Dekoduje odpowiedź serwera i oblicza offset oraz opóźnienie (w ms).
+
+    originate_ns to czas nadania zapytania (T1), a destination_ns czas
+    odebrania odpowiedzi (T4), oba jako czas Unix w nanosekundach.
+    """
+    if len(data) < NTP_PACKET_SIZE:
+        raise NtpError(f"Odpowiedź NTP ma nieprawidłową długość: {len(data)} B")
+
+    (li_vn_mode, stratum, poll, precision, root_delay, root_dispersion, ref_id,
+     _reference, originate, receive, transmit) = NTP_PACKET.unpack_from(data)
+
+    leap = li_vn_mode >> 6
+    version = (li_vn_mode >> 3) & 0x07
+    mode = li_vn_mode & 0x07
+
+    if mode not in (MODE_SERVER, MODE_BROADCAST):
+        raise NtpError(f"Nieoczekiwany tryb pakietu NTP: {mode}")
+    if stratum == 0:
+        raise KissOfDeath(format_ref_id(0, ref_id), server)
+    if originate != to_ntp_time(originate_ns):
+        raise NtpError("Odpowiedź NTP nie pasuje do wysłanego zapytania")
+    if transmit == 0:
+        raise NtpError("Serwer NTP nie podał czasu nadania odpowiedzi")
+    if leap == 3:
+        raise NtpError("Zegar serwera NTP nie jest zsynchronizowany")
+
+    t1 = originate_ns
+    t2 = from_ntp_time(receive)
+    t3 = from_ntp_time(transmit)
+    t4 = destination_ns
+
+    offset_ns = ((t2 - t1) + (t3 - t4)) / 2
+    delay_ns = (t4 - t1) - (t3 - t2)
+
+    return NtpResult(
+        server=server,
+        offset_ms=offset_ns / 1e6,
+        delay_ms=max(delay_ns, 0) / 1e6,
+        stratum=stratum,
+        ref_id=format_ref_id(stratum, ref_id),
+        leap=leap,
+        version=version,
+        poll=poll,
+        precision=precision,
+        root_delay_ms=_short_to_ms(root_delay),
+        root_dispersion_ms=_short_to_ms(root_dispersion),
+        received_at=destination_ns / 1e9,
+        timestamping=timestamping,
+    )
+
+
+class Timestamper:
+    """Pary znaczników czasu: zegar ścienny zakotwiczony na zegarze monotonicznym.
+
+    Czas odebrania liczony jest jako T1 + upływ perf_counter, dzięki czemu
+    skok zegara systemowego w trakcie zapytania nie psuje pomiaru opóźnienia.
+    """
+
+    __slots__ = ("wall_ns", "mono_ns")
+
+    def __init__(self):
+        self.wall_ns = time.time_ns()
+        self.mono_ns = time.perf_counter_ns()
+
+    def now_ns(self):
+        return self.wall_ns + (time.perf_counter_ns() - self.mono_ns)
+
+
+def enable_kernel_timestamps(sock):
+    """Włącza znaczniki czasu odbioru nadawane przez jądro (Linux); False, gdy niedostępne."""
+    if SO_TIMESTAMPNS is None or not hasattr(sock, "recvmsg"):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        return False
+    return True
+
+
+def recv_timestamped(sock, bufsize=512):
+    """Odbiera datagram przez recvmsg; zwraca (dane, nadawca, czas odbioru wg jądra w ns lub None)."""
+    data, ancdata, _flags, peer = sock.recvmsg(bufsize, _ANCILLARY_SIZE)
+    for level, kind, value in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(value) >= _TIMESPEC.size:
+            seconds, nanoseconds = _TIMESPEC.unpack_from(value)
+            return data, peer, seconds * 1_000_000_000 + nanoseconds
+    return data, peer, None
+
+
+def query(server, port=NTP_PORT, timeout=2.0, kernel_timestamps=True):
+    """Wysyła jedno zapytanie SNTP do serwera i zwraca NtpResult.
+
+    Jeśli system na to pozwala, czas odebrania odpowiedzi (T4) pochodzi z jądra,
+    a nie z odczytu zegara po wybudzeniu wątku.
+    """
+    try:
+        with tracing.span("dns", tracing.NETWORK, server=server):
+            family, _, _, _, address = socket.getaddrinfo(server, port, 0, socket.SOCK_DGRAM)[0]
+    except socket.gaierror as e:
+        raise NtpError(f"Nie można rozwiązać nazwy serwera {server}: {e}") from e
+
+    with socket.socket(family, socket.SOCK_DGRAM) as sock, tracing.span("ntp", tracing.NETWORK, server=server):
+        sock.settimeout(timeout)
+        kernel = kernel_timestamps and enable_kernel_timestamps(sock)
+        stamp = Timestamper()
+        originate_ns = stamp.wall_ns
+        try:
+            sock.sendto(build_request(originate_ns), address)
+            while True:
+                if kernel:
+                    data, peer, arrival_ns = recv_timestamped(sock)
+                else:
+                    data, peer = sock.recvfrom(512)
+                    arrival_ns = None
+                destination_ns = stamp.now_ns()
+                if peer[:2] == address[:2]:
+                    break
+        except socket.timeout as e:
+            raise NtpError(f"Przekroczono limit czasu odpowiedzi serwera {server}") from e
+        except OSError as e:
+            raise NtpError(f"Błąd komunikacji z serwerem {server}: {e}") from e
+
+    if arrival_ns is None:
+        return parse_response(data, originate_ns, destination_ns, server=server)
+    return parse_response(data, originate_ns, arrival_ns, server=server, timestamping=TIMESTAMP_KERNEL)
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def benchmark(queries=200, busy_threads=1):
+    """Rozrzut opóźnienia i offsetu przez loopback: znaczniki jądra kontra znaczniki z przestrzeni użytkownika.
+
+    Serwer działa w osobnym procesie; wątki obciążające (busy_threads) walczą
+    o GIL z wątkiem zapytań, co odpowiada opóźnieniom planisty i GC w aplikacji.
+    """
+    import multiprocessing
+    import statistics
+    import threading
+
+    from timesync import ntpserver
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=ntpserver._server_process, args=(port_queue,), daemon=True)
+    server.start()
+    stop = threading.Event()
+    spinners = [threading.Thread(target=_spin, args=(stop,), daemon=True) for _ in range(busy_threads)]
+    results = {"queries": queries, "busy_threads": busy_threads}
+    try:
+        port = port_queue.get(timeout=10)
+        for spinner in spinners:
+            spinner.start()
+        for kernel in (True, False):
+            samples = [query("127.0.0.1", port, kernel_timestamps=kernel) for _ in range(queries)]
+            name = samples[0].timestamping if kernel else TIMESTAMP_USER
+            delays = [r.delay_ms for r in samples]
+            offsets = [r.offset_ms for r in samples]
+            results[f"{name}_delay_mean_ms"] = statistics.fmean(delays)
+            results[f"{name}_delay_stdev_ms"] = statistics.stdev(delays)
+            results[f"{name}_delay_max_ms"] = max(delays)
+            results[f"{name}_offset_stdev_ms"] = statistics.stdev(offsets)
+    finally:
+        stop.set()
+        server.terminate()
+        server.join()
+    return results
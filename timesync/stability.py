@@ -0,0 +1,409 @@
+"""Statystyki stabilności zegara: odchylenie Allana, jitter, dopasowanie dryfu i odsetek odstających pomiarów.
+
+Dane wejściowe to serie offsetów (ms) w funkcji czasu (s) - np. z historii
+pomiarów (history.HistoryStore). Odstępy między pomiarami są nieregularne
+(adaptacyjny harmonogram odpytywania), dlatego przed liczeniem odchylenia
+Allana seria jest interpolowana liniowo na równą siatkę o kroku tau0
+(mediana odstępów).
+
+Obliczenia są wektorowe w NumPy, jeśli jest zainstalowane; bez NumPy używane
+są równoważne, wolniejsze pętle w czystym Pythonie.
+"""
+import bisect
+import math
+from collections import namedtuple
+
+from timesync.history import SAMPLE, HistoryStore, load_numpy
+
+# Najmniejsza liczba pomiarów, dla której liczymy statystyki
+MIN_SAMPLES = 4
+
+# Pomiar odstaje, gdy reszta dopasowania liniowego przekracza tyle odchyleń (odpornych, z MAD)
+OUTLIER_SIGMAS = 5.0
+
+# Skala MAD -> odchylenie standardowe dla rozkładu normalnego
+MAD_SCALE = 1.4826
+
+SECONDS_PER_DAY = 86400
+
+StabilityReport = namedtuple("StabilityReport", [
+    "server",
+    "samples",
+    "span_s",              # czas objęty pomiarami
+    "tau0_s",              # krok siatki (mediana odstępów między pomiarami)
+    "taus_s",              # czasy uśredniania tau (oktawy tau0)
+    "adev",                # odchylenie Allana dla kolejnych tau (bezwymiarowe)
+    "mdev",                # zmodyfikowane odchylenie Allana dla kolejnych tau
+    "jitter_ms",           # RMS różnic kolejnych offsetów
+    "offset_ms",           # offset na końcu serii wg dopasowania liniowego
+    "drift_ppm",           # dryf częstotliwości (nachylenie dopasowania liniowego)
+    "aging_ppm_per_day",   # zmiana dryfu w czasie (dopasowanie kwadratowe)
+    "residual_rms_ms",     # RMS reszt dopasowania liniowego
+    "outlier_rate",        # odsetek pomiarów odstających
+])
+
+
+def _median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+
+def octave_factors(count):
+    """Krotności m kroku tau0 (1, 2, 4, ...), dla których wystarcza pomiarów (3m <= count - 1)."""
+    factors = []
+    m = 1
+    while 3 * m <= count - 1:
+        factors.append(m)
+        m *= 2
+    return factors
+
+
+def resample(timestamps, offsets_ms, tau0=None):
+    """Interpoluje serię na równą siatkę o kroku tau0; zwraca (tau0, fazy w sekundach)."""
+    numpy = load_numpy()
+    if numpy is not None:
+        t = numpy.asarray(timestamps, dtype=float)
+        x = numpy.asarray(offsets_ms, dtype=float) / 1000
+        if tau0 is None:
+            tau0 = float(numpy.median(numpy.diff(t)))
+        if tau0 <= 0:
+            return None, x[:0]
+        grid = t[0] + tau0 * numpy.arange(int((t[-1] - t[0]) / tau0) + 1)
+        return tau0, numpy.interp(grid, t, x)
+
+    if tau0 is None:
+        tau0 = _median([b - a for a, b in zip(timestamps, timestamps[1:])])
+    if tau0 <= 0:
+        return None, []
+    phases = []
+    j = 0
+    last = len(timestamps) - 1
+    for i in range(int((timestamps[-1] - timestamps[0]) / tau0) + 1):
+        t = timestamps[0] + i * tau0
+        while j < last - 1 and timestamps[j + 1] <= t:
+            j += 1
+        t0, t1 = timestamps[j], timestamps[j + 1]
+        x0, x1 = offsets_ms[j], offsets_ms[j + 1]
+        weight = (t - t0) / (t1 - t0) if t1 > t0 else 0.0
+        phases.append((x0 + (x1 - x0) * min(max(weight, 0.0), 1.0)) / 1000)
+    return tau0, phases
+
+
+def allan_deviation(phases, tau0, factors):
+    """Nakładkowe odchylenie Allana z faz (s) na równej siatce dla tau = m * tau0."""
+    numpy = load_numpy()
+    if numpy is not None:
+        x = numpy.asarray(phases)
+    result = []
+    for m in factors:
+        tau = m * tau0
+        if numpy is not None:
+            d = x[2 * m:] - 2 * x[m:-m] + x[:-2 * m]
+            variance = float(numpy.dot(d, d)) / (2 * tau * tau * len(d))
+        else:
+            n = len(phases) - 2 * m
+            total = 0.0
+            for i in range(n):
+                d = phases[i + 2 * m] - 2 * phases[i + m] + phases[i]
+                total += d * d
+            variance = total / (2 * tau * tau * n)
+        result.append(math.sqrt(variance))
+    return result
+
+
+def modified_allan_deviation(phases, tau0, factors):
+    """Zmodyfikowane odchylenie Allana z faz (s) na równej siatce dla tau = m * tau0.
+
+    Sumy wewnętrzne po m kolejnych próbkach liczone są z sum skumulowanych,
+    więc koszt dla każdego tau jest liniowy względem liczby próbek.
+    """
+    numpy = load_numpy()
+    if numpy is not None:
+        cumulative = numpy.concatenate(([0.0], numpy.cumsum(phases)))
+    else:
+        cumulative = [0.0]
+        for value in phases:
+            cumulative.append(cumulative[-1] + value)
+
+    count = len(phases)
+    result = []
+    for m in factors:
+        tau = m * tau0
+        n = count - 3 * m + 1
+        if numpy is not None:
+            window = cumulative[m:] - cumulative[:-m]    # window[k] = suma x[k:k+m]
+            inner = window[2 * m:2 * m + n] - 2 * window[m:m + n] + window[:n]
+            total = float(numpy.dot(inner, inner))
+        else:
+            total = 0.0
+            for j in range(n):
+                inner = (cumulative[j + 3 * m] - cumulative[j + 2 * m]
+                         - 2 * (cumulative[j + 2 * m] - cumulative[j + m])
+                         + cumulative[j + m] - cumulative[j])
+                total += inner * inner
+        result.append(math.sqrt(total / (2 * m * m * tau * tau * n)))
+    return result
+
+
+def rms_jitter_ms(offsets_ms):
+    """RMS różnic kolejnych offsetów (jak jitter w NTP)."""
+    numpy = load_numpy()
+    if len(offsets_ms) < 2:
+        return None
+    if numpy is not None:
+        d = numpy.diff(numpy.asarray(offsets_ms, dtype=float))
+        return math.sqrt(float(numpy.dot(d, d)) / len(d))
+    total = sum((b - a) ** 2 for a, b in zip(offsets_ms, offsets_ms[1:]))
+    return math.sqrt(total / (len(offsets_ms) - 1))
+
+
+def _solve(matrix, vector):
+    """Rozwiązuje mały układ równań liniowych (eliminacja Gaussa z wyborem elementu głównego)."""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda r: abs(rows[r][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        if rows[column][column] == 0:
+            raise ValueError("Układ równań jest osobliwy")
+        for r in range(column + 1, size):
+            factor = rows[r][column] / rows[column][column]
+            for c in range(column, size + 1):
+                rows[r][c] -= factor * rows[column][c]
+    solution = [0.0] * size
+    for r in range(size - 1, -1, -1):
+        value = rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))
+        solution[r] = value / rows[r][r]
+    return solution
+
+
+def polynomial_fit(timestamps, offsets_ms, degree):
+    """Dopasowanie wielomianu metodą najmniejszych kwadratów (równania normalne) względem t - t_środkowe.
+
+    Zwraca (współczynniki od wyrazu wolnego, czas odniesienia t_środkowe).
+    """
+    numpy = load_numpy()
+    if numpy is not None:
+        t = numpy.asarray(timestamps, dtype=float)
+        y = numpy.asarray(offsets_ms, dtype=float)
+        center = float(t.mean())
+        t = t - center
+        power = numpy.ones_like(t)
+        powers = []
+        moments = []
+        for k in range(2 * degree + 1):
+            powers.append(float(power.sum()))
+            if k <= degree:
+                moments.append(float(numpy.dot(power, y)))
+            power *= t
+    else:
+        center = sum(timestamps) / len(timestamps)
+        powers = [0.0] * (2 * degree + 1)
+        moments = [0.0] * (degree + 1)
+        for t, y in zip(timestamps, offsets_ms):
+            t -= center
+            p = 1.0
+            for k in range(2 * degree + 1):
+                powers[k] += p
+                if k <= degree:
+                    moments[k] += p * y
+                p *= t
+    matrix = [[powers[i + j] for j in range(degree + 1)] for i in range(degree + 1)]
+    return _solve(matrix, moments), center
+
+
+def outlier_rate(timestamps, offsets_ms, coefficients, center, sigmas=OUTLIER_SIGMAS):
+    """Odsetek pomiarów, których reszta dopasowania liniowego odstaje o więcej niż sigmas odchyleń (MAD).
+
+    Zwraca (odsetek, RMS reszt w ms).
+    """
+    numpy = load_numpy()
+    intercept, slope = coefficients[:2]
+    if numpy is not None:
+        t = numpy.asarray(timestamps, dtype=float)
+        residuals = numpy.asarray(offsets_ms, dtype=float) - (intercept + slope * (t - center))
+        deviations = numpy.abs(residuals - numpy.median(residuals))
+        scale = MAD_SCALE * float(numpy.median(deviations))
+        rms = math.sqrt(float(numpy.dot(residuals, residuals)) / len(residuals))
+        if scale == 0:
+            return 0.0, rms
+        return float(numpy.count_nonzero(deviations > sigmas * scale)) / len(residuals), rms
+
+    residuals = [y - (intercept + slope * (t - center)) for t, y in zip(timestamps, offsets_ms)]
+    median = _median(residuals)
+    deviations = [abs(r - median) for r in residuals]
+    scale = MAD_SCALE * _median(deviations)
+    rms = math.sqrt(sum(r * r for r in residuals) / len(residuals))
+    if scale == 0:
+        return 0.0, rms
+    return sum(1 for d in deviations if d > sigmas * scale) / len(residuals), rms
+
+
+def remove_steps(timestamps, offsets_ms, steps):
+    """Usuwa z serii skoki offsetu w chwilach steps (korekty zegara, np. synchronizacje).
+
+    Odcinki między korektami mają wspólne nachylenie (liczone z ich
+    wewnętrznej zmienności) i własne wyrazy wolne; każdy odcinek jest
+    przesuwany o różnicę swojego wyrazu wolnego względem pierwszego.
+    """
+    numpy = load_numpy()
+    if not steps or len(timestamps) < 2:
+        return timestamps, offsets_ms
+    if numpy is not None:
+        t = numpy.asarray(timestamps, dtype=float)
+        o = numpy.asarray(offsets_ms, dtype=float)
+        segment = numpy.searchsorted(numpy.asarray(steps, dtype=float), t, side="right")
+        counts = numpy.maximum(numpy.bincount(segment), 1)
+        mean_t = numpy.bincount(segment, t) / counts
+        mean_o = numpy.bincount(segment, o) / counts
+        dt = t - mean_t[segment]
+        variance = float(numpy.dot(dt, dt))
+        slope = float(numpy.dot(dt, o - mean_o[segment])) / variance if variance else 0.0
+        intercepts = mean_o - slope * mean_t
+        return t, o - (intercepts[segment] - intercepts[segment[0]])
+
+    segments = [bisect.bisect_right(steps, t) for t in timestamps]
+    sums = {}
+    for segment, t, o in zip(segments, timestamps, offsets_ms):
+        entry = sums.setdefault(segment, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += t
+        entry[2] += o
+    means = {segment: (total_t / n, total_o / n) for segment, (n, total_t, total_o) in sums.items()}
+    covariance = variance = 0.0
+    for segment, t, o in zip(segments, timestamps, offsets_ms):
+        mean_t, mean_o = means[segment]
+        covariance += (t - mean_t) * (o - mean_o)
+        variance += (t - mean_t) ** 2
+    slope = covariance / variance if variance else 0.0
+    intercepts = {segment: mean_o - slope * mean_t for segment, (mean_t, mean_o) in means.items()}
+    first = intercepts[segments[0]]
+    return list(timestamps), [o - (intercepts[segment] - first) for segment, o in zip(segments, offsets_ms)]
+
+
+def analyze(timestamps, offsets_ms, server=None, tau0=None):
+    """Statystyki stabilności jednej serii pomiarów (niemalejące znaczniki czasu w s, offsety w ms).
+
+    Zwraca StabilityReport lub None, gdy pomiarów jest za mało.
+    """
+    numpy = load_numpy()
+    if len(timestamps) < MIN_SAMPLES or timestamps[-1] <= timestamps[0]:
+        return None
+    if numpy is None:
+        timestamps = list(timestamps)
+        offsets_ms = list(offsets_ms)
+
+    tau0, phases = resample(timestamps, offsets_ms, tau0)
+    if tau0 is None:
+        # Pomiary w większości z tą samą chwilą - siatka z odstępu średniego
+        tau0, phases = resample(timestamps, offsets_ms, (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1))
+    factors = octave_factors(len(phases))
+
+    linear, center = polynomial_fit(timestamps, offsets_ms, 1)
+    quadratic, _ = polynomial_fit(timestamps, offsets_ms, 2)
+    outliers, residual_rms = outlier_rate(timestamps, offsets_ms, linear, center)
+    # Nachylenie w ms/s = 1000 ppm; aging to pochodna dryfu (2 * c2) przeliczona na dobę
+    return StabilityReport(
+        server=server,
+        samples=len(timestamps),
+        span_s=float(timestamps[-1] - timestamps[0]),
+        tau0_s=tau0,
+        taus_s=[m * tau0 for m in factors],
+        adev=allan_deviation(phases, tau0, factors),
+        mdev=modified_allan_deviation(phases, tau0, factors),
+        jitter_ms=rms_jitter_ms(offsets_ms),
+        offset_ms=linear[0] + linear[1] * (float(timestamps[-1]) - center),
+        drift_ppm=linear[1] * 1000,
+        aging_ppm_per_day=2 * quadratic[2] * 1000 * SECONDS_PER_DAY,
+        residual_rms_ms=residual_rms,
+        outlier_rate=outliers,
+    )
+
+
+def analyze_history(store, start=None, end=None, server=None):
+    """Raporty stabilności dla każdego serwera z historii pomiarów: słownik serwer -> StabilityReport.
+
+    Synchronizacje zapisane w historii (SYNC_OK, SYNC_FAILED) skokowo zmieniają
+    zegar lokalny, a więc offsety wszystkich serwerów - skoki są usuwane
+    z serii przed analizą (remove_steps).
+    """
+    numpy = load_numpy()
+    records = store.range(start, end, server)
+    # Synchronizacja jest zapisana pod nazwą swojego serwera, a przesuwa offsety wszystkich
+    every = records if server is None else store.range(start, end)
+    steps = sorted(float(t) for t, kind in zip(every.timestamp, every.kind) if kind != SAMPLE)
+    reports = {}
+    if numpy is not None:
+        samples = records.kind == SAMPLE
+        servers = records.server[samples]
+        timestamps = records.timestamp[samples]
+        offsets = records.offset_ms[samples]
+        # Stabilne sortowanie zachowuje kolejność czasową w obrębie serwera
+        order = numpy.argsort(servers, kind="stable")
+        servers, timestamps, offsets = servers[order], timestamps[order], offsets[order]
+        ids, starts = numpy.unique(servers, return_index=True)
+        bounds = list(starts[1:]) + [len(servers)]
+        groups = [(int(i), timestamps[a:b], offsets[a:b]) for i, a, b in zip(ids, starts, bounds)]
+    else:
+        series = {}
+        for t, offset, server_id, kind in zip(records.timestamp, records.offset_ms, records.server, records.kind):
+            if kind == SAMPLE:
+                entry = series.setdefault(server_id, ([], []))
+                entry[0].append(t)
+                entry[1].append(offset)
+        groups = [(server_id, t, offsets) for server_id, (t, offsets) in series.items()]
+
+    for server_id, timestamps, offsets in groups:
+        timestamps, offsets = remove_steps(timestamps, offsets, steps)
+        report = analyze(timestamps, offsets, store.servers[server_id])
+        if report is not None:
+            reports[report.server] = report
+    return reports
+
+
+def format_report(report):
+    """Opis raportu w kilku liniach tekstu."""
+    lines = [
+        f"{report.server}: {report.samples} pomiarów w {report.span_s / 3600:.1f} h "
+        f"(krok {report.tau0_s:.0f} s)",
+        f"  offset {report.offset_ms:+.3f} ms, dryf {report.drift_ppm:+.3f} ppm, "
+        f"starzenie {report.aging_ppm_per_day:+.4f} ppm/dobę",
+        f"  jitter {report.jitter_ms:.3f} ms, reszty RMS {report.residual_rms_ms:.3f} ms, "
+        f"odstające {report.outlier_rate * 100:.2f}%",
+    ]
+    for tau, adev, mdev in zip(report.taus_s, report.adev, report.mdev):
+        lines.append(f"  tau {tau:9.0f} s: ADEV {adev:.3e}, MDEV {mdev:.3e}")
+    return lines
+
+
+def benchmark(servers=None, days=30, interval=256.0):
+    """Czas analizy historii: miesiąc pomiarów z wielu serwerów (bez NumPy mniej serwerów)."""
+    import random
+    import time
+
+    numpy = load_numpy()
+    if servers is None:
+        servers = 200 if numpy is not None else 10
+    rng = random.Random(1)
+    per_server = int(days * SECONDS_PER_DAY / interval)
+    store = HistoryStore(servers * per_server)
+    names = [f"ntp{i}.example" for i in range(servers)]
+    drifts = [rng.uniform(-20, 20) / 1000 for _ in names]   # ms/s
+    for i in range(per_server):
+        t = 1.7e9 + i * interval
+        for j, (name, drift) in enumerate(zip(names, drifts)):
+            jitter = rng.gauss(0, 0.5) if rng.random() > 0.001 else 50.0
+            store.append(t + j * 0.01, name, drift * i * interval + jitter, 5.0)
+
+    start = time.perf_counter()
+    reports = analyze_history(store)
+    elapsed = time.perf_counter() - start
+    return {
+        "numpy": numpy is not None,
+        "servers": servers,
+        "samples": len(store),
+        "analysis_ms": elapsed * 1000,
+        "reports": len(reports),
+        "max_drift_error_ppm": max(abs(reports[name].drift_ppm - drift * 1000) for name, drift in zip(names, drifts)),
+    }
@@ -0,0 +1,243 @@
+"""Przegląd offsetu zegarów wielu hostów NTP (np. całego centrum danych) z jednej maszyny.
+
+Hosty są odpytywane tym samym kodem co w poller (SNTP w asyncio, bez usługi
+czasu systemu) przez stałą liczbę współbieżnych zapytań. Lista celów jest
+czytana leniwie, a wyniki trafiają do pliku CSV lub JSON lines w chwili
+nadejścia, więc zużycie pamięci nie zależy od liczby hostów.
+"""
+import asyncio
+import csv
+import functools
+import json
+import logging
+from collections import namedtuple
+
+from timesync import poller, sntp
+from timesync.resolver import Resolver
+
+# Domyślna liczba zapytań w locie i limit czasu pojedynczego zapytania (s)
+DEFAULT_WINDOW = 256
+DEFAULT_TIMEOUT = 2.0
+
+# Offset, powyżej którego host jest liczony jako rozregulowany (ms)
+DEFAULT_THRESHOLD_MS = 100.0
+
+# Najwięcej wątków rozwiązujących nazwy hostów (getaddrinfo jest blokujące)
+MAX_RESOLVER_THREADS = 64
+
+SurveyEntry = namedtuple("SurveyEntry", [
+    "host",
+    "port",
+    "result",       # sntp.NtpResult lub None
+    "error",        # opis błędu lub None
+])
+
+# Kolumny wyniku (CSV i klucze JSON lines)
+FIELDS = ("host", "port", "offset_ms", "delay_ms", "stratum", "ref_id", "leap",
+          "root_delay_ms", "root_dispersion_ms", "timestamping", "error")
+
+
+def parse_target(text, default_port=sntp.NTP_PORT):
+    """Zamienia "host", "host:port", "[adres IPv6]:port" lub adres IPv6 na (host, port)."""
+    text = text.strip()
+    port = ""
+    if text.startswith("["):
+        host, bracket, rest = text[1:].partition("]")
+        if not bracket or rest and not rest.startswith(":"):
+            raise ValueError(f"Nieprawidłowy cel: {text}")
+        port = rest[1:]
+    elif text.count(":") == 1:
+        host, port = text.split(":")
+    else:
+        host = text
+    if not host or port and not port.isdigit():
+        raise ValueError(f"Nieprawidłowy cel: {text}")
+    port = int(port) if port else default_port
+    if not 0 < port < 65536:
+        raise ValueError(f"Nieprawidłowy port: {text}")
+    return host, port
+
+
+def read_targets(lines, default_port=sntp.NTP_PORT):
+    """Generator celów (host, port) z linii tekstu; pomija puste linie, komentarze (#) i błędne wpisy."""
+    for number, line in enumerate(lines, 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            yield parse_target(line, default_port)
+        except ValueError as e:
+            logging.warning(f"Linia {number}: {str(e)}")
+
+
+def entry_row(entry):
+    """Wartości kolumn FIELDS dla wpisu przeglądu."""
+    result = entry.result
+    if result is None:
+        return (entry.host, entry.port, None, None, None, None, None, None, None, None, entry.error)
+    return (entry.host, entry.port, round(result.offset_ms, 6), round(result.delay_ms, 6), result.stratum,
+            result.ref_id, result.leap, round(result.root_delay_ms, 6), round(result.root_dispersion_ms, 6),
+            result.timestamping, None)
+
+
+class CsvWriter:
+    """Zapis wyników jako CSV z nagłówkiem."""
+
+    def __init__(self, file):
+        self.writer = csv.writer(file)
+        self.writer.writerow(FIELDS)
+
+    def write(self, entry):
+        self.writer.writerow(entry_row(entry))
+
+
+class JsonLinesWriter:
+    """Zapis wyników jako JSON lines (jeden obiekt na wiersz)."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, entry):
+        self.file.write(json.dumps(dict(zip(FIELDS, entry_row(entry))), ensure_ascii=False) + "\n")
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+}
+
+
+class SurveySummary:
+    """Statystyki przeglądu liczone przyrostowo (bez przechowywania wyników)."""
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS):
+        self.threshold_ms = threshold_ms
+        self.total = 0
+        self.responded = 0
+        self.failed = 0
+        self.over_threshold = 0
+        self.offset_min_ms = None
+        self.offset_max_ms = None
+        self.offset_sum_ms = 0.0
+        self.worst = None           # (|offset| ms, host, port)
+        self.elapsed_s = 0.0
+
+    def add(self, entry):
+        self.total += 1
+        result = entry.result
+        if result is None:
+            self.failed += 1
+            return
+        offset = result.offset_ms
+        self.responded += 1
+        self.offset_sum_ms += offset
+        if self.offset_min_ms is None or offset < self.offset_min_ms:
+            self.offset_min_ms = offset
+        if self.offset_max_ms is None or offset > self.offset_max_ms:
+            self.offset_max_ms = offset
+        if abs(offset) > self.threshold_ms:
+            self.over_threshold += 1
+        if self.worst is None or abs(offset) > self.worst[0]:
+            self.worst = (abs(offset), entry.host, entry.port)
+
+    def as_dict(self):
+        results = {
+            "hosts": self.total,
+            "responded": self.responded,
+            "failed": self.failed,
+            "over_threshold": self.over_threshold,
+            "elapsed_s": self.elapsed_s,
+            "hosts_per_s": self.total / self.elapsed_s if self.elapsed_s else 0.0,
+        }
+        if self.responded:
+            results["offset_min_ms"] = self.offset_min_ms
+            results["offset_max_ms"] = self.offset_max_ms
+            results["offset_mean_ms"] = self.offset_sum_ms / self.responded
+            results["worst"] = f"{self.worst[1]}:{self.worst[2]}"
+        return results
+
+
+async def survey(targets, on_entry, window=DEFAULT_WINDOW, timeout=DEFAULT_TIMEOUT, query=None,
+                 threshold_ms=DEFAULT_THRESHOLD_MS):
+    """Odpytuje cele (host, port) z co najwyżej window zapytaniami w locie; zwraca SurveySummary.
+
+    on_entry(SurveyEntry) jest wywoływane dla każdego hosta w chwili
+    nadejścia odpowiedzi (lub błędu). query(host, port, timeout) zastępuje
+    zapytania sieciowe (np. netsim.NetworkSimulator.query).
+    """
+    loop = asyncio.get_running_loop()
+    query = query or functools.partial(poller.query_async, record=False)
+    targets = iter(targets)
+    summary = SurveySummary(threshold_ms)
+
+    async def worker():
+        # Wspólny iterator: każdy z window pracowników pobiera kolejny cel po zakończeniu poprzedniego
+        for host, port in targets:
+            try:
+                entry = SurveyEntry(host, port, await query(host, port, timeout), None)
+            except sntp.NtpError as e:
+                entry = SurveyEntry(host, port, None, str(e))
+            except Exception as e:
+                # Błąd jednego hosta (np. nieobsługiwany adres) nie przerywa całego przeglądu
+                entry = SurveyEntry(host, port, None, f"{type(e).__name__}: {str(e)}")
+            summary.add(entry)
+            on_entry(entry)
+
+    start = loop.time()
+    await asyncio.gather(*(worker() for _ in range(max(int(window), 1))))
+    summary.elapsed_s = loop.time() - start
+    return summary
+
+
+def run(targets, writer, window=DEFAULT_WINDOW, timeout=DEFAULT_TIMEOUT, threshold_ms=DEFAULT_THRESHOLD_MS):
+    """Synchroniczny przegląd z zapisem do writer (CsvWriter, JsonLinesWriter); zwraca SurveySummary."""
+    # Własny resolver: więcej wątków niż we wspólnym, a tysiące nazw nie wypierają jego pamięci podręcznej
+    resolver = Resolver(max_workers=max(min(int(window), MAX_RESOLVER_THREADS), 1))
+    query = functools.partial(poller.query_async, record=False, resolver=resolver)
+    try:
+        return asyncio.run(survey(targets, writer.write, window, timeout, query, threshold_ms))
+    finally:
+        resolver.close()
+
+
+def benchmark(servers=200, hosts=20000, window=DEFAULT_WINDOW):
+    """Przegląd lokalnych serwerów zastępczych (UDP, każdy z innym offsetem) i błąd pomiaru offsetu."""
+    import io
+    import random
+    import time
+
+    from timesync import ntpserver
+
+    rng = random.Random(1)
+    offsets_ns = [int(rng.uniform(-500, 500) * 1e6) for _ in range(servers)]
+    output = io.StringIO()
+    writer = JsonLinesWriter(output)
+    errors = []
+
+    async def main():
+        endpoints = {}
+        for offset in offsets_ns:
+            transport, _ = await ntpserver.start_server(
+                "127.0.0.1", 0, clock=lambda offset=offset: time.time_ns() + offset)
+            endpoints[transport.get_extra_info("sockname")[1]] = (transport, offset)
+
+        def on_entry(entry):
+            writer.write(entry)
+            if entry.result is not None:
+                errors.append(abs(entry.result.offset_ms - endpoints[entry.port][1] / 1e6))
+
+        ports = list(endpoints)
+        targets = (("127.0.0.1", ports[i % servers]) for i in range(hosts))
+        try:
+            return await survey(targets, on_entry, window)
+        finally:
+            for transport, _ in endpoints.values():
+                transport.close()
+
+    summary = asyncio.run(main())
+    results = summary.as_dict()
+    results["window"] = window
+    results["servers"] = servers
+    results["max_offset_error_ms"] = max(errors) if errors else None
+    results["output_bytes"] = len(output.getvalue())
+    return results
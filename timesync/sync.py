@@ -0,0 +1,247 @@
+"""Logika synchronizacji czasu niezależna od interfejsu graficznego."""
+import logging
+import os
+import time
+from datetime import datetime
+
+from timesync import metrics, poller, service, sntp, tracing
+from timesync.pipeline import DEFAULT_ATTEMPTS, VERIFY_THRESHOLD_MS, SyncPipeline
+from timesync.resolver import host_of
+
+# Serwery dostępne jako skróty i odpytywane przy wyborze źródła z wielu serwerów
+POPULAR_SERVERS = ["tempus1.gum.gov.pl", "time.windows.com", "pool.ntp.org"]
+
+
+# Zapamiętany wynik sprawdzenia uprawnień (None - jeszcze nie sprawdzono)
+_admin = None
+
+
+def is_admin(refresh=False):
+    """Sprawdza, czy aplikacja jest uruchomiona z uprawnieniami administratora.
+
+    Wynik jest zapamiętywany przy pierwszym wywołaniu; refresh=True sprawdza
+    uprawnienia ponownie.
+    """
+    global _admin
+    if _admin is None or refresh:
+        _admin = _check_admin()
+    return _admin
+
+
+def _check_admin():
+    # Poza Windows (Linux: timesyncd, chrony) sterowanie usługą czasu wymaga konta root
+    if hasattr(os, "geteuid"):
+        return os.geteuid() == 0
+    try:
+        import ctypes
+        return ctypes.windll.shell32.IsUserAnAdmin() != 0
+    except Exception:
+        return False
+
+
+def measure_offset(server):
+    """Mierzy offset zegara względem serwera NTP pojedynczym zapytaniem SNTP."""
+    try:
+        result = sntp.query(server)
+    except sntp.NtpError as e:
+        logging.warning(f"Nie udało się zmierzyć offsetu względem {server}: {str(e)}",
+                        extra={"server": server})
+        return None
+
+    logging.info(f"Offset względem {server}: {result.offset_ms:+.3f} ms, "
+                 f"opóźnienie: {result.delay_ms:.3f} ms, stratum: {result.stratum}, "
+                 f"źródło: {result.ref_id}, znaczniki czasu: {result.timestamping}",
+                 extra={"server": server, "offset_ms": result.offset_ms, "delay_ms": result.delay_ms,
+                        "stratum": result.stratum})
+    return result
+
+
+def measure_sources(servers, poll=poller.poll):
+    """Odpytuje równolegle serwery, wybierając wiarygodne źródła."""
+    outcome = poll(servers)
+
+    for failed, error in outcome.failures.items():
+        logging.warning(f"Brak odpowiedzi serwera {failed}: {str(error)}", extra={"server": failed})
+    for result in outcome.selection.falsetickers:
+        logging.warning(f"Odrzucono fałszywe źródło {result.server} (offset {result.offset_ms:+.3f} ms)",
+                        extra={"server": result.server, "offset_ms": result.offset_ms,
+                               "delay_ms": result.delay_ms, "stratum": result.stratum})
+
+    selection = outcome.selection
+    if selection.offset_ms is None:
+        logging.warning(f"Nie znaleziono zgodnej większości źródeł czasu "
+                        f"(odpowiedzi: {len(outcome.results)}, czas: {outcome.elapsed_ms:.0f} ms)")
+    else:
+        survivors = ", ".join(r.server for r in selection.survivors)
+        logging.info(f"Połączony offset: {selection.offset_ms:+.3f} ms "
+                     f"(rozrzut {selection.jitter_ms:.3f} ms, źródła: {survivors}, "
+                     f"czas odpytywania: {outcome.elapsed_ms:.0f} ms)",
+                     extra={"server": survivors, "offset_ms": selection.offset_ms,
+                            "duration_ms": outcome.elapsed_ms})
+    return outcome
+
+
+def _controller(controller):
+    return controller if controller is not None else service.default_controller()
+
+
+def check_service_status(controller=None):
+    """Sprawdza status usługi czasu (wynik zapamiętywany przez kontroler)."""
+    return _controller(controller).status()
+
+
+def enable_time_service(controller=None):
+    """Włącza usługę czasu jeśli jest wyłączona."""
+    controller = _controller(controller)
+    logging.info(f"Włączanie usługi {controller.display_name}...")
+    result = controller.enable()
+    if not result.ok:
+        logging.error(f"Nie udało się włączyć usługi {controller.display_name}: {result.output}")
+        return False
+    else:
+        logging.info(f"Usługa {controller.display_name} została włączona.")
+        return True
+
+
+STATUS_NAMES = {
+    service.RUNNING: "URUCHOMIONA",
+    service.STOPPED: "ZATRZYMANA",
+    service.DISABLED: "WYŁĄCZONA",
+    service.UNKNOWN: "NIEZNANY",
+}
+
+
+def service_report(server, controller=None):
+    """Zbiera stan usługi czasu, źródło czasu i offset; zwraca raport tekstowy."""
+    controller = _controller(controller)
+    state = STATUS_NAMES[controller.status()]
+    source = controller.source()
+
+    # Wyświetl informacje w logu
+    logging.info(f"Status usługi {controller.display_name}:")
+    logging.info(f"- Stan usługi: {state}")
+    if source:
+        logging.info(f"- Źródło czasu: {source}")
+    else:
+        logging.info("- Nie można określić źródła czasu.")
+
+    info = f"Status usługi {controller.display_name}:\n\n"
+    info += f"Stan usługi: {state}\n"
+
+    if source:
+        info += f"Źródło czasu: {source}\n"
+    else:
+        info += "Nie można określić źródła czasu.\n"
+
+    # Pomiar rzeczywistego offsetu względem skonfigurowanego serwera
+    measurement = measure_offset(server)
+    if measurement is not None:
+        info += (f"Offset względem {measurement.server}: {measurement.offset_ms:+.3f} ms "
+                 f"(opóźnienie {measurement.delay_ms:.3f} ms, stratum {measurement.stratum})\n\n")
+    else:
+        info += "Nie udało się zmierzyć offsetu względem serwera NTP.\n\n"
+
+    # Dodajemy wybrane fragmenty konfiguracji
+    info += "Fragmenty konfiguracji:\n"
+    for line in controller.configuration():
+        info += f"{line}\n"
+
+    return info
+
+
+def manage_time_service(action, controller=None):
+    """Uruchamia lub zatrzymuje usługę czasu; zwraca (sukces, komunikat błędu)."""
+    controller = _controller(controller)
+    if action == "start":
+        # Najpierw włącz usługę, jeśli jest wyłączona
+        if controller.status() == service.DISABLED:
+            result = controller.enable()
+            if not result.ok:
+                raise service.ServiceError(result.output)
+            logging.info(f"Ustawiono automatyczne uruchamianie usługi {controller.display_name}.")
+
+        # Uruchom usługę
+        result = controller.start()
+
+        if result.ok:
+            logging.info(f"Usługa {controller.display_name} została uruchomiona.")
+        else:
+            logging.error(f"Nie udało się uruchomić usługi: {result.output}")
+        return result.ok, result.output
+
+    elif action == "stop":
+        result = controller.stop()
+
+        if result.ok:
+            logging.info(f"Usługa {controller.display_name} została zatrzymana.")
+        else:
+            logging.error(f"Nie udało się zatrzymać usługi: {result.output}")
+        return result.ok, result.output
+
+    raise ValueError(f"Nieznana akcja usługi: {action}")
+
+
+def sync_time(server, multi_server=True, controller=None, attempts=DEFAULT_ATTEMPTS,
+              verify_threshold_ms=VERIFY_THRESHOLD_MS):
+    """Synchronizuje zegar systemowy z serwerem NTP przez systemową usługę czasu."""
+    metrics.SYNC_ATTEMPTS.inc()
+    with tracing.span("sync_time", tracing.SYNC, server=server):
+        result = _sync_time(server, multi_server, _controller(controller), attempts, verify_threshold_ms)
+    metrics.record_sync(result, time.time())
+    return result
+
+
+def _sync_time(server, multi_server, controller, attempts, verify_threshold_ms, poll=poller.poll):
+    logging.info(f"Rozpoczęcie synchronizacji z serwerem: {server}")
+
+    # Wybór serwerów dla usługi czasu: tylko źródła, które przeszły selekcję
+    peers = [server]
+    with tracing.span("select", tracing.STAGE):
+        if multi_server:
+            outcome = measure_sources([server] + POPULAR_SERVERS, poll)
+            if outcome.selection.survivors:
+                # Usługa czasu dostaje nazwy hostów (adresy puli rozwiąże sama)
+                peers = list(dict.fromkeys(host_of(r.server) for r in outcome.selection.survivors))
+        else:
+            measure_offset(server)
+
+    def measure():
+        # Weryfikacja sukcesu pomiarem offsetu zamiast analizy komunikatów usługi
+        if multi_server:
+            return measure_sources(peers, poll).selection.offset_ms
+        result = measure_offset(server)
+        return result.offset_ms if result is not None else None
+
+    pipeline = SyncPipeline(server, controller, peers=peers, measure=measure, attempts=attempts,
+                            verify_threshold_ms=verify_threshold_ms)
+    result = pipeline.run()
+
+    stages = ", ".join(f"{stage} {duration:.0f} ms" for stage, duration in result.stages)
+    logging.info(f"Czas etapów synchronizacji: {stages}")
+    logging.info(f"Aktualny czas systemowy: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    return result
+
+
+def simulate_sync(server, seed=None):
+    """Symuluje proces synchronizacji na wirtualnej sieci serwerów NTP (do celów testowych).
+
+    Wybór źródeł, potok synchronizacji i weryfikacja działają jak w
+    sync_time, ale zapytania trafiają do serwerów symulowanych
+    (netsim.NetworkSimulator), a usługa czasu koryguje zegar symulowany -
+    zegar systemowy nie jest zmieniany. Ten sam seed daje ten sam przebieg.
+    """
+    from timesync import netsim
+
+    with tracing.span("simulate_sync", tracing.SYNC, server=server):
+        logging.info(f"[SYMULACJA] Rozpoczęcie synchronizacji z serwerem: {server}")
+        with netsim.NetworkSimulator.generate([server] + POPULAR_SERVERS, seed=seed) as simulator:
+            logging.info(f"[SYMULACJA] Błąd zegara symulowanego: {simulator.error_ms():+.3f} ms, "
+                         f"dryf {simulator.clock.drift_ppm:+.2f} ppm")
+            started = time.perf_counter()
+            result = _sync_time(server, True, netsim.SimulatedTimeService(simulator), DEFAULT_ATTEMPTS,
+                                VERIFY_THRESHOLD_MS, poll=simulator.poll)
+            logging.info(f"[SYMULACJA] {result.message}")
+            logging.info(f"[SYMULACJA] Błąd zegara symulowanego po synchronizacji: "
+                         f"{simulator.error_ms():+.3f} ms (czas symulowany {simulator.now() * 1000:.0f} ms, "
+                         f"rzeczywisty {(time.perf_counter() - started) * 1000:.0f} ms)")
+        return result
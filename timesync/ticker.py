@@ -0,0 +1,185 @@
+"""Takty zegara wyrównane do pełnych sekund, bez narastającego opóźnienia."""
+import math
+import time
+from collections import deque
+
+from timesync.virtualclock import NS_PER_S, at_ns, mono_at_ns
+
+# Zapas po granicy sekundy, aby takt na pewno wypadł już w nowej sekundzie
+TICK_MARGIN_MS = 2
+
+# Rozbieżność zegara ściennego i monotonicznego uznawana za skok czasu systemowego
+STEP_THRESHOLD = 0.05
+
+# Liczba ostatnich taktów branych do statystyk
+STATS_WINDOW = 300
+
+# Najkrótszy odstęp taktów zegara wirtualnego przy dużym tempie (etykiety i tak nie nadążają)
+MIN_VIRTUAL_INTERVAL_MS = 50
+
+
+class SecondTicker:
+    """Wywołuje callback(now) tuż po każdej granicy sekundy zegara ściennego.
+
+    Termin kolejnego taktu liczony jest od zegara monotonicznego zakotwiczonego
+    na zegarze ściennym, więc opóźnienie pojedynczego taktu nie przesuwa
+    kolejnych. Skok zegara systemowego (np. po synchronizacji) powoduje
+    ponowne zakotwiczenie.
+
+    schedule(delay_ms, func) to funkcja planująca, np. root.after w tkinter.
+    """
+
+    def __init__(self, schedule, callback, wall_clock=time.time, monotonic=time.monotonic,
+                 margin_ms=TICK_MARGIN_MS, window=STATS_WINDOW):
+        self.schedule = schedule
+        self.callback = callback
+        self.wall_clock = wall_clock
+        self.monotonic = monotonic
+        self.margin_ms = margin_ms
+
+        self.ticks = 0
+        self.skipped = 0
+        self.steps = 0
+        # Opóźnienie taktu względem granicy sekundy [ms] i czas obsługi taktu [ms]
+        self.jitter_ms = deque(maxlen=window)
+        self.cost_ms = deque(maxlen=window)
+
+        self._wall_anchor = None
+        self._mono_anchor = None
+        self._target_mono = None
+        self._last_second = None
+        self._running = False
+
+    def start(self):
+        """Wywołuje pierwszy takt od razu i planuje kolejne."""
+        self._running = True
+        self._anchor()
+        self._tick()
+
+    def stop(self):
+        self._running = False
+
+    def _anchor(self):
+        self._wall_anchor = self.wall_clock()
+        self._mono_anchor = self.monotonic()
+
+    def _now(self):
+        """Bieżący czas ścienny liczony z zegara monotonicznego."""
+        mono = self.monotonic()
+        wall = self.wall_clock()
+        estimate = self._wall_anchor + (mono - self._mono_anchor)
+        if abs(wall - estimate) > STEP_THRESHOLD:
+            # Zegar systemowy został przestawiony - kotwiczymy ponownie
+            self.steps += 1
+            self._wall_anchor = wall
+            self._mono_anchor = mono
+            return wall, mono
+        return estimate, mono
+
+    def _tick(self):
+        if not self._running:
+            return
+        started = time.perf_counter_ns()
+        now, mono = self._now()
+
+        if self._target_mono is not None:
+            self.jitter_ms.append((mono - self._target_mono) * 1000)
+
+        second = math.floor(now)
+        if self._last_second is not None and second - self._last_second > 1:
+            self.skipped += second - self._last_second - 1
+        self._last_second = second
+        self.ticks += 1
+
+        self.callback(now)
+
+        # Termin następnej granicy sekundy w skali zegara monotonicznego
+        self._target_mono = mono + (second + 1 - now)
+        delay_ms = (self._target_mono - self.monotonic()) * 1000 + self.margin_ms
+        self.cost_ms.append((time.perf_counter_ns() - started) / 1e6)
+        self.schedule(max(int(math.ceil(delay_ms)), 1), self._tick)
+
+    def stats(self):
+        """Statystyki taktów: koszt obsługi i opóźnienie względem granicy sekundy."""
+        jitter = list(self.jitter_ms)
+        cost = list(self.cost_ms)
+        return {
+            "ticks": self.ticks,
+            "skipped": self.skipped,
+            "clock_steps": self.steps,
+            "jitter_mean_ms": sum(jitter) / len(jitter) if jitter else None,
+            "jitter_max_ms": max(jitter) if jitter else None,
+            "cost_mean_ms": sum(cost) / len(cost) if cost else None,
+            "cost_max_ms": max(cost) if cost else None,
+        }
+
+
+class VirtualSecondTicker:
+    """Wywołuje callback(now) tuż po każdej granicy sekundy zegara wirtualnego (virtualclock.VirtualClock).
+
+    Czas wirtualny ma ułamkowe przesunięcie względem systemowego i własne
+    tempo, więc jego sekundy nie wypadają w taktach SecondTicker. Termin
+    kolejnego taktu to odczyt zegara monotonicznego, przy którym czas
+    wirtualny osiągnie następną pełną sekundę (virtualclock.mono_at_ns).
+    Po zmianie stanu zegara (skok, tempo, korekta) należy wywołać reschedule:
+    takt następuje od razu, a wcześniej zaplanowany jest pomijany. Przy
+    zatrzymanym czasie (tempo 0) kolejne takty nie są planowane.
+    """
+
+    def __init__(self, schedule, callback, clock, margin_ms=TICK_MARGIN_MS, min_interval_ms=MIN_VIRTUAL_INTERVAL_MS):
+        self.schedule = schedule
+        self.callback = callback
+        self.clock = clock
+        self.margin_ms = margin_ms
+        self.min_interval_ms = min_interval_ms
+        self.ticks = 0
+        self._token = 0
+        self._running = False
+
+    def start(self):
+        """Wywołuje pierwszy takt od razu i planuje kolejne."""
+        self._running = True
+        self.reschedule()
+
+    def stop(self):
+        self._running = False
+        self._token += 1
+
+    def reschedule(self, *args):
+        """Takt od razu i termin następnego wg bieżącego stanu zegara (np. jako VirtualClock.on_change)."""
+        self._token += 1
+        self._tick(self._token)
+
+    def _tick(self, token):
+        # Takty zaplanowane przed zmianą stanu zegara mają nieaktualny termin
+        if not self._running or token != self._token:
+            return
+        state = self.clock.state
+        now_ns = at_ns(state, self.clock.monotonic_ns())
+        self.ticks += 1
+        self.callback(now_ns / NS_PER_S)
+
+        second_ns = now_ns - now_ns % NS_PER_S
+        target = mono_at_ns(state, second_ns + NS_PER_S)
+        if target is None:
+            return
+        # Sekunda wirtualna krótsza niż min_interval_ms (duże tempo) - takty rzadziej niż co sekundę
+        fast = target - mono_at_ns(state, second_ns) < self.min_interval_ms * 1_000_000
+        delay_ms = (target - self.clock.monotonic_ns()) / 1e6 + self.margin_ms
+        self.schedule(max(int(math.ceil(delay_ms)), self.min_interval_ms if fast else 1), lambda: self._tick(token))
+
+
+def benchmark(ticks=5, callback=None):
+    """Pomiar tickera bez tkinter: zwraca statystyki po podanej liczbie taktów."""
+    pending = []
+
+    def schedule(delay_ms, func):
+        pending.append((time.monotonic() + delay_ms / 1000, func))
+
+    ticker = SecondTicker(schedule, callback or (lambda now: None))
+    ticker.start()
+    while ticker.ticks < ticks and pending:
+        due, func = pending.pop()
+        time.sleep(max(due - time.monotonic(), 0))
+        func()
+    return ticker.stats()
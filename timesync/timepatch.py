@@ -0,0 +1,203 @@
+"""Podmiana funkcji czasu w bieżącym procesie na czas z zegara wirtualnego.
+
+Podmieniane są time.time, time.time_ns, time.monotonic, time.monotonic_ns oraz
+datetime.datetime (now, utcnow, today). Źródłem czasu jest VirtualClock
+w tym samym procesie albo SharedClock - zegar udostępniony przez aplikację
+w pamięci współdzielonej:
+
+    from timesync import timepatch
+
+    with timepatch.patch(shared=True):
+        ...  # time.time() i datetime.now() zwracają czas wirtualny aplikacji
+
+Podmiana polega na przypisaniu atrybutów modułów, więc wywołanie kosztuje
+tylko odczyt zegara wirtualnego (bez przeszukiwania modułów i stosu, jak
+w bibliotekach typu freezegun). Nazwy zaimportowane wcześniej przez
+"from time import time" trzeba wskazać w parametrze modules.
+"""
+import datetime as _datetime
+import time
+
+_real_datetime = _datetime.datetime
+_real_time_ns = time.time_ns
+
+# Podmieniane atrybuty modułu time
+TIME_FUNCTIONS = ("time", "time_ns", "monotonic", "monotonic_ns")
+
+
+class _VirtualDatetimeType(type):
+    """Metaklasa, dzięki której isinstance(datetime_rzeczywisty, datetime) nadal działa."""
+
+    def __instancecheck__(cls, instance):
+        return isinstance(instance, _real_datetime)
+
+
+class VirtualDatetime(_real_datetime, metaclass=_VirtualDatetimeType):
+    """datetime.datetime, którego now/utcnow/today zwracają czas wirtualny."""
+
+    _now_ns = staticmethod(_real_time_ns)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.fromtimestamp(cls._now_ns() / 1e9, tz)
+
+    @classmethod
+    def today(cls):
+        return cls.fromtimestamp(cls._now_ns() / 1e9)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.fromtimestamp(cls._now_ns() / 1e9, _datetime.timezone.utc).replace(tzinfo=None)
+
+
+class TimePatch:
+    """Podmienia funkcje czasu na odczyty zegara (obiekt z metodą now_ns).
+
+    Zegar monotoniczny biegnie razem z czasem wirtualnym (również w przyspieszonym
+    tempie i po skoku naprzód), ale nigdy się nie cofa - po cofnięciu czasu
+    wirtualnego stoi w miejscu, aż czas wirtualny go dogoni. Przy owns_clock=True
+    stop() zamyka też zegar (np. SharedClock otwarty przez patch()).
+    """
+
+    def __init__(self, clock, modules=(), owns_clock=False):
+        self.clock = clock
+        self.modules = list(modules)
+        self.owns_clock = owns_clock
+        self.active = False
+        self._saved = []
+        self._mono_last = 0
+        self._mono_base = 0
+
+    def _functions(self):
+        now_ns = self.clock.now_ns
+        patch = self
+
+        def virtual_time():
+            return now_ns() / 1e9
+
+        def virtual_monotonic_ns():
+            value = now_ns() - patch._mono_base
+            last = patch._mono_last
+            if value < last:
+                return last
+            patch._mono_last = value
+            return value
+
+        def virtual_monotonic():
+            return virtual_monotonic_ns() / 1e9
+
+        return {
+            "time": virtual_time,
+            "time_ns": now_ns,
+            "monotonic": virtual_monotonic,
+            "monotonic_ns": virtual_monotonic_ns,
+        }
+
+    def start(self):
+        """Podmienia funkcje czasu (w module time, datetime i w modułach z parametru modules)."""
+        if self.active:
+            return self
+        # Zegar monotoniczny startuje od bieżącej wartości rzeczywistej, aby nie było skoku
+        self._mono_base = self.clock.now_ns() - time.monotonic_ns()
+        self._mono_last = 0
+
+        originals = {name: getattr(time, name) for name in TIME_FUNCTIONS}
+        originals["datetime"] = _datetime.datetime
+        replacements = self._functions()
+        VirtualDatetime._now_ns = staticmethod(self.clock.now_ns)
+        replacements["datetime"] = VirtualDatetime
+
+        self._replace(time, TIME_FUNCTIONS, replacements)
+        self._replace(_datetime, ("datetime",), replacements)
+        for module in self.modules:
+            # W innych modułach podmieniamy tylko nazwy wskazujące na oryginalne obiekty
+            names = [name for name, original in originals.items()
+                     if getattr(module, name, None) is original and module is not time]
+            self._replace(module, names, replacements)
+        self.active = True
+        return self
+
+    def _replace(self, module, names, replacements):
+        for name in names:
+            self._saved.append((module, name, getattr(module, name)))
+            setattr(module, name, replacements[name])
+
+    def stop(self):
+        """Przywraca oryginalne funkcje czasu."""
+        for module, name, original in reversed(self._saved):
+            setattr(module, name, original)
+        self._saved = []
+        VirtualDatetime._now_ns = staticmethod(_real_time_ns)
+        self.active = False
+        if self.owns_clock:
+            self.clock.close()
+            self.owns_clock = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def patch(clock=None, shared=False, path=None, modules=()):
+    """Tworzy TimePatch dla zegara w procesie lub (shared=True) zegara udostępnionego przez aplikację.
+
+    Bez zegara i bez shared=True używany jest nowy VirtualClock (czas systemowy,
+    który test może przesuwać, zatrzymywać lub przyspieszać przez patch.clock).
+    """
+    if clock is None and shared:
+        from timesync import shmclock
+        # Zegar otwarty tutaj zamyka TimePatch.stop()
+        return TimePatch(shmclock.SharedClock(path or shmclock.DEFAULT_PATH), modules, owns_clock=True)
+    if clock is None:
+        from timesync.virtualclock import VirtualClock
+        clock = VirtualClock()
+    return TimePatch(clock, modules)
+
+
+def _cost_ns(func, calls):
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - start) / calls
+
+
+def benchmark(calls=200000):
+    """Koszt pojedynczego wywołania funkcji czasu (ns): oryginał i wersja podmieniona."""
+    import os
+    import tempfile
+
+    from timesync import shmclock
+    from timesync.virtualclock import VirtualClock
+
+    results = {
+        "real_time_call_ns": _cost_ns(time.time, calls),
+        "real_datetime_now_call_ns": _cost_ns(_datetime.datetime.now, calls // 10),
+    }
+
+    with patch(VirtualClock(rate=60)):
+        results["virtual_time_call_ns"] = _cost_ns(time.time, calls)
+        results["virtual_monotonic_call_ns"] = _cost_ns(time.monotonic, calls)
+        results["virtual_datetime_now_call_ns"] = _cost_ns(_datetime.datetime.now, calls // 10)
+
+    path = os.path.join(tempfile.mkdtemp(prefix="zegarsync-"), "clock.bin")
+    publisher = shmclock.ClockPublisher(path)
+    VirtualClock(on_change=publisher.publish).set_rate(60)
+    try:
+        with patch(shared=True, path=path) as patched:
+            results["shared_time_call_ns"] = _cost_ns(time.time, calls)
+            results["shared_datetime_now_call_ns"] = _cost_ns(_datetime.datetime.now, calls // 10)
+    finally:
+        publisher.close()
+        os.remove(path)
+        os.rmdir(os.path.dirname(path))
+
+    try:
+        import freezegun
+    except ImportError:
+        return results
+    with freezegun.freeze_time("2024-01-01", tick=True):
+        results["freezegun_time_call_ns"] = _cost_ns(time.time, calls // 10)
+        results["freezegun_datetime_now_call_ns"] = _cost_ns(_datetime.datetime.now, calls // 10)
+    return results
@@ -0,0 +1,190 @@
+"""Pomiar czasu etapów synchronizacji (spany perf_counter_ns) z eksportem do Chrome trace.
+
+Śledzenie jest domyślnie wyłączone - span() zwraca wtedy pusty kontekst.
+Po wywołaniu enable() każdy etap, wywołanie procesu, oczekiwanie i zapytanie
+sieciowe jest zapisywany jako span, który można wyeksportować do formatu
+Chrome trace-event (chrome://tracing, Perfetto) lub podsumować histogramem.
+"""
+import contextlib
+import threading
+import time
+from collections import namedtuple
+
+# Kategorie spanów
+SYNC = "sync"
+STAGE = "stage"
+SUBPROCESS = "subprocess"
+SLEEP = "sleep"
+NETWORK = "network"
+
+# Górne granice przedziałów histogramu (ms) - kolejne potęgi dwójki
+HISTOGRAM_BOUNDS_MS = tuple(2.0 ** i for i in range(-4, 16))
+
+Span = namedtuple("Span", [
+    "name",         # nazwa etapu lub operacji
+    "category",     # kategoria (SYNC, STAGE, SUBPROCESS, SLEEP, NETWORK)
+    "start_ns",     # początek wg perf_counter_ns
+    "end_ns",       # koniec wg perf_counter_ns
+    "track",        # ścieżka na osi czasu (domyślnie nazwa wątku)
+    "args",         # dodatkowe informacje (słownik)
+])
+
+_DISABLED = contextlib.nullcontext()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class Tracer:
+    """Zbiera spany z wielu wątków; list.append jest atomowe, więc zapis nie wymaga blokady."""
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.origin_ns = clock()
+        self.spans = []
+
+    @contextlib.contextmanager
+    def span(self, name, category=STAGE, track=None, **args):
+        """Mierzy czas wykonania bloku; wyjątek również zamyka span (z polem error)."""
+        start = self.clock()
+        try:
+            yield
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, category, start, self.clock(), track, args)
+
+    def record(self, name, category, start_ns, end_ns, track=None, args=None):
+        """Dodaje gotowy span (np. zmierzony wcześniej)."""
+        if track is None:
+            track = threading.current_thread().name
+        self.spans.append(Span(name, category, start_ns, end_ns, track, args or {}))
+
+    def clear(self):
+        self.spans = []
+
+    def chrome_trace(self):
+        """Zwraca spany w formacie Chrome trace-event (zdarzenia 'X', czas w µs)."""
+        tracks = {}
+        events = []
+        for span in self.spans:
+            tid = tracks.setdefault(span.track, len(tracks) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start_ns - self.origin_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": 1,
+                "tid": tid,
+                "args": span.args,
+            })
+        for track, tid in tracks.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        """Zapisuje plik JSON do otwarcia w chrome://tracing lub Perfetto."""
+        import json
+
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file, ensure_ascii=False)
+
+    def histogram(self, category=None):
+        """Zwraca statystyki czasu trwania wg nazwy spanu (opcjonalnie tylko z jednej kategorii).
+
+        Dla każdej nazwy: liczba, suma, min, p50, p90, p99, max (ms) oraz
+        liczności przedziałów histogramu (górna granica w ms -> liczba).
+        """
+        durations = {}
+        for span in self.spans:
+            if category is None or span.category == category:
+                durations.setdefault(span.name, []).append((span.end_ns - span.start_ns) / 1e6)
+
+        summary = {}
+        for name, values in durations.items():
+            values.sort()
+            buckets = {}
+            for value in values:
+                bound = next((b for b in HISTOGRAM_BOUNDS_MS if value <= b), float("inf"))
+                buckets[bound] = buckets.get(bound, 0) + 1
+            summary[name] = {
+                "count": len(values),
+                "total_ms": sum(values),
+                "min_ms": values[0],
+                "p50_ms": _percentile(values, 0.5),
+                "p90_ms": _percentile(values, 0.9),
+                "p99_ms": _percentile(values, 0.99),
+                "max_ms": values[-1],
+                "buckets": buckets,
+            }
+        return summary
+
+    def summary_lines(self, category=None):
+        """Podsumowanie histogramu jako linie tekstu (najdłuższe etapy na początku)."""
+        stats = self.histogram(category)
+        lines = [f"{'ETAP':<24} {'N':>5} {'SUMA [ms]':>11} {'P50':>9} {'P90':>9} {'MAX':>9}"]
+        for name, s in sorted(stats.items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{name:<24} {s['count']:>5} {s['total_ms']:>11.1f} {s['p50_ms']:>9.2f} "
+                         f"{s['p90_ms']:>9.2f} {s['max_ms']:>9.2f}")
+        return lines
+
+
+_tracer = None
+
+
+def enable(tracer=None):
+    """Włącza zbieranie spanów i zwraca aktywny Tracer."""
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+    return _tracer
+
+
+def disable():
+    """Wyłącza zbieranie spanów; zwraca dotychczasowy Tracer (lub None)."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active():
+    """Zwraca aktywny Tracer lub None, gdy śledzenie jest wyłączone."""
+    return _tracer
+
+
+def span(name, category=STAGE, track=None, **args):
+    """Span w aktywnym Tracerze; przy wyłączonym śledzeniu pusty kontekst bez kosztu pomiaru."""
+    tracer = _tracer
+    if tracer is None:
+        return _DISABLED
+    return tracer.span(name, category, track, **args)
+
+
+def benchmark(runs=200):
+    """Czas etapów potoku synchronizacji z atrapą usługi czasu (bez oczekiwania i sieci)."""
+    import logging
+
+    from timesync import service
+    from timesync.pipeline import SyncPipeline
+
+    previous = disable()
+    tracer = enable()
+    logging.disable(logging.INFO)
+    try:
+        for i in range(runs):
+            controller = service.FakeTimeServiceController(state=service.RUNNING, status_ttl=0)
+            pipeline = SyncPipeline("fake.ntp", controller, measure=lambda: 0.0, sleep=lambda s: None)
+            pipeline.run()
+    finally:
+        logging.disable(logging.NOTSET)
+        disable()
+        if previous is not None:
+            enable(previous)
+
+    results = {"runs": runs}
+    for name, stats in tracer.histogram(STAGE).items():
+        results[f"{name}_p50_ms"] = stats["p50_ms"]
+        results[f"{name}_p99_ms"] = stats["p99_ms"]
+    return results
@@ -0,0 +1,223 @@
+"""Zegar wirtualny: przesunięcie z dokładnością do nanosekund, tempo upływu i płynna korekta."""
+import math
+import time
+from collections import namedtuple
+from fractions import Fraction
+
+NS_PER_S = 1_000_000_000
+
+# Maksymalny mianownik tempa (tempo przechowywane jako ułamek liczb całkowitych)
+RATE_PRECISION = 1_000_000
+
+# Domyślny czas płynnej korekty (s)
+DEFAULT_SLEW_SECONDS = 60.0
+
+ClockState = namedtuple("ClockState", [
+    "mono_ns",        # kotwica: odczyt zegara monotonicznego
+    "virtual_ns",     # kotwica: czas wirtualny (ns od epoki Unix) w chwili mono_ns
+    "rate_num",       # tempo w trakcie korekty (licznik)
+    "rate_den",       # tempo w trakcie korekty (mianownik)
+    "slew_end_ns",    # koniec korekty wg zegara monotonicznego (== mono_ns bez korekty)
+    "end_virtual_ns", # czas wirtualny na końcu korekty
+    "num",            # tempo docelowe (licznik)
+    "den",            # tempo docelowe (mianownik)
+    "generation",     # licznik zmian stanu
+])
+
+
+def _as_fraction(rate):
+    if rate < 0:
+        raise ValueError(f"Tempo zegara wirtualnego nie może być ujemne: {rate}")
+    fraction = Fraction(rate).limit_denominator(RATE_PRECISION)
+    return fraction.numerator, fraction.denominator
+
+
+def at_ns(state, mono_ns):
+    """Czas wirtualny wg stanu ClockState dla podanego odczytu zegara monotonicznego."""
+    if mono_ns < state.slew_end_ns:
+        return state.virtual_ns + (mono_ns - state.mono_ns) * state.rate_num // state.rate_den
+    if state.num == state.den:
+        return state.end_virtual_ns + mono_ns - state.slew_end_ns
+    return state.end_virtual_ns + (mono_ns - state.slew_end_ns) * state.num // state.den
+
+
+def pending_ns(state, mono_ns):
+    """Część trwającej korekty, która nie została jeszcze wprowadzona (0 bez korekty)."""
+    if mono_ns >= state.slew_end_ns:
+        return 0
+    unslewed = at_ns(state, mono_ns) + (state.slew_end_ns - mono_ns) * state.num // state.den
+    return state.end_virtual_ns - unslewed
+
+
+def mono_at_ns(state, virtual_ns):
+    """Najwcześniejszy odczyt zegara monotonicznego, przy którym czas wirtualny wg stanu osiąga virtual_ns.
+
+    None, gdy czas wirtualny tej wartości nie osiągnie (tempo 0).
+    """
+    if virtual_ns <= state.virtual_ns:
+        return state.mono_ns
+    if state.mono_ns < state.slew_end_ns and virtual_ns <= state.end_virtual_ns:
+        if state.rate_num == 0:
+            return state.slew_end_ns
+        # Dzielenie z zaokrągleniem w górę - at_ns zaokrągla w dół
+        elapsed = -(-(virtual_ns - state.virtual_ns) * state.rate_den // state.rate_num)
+        return min(state.mono_ns + elapsed, state.slew_end_ns)
+    if state.num == 0:
+        return None
+    return state.slew_end_ns - (-(virtual_ns - state.end_virtual_ns) * state.den // state.num)
+
+
+class VirtualClock:
+    """Zegar wirtualny zakotwiczony na time.monotonic_ns.
+
+    Czas wirtualny = kotwica + (monotonic_ns - kotwica_mono) * tempo. Tempo
+    jest ułamkiem liczb całkowitych, więc odczyt nie traci precyzji niezależnie
+    od czasu pracy; tempo 0 zatrzymuje czas, 60 przyspiesza go 60-krotnie.
+    Cały stan to jedna niezmienna krotka podmieniana przy każdej zmianie, więc
+    odczyt z dowolnego wątku jest spójny bez blokad i kosztuje O(1).
+
+    Płynna korekta (slew) zmienia na zadany czas tempo tak, by po jego upływie
+    zegar był przesunięty o żądaną wartość - bez skoku wskazań.
+
+    on_change(state) jest wywoływane po każdej zmianie stanu (np. publikacja
+    w pamięci współdzielonej).
+    """
+
+    def __init__(self, offset_ns=0, rate=1, monotonic_ns=time.monotonic_ns, wall_ns=time.time_ns,
+                 on_change=None):
+        self.monotonic_ns = monotonic_ns
+        self.wall_ns = wall_ns
+        self.on_change = on_change
+        num, den = _as_fraction(rate)
+        mono = monotonic_ns()
+        virtual = wall_ns() + int(offset_ns)
+        self._state = ClockState(mono, virtual, num, den, mono, virtual, num, den, 0)
+
+    def now_ns(self):
+        """Bieżący czas wirtualny w nanosekundach od epoki Unix."""
+        mono = self.monotonic_ns()
+        state = self._state
+        # Indeksy zamiast nazw pól: odczyt bywa wywoływany miliony razy na sekundę
+        if mono < state[4]:
+            return state[1] + (mono - state[0]) * state[2] // state[3]
+        if state[6] == state[7]:
+            # Tempo 1 (ułamek jest skrócony) - bez kosztownego mnożenia dużych liczb
+            return state[5] + mono - state[4]
+        return state[5] + (mono - state[4]) * state[6] // state[7]
+
+    def now(self):
+        """Bieżący czas wirtualny w sekundach (jak time.time)."""
+        return self.now_ns() / NS_PER_S
+
+    @property
+    def state(self):
+        """Niezmienna krotka ClockState (np. do publikacji dla innych procesów)."""
+        return self._state
+
+    @property
+    def generation(self):
+        return self._state.generation
+
+    @property
+    def rate(self):
+        """Tempo docelowe jako liczba zmiennoprzecinkowa."""
+        return self._state.num / self._state.den
+
+    @property
+    def slewing(self):
+        return self.monotonic_ns() < self._state.slew_end_ns
+
+    def offset_ns(self):
+        """Różnica między czasem wirtualnym a zegarem systemowym."""
+        return self.now_ns() - self.wall_ns()
+
+    def _set(self, virtual_ns, num, den, mono=None, slew=None):
+        if mono is None:
+            mono = self.monotonic_ns()
+        generation = self._state.generation + 1
+        if slew is None:
+            self._state = ClockState(mono, virtual_ns, num, den, mono, virtual_ns, num, den, generation)
+        else:
+            slew_num, slew_den, slew_end, end_virtual = slew
+            self._state = ClockState(mono, virtual_ns, slew_num, slew_den, slew_end, end_virtual,
+                                     num, den, generation)
+        if self.on_change is not None:
+            self.on_change(self._state)
+
+    def set_offset(self, offset_ns):
+        """Ustawia przesunięcie względem zegara systemowego skokowo (przerywa korektę)."""
+        state = self._state
+        self._set(self.wall_ns() + int(offset_ns), state.num, state.den)
+
+    def adjust(self, delta_ns):
+        """Przesuwa czas wirtualny skokowo o delta_ns."""
+        state = self._state
+        mono = self.monotonic_ns()
+        self._set(at_ns(state, mono) + int(delta_ns), state.num, state.den, mono)
+
+    def set_rate(self, rate):
+        """Zmienia tempo upływu czasu bez skoku wskazań (0 zatrzymuje czas)."""
+        num, den = _as_fraction(rate)
+        mono = self.monotonic_ns()
+        self._set(at_ns(self._state, mono), num, den, mono)
+
+    def slew(self, delta_ns, seconds=DEFAULT_SLEW_SECONDS):
+        """Przesuwa czas wirtualny o delta_ns stopniowo, w ciągu podanej liczby sekund.
+
+        Niewprowadzona część trwającej korekty jest doliczana do nowej, więc
+        kolejne korekty się sumują.
+        """
+        state = self._state
+        mono = self.monotonic_ns()
+        delta_ns = int(delta_ns) + pending_ns(state, mono)
+        duration_ns = int(seconds * NS_PER_S)
+        if duration_ns <= 0 or delta_ns == 0:
+            self._set(at_ns(state, mono) + delta_ns, state.num, state.den, mono)
+            return
+
+        virtual = at_ns(state, mono)
+        # Tempo korekty: num/den + delta/czas = (num * czas + delta * den) / (den * czas)
+        slew_num = state.num * duration_ns + delta_ns * state.den
+        if slew_num < 0:
+            raise ValueError("Zbyt krótki czas korekty - czas wirtualny musiałby się cofać")
+        slew_den = state.den * duration_ns
+        divisor = math.gcd(slew_num, slew_den)
+        slew_num //= divisor
+        slew_den //= divisor
+        end_virtual = virtual + duration_ns * state.num // state.den + delta_ns
+        self._set(virtual, state.num, state.den, mono, (slew_num, slew_den, mono + duration_ns, end_virtual))
+
+    def slew_to(self, offset_ns, seconds=DEFAULT_SLEW_SECONDS):
+        """Stopniowo doprowadza przesunięcie względem zegara systemowego do offset_ns."""
+        # Trwająca korekta jest częścią przesunięcia docelowego, a slew doliczy ją ponownie
+        self.slew(int(offset_ns) - self.offset_ns() - pending_ns(self._state, self.monotonic_ns()), seconds)
+
+    def reset(self):
+        """Przywraca czas systemowy i normalne tempo."""
+        self._set(self.wall_ns(), 1, 1)
+
+
+def benchmark(reads=1_000_000):
+    """Liczba odczytów now_ns() na sekundę (normalne tempo, przyspieszenie, korekta)."""
+    results = {"reads": reads}
+    for name, setup in (("normal", lambda c: None),
+                        ("rate60", lambda c: c.set_rate(60)),
+                        ("slewing", lambda c: c.slew(NS_PER_S, 3600))):
+        clock = VirtualClock()
+        setup(clock)
+        now_ns = clock.now_ns
+        start = time.perf_counter()
+        for _ in range(reads):
+            now_ns()
+        elapsed = time.perf_counter() - start
+        results[f"{name}_reads_per_s"] = reads / elapsed
+    results["time_ns_per_s"] = reads / _baseline(reads)
+    return results
+
+
+def _baseline(reads):
+    time_ns = time.time_ns
+    start = time.perf_counter()
+    for _ in range(reads):
+        time_ns()
+    return time.perf_counter() - start